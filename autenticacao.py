@@ -0,0 +1,70 @@
+"""Identificação do usuário logado a partir do token OAuth do Google."""
+import hashlib
+import threading
+import time
+
+import requests
+
+USER_INFO_ENDPOINT = "https://www.googleapis.com/oauth2/v1/userinfo"
+
+
+def buscar_email(access_token, sessao=requests):
+    """Consulta o e-mail do usuário no endpoint de userinfo do Google."""
+    # Cabeçalho de autorização com o token de acesso
+    headers = {'Authorization': f'Bearer {access_token}'}
+    resposta = sessao.get(USER_INFO_ENDPOINT, headers=headers)
+    resposta.raise_for_status()  # Lança um erro para códigos de status ruins (4xx ou 5xx)
+    return resposta.json().get('email')
+
+
+def token_nao_autorizado(erro):
+    """Indica se o erro é um 401 do Google, ou seja, token expirado ou revogado."""
+    resposta = getattr(erro, "response", None)
+    return resposta is not None and resposta.status_code == 401
+
+
+class CacheUsuarios:
+    """Guarda, por token de acesso, o e-mail do usuário e se ele está autorizado.
+
+    Cada entrada vale até o token expirar (menos `margem_segundos`), então o
+    userinfo só é consultado no primeiro acesso de cada token. Os tokens não
+    ficam em memória: a chave é o hash SHA-256 do access_token.
+    """
+
+    def __init__(self, emails_autorizados, margem_segundos=60, validade_padrao_segundos=3600):
+        self.emails_autorizados = frozenset(emails_autorizados)
+        self.margem_segundos = margem_segundos
+        self.validade_padrao_segundos = validade_padrao_segundos
+        self._trava = threading.Lock()
+        self._entradas = {}
+
+    @staticmethod
+    def _chave(token):
+        return hashlib.sha256(token["access_token"].encode()).hexdigest()
+
+    def _expira_em(self, token):
+        if token.get("expires_at"):
+            return float(token["expires_at"])
+        return time.time() + float(token.get("expires_in") or self.validade_padrao_segundos)
+
+    def obter(self, token, buscar=buscar_email):
+        """Retorna `(email, autorizado)` do token, consultando `buscar(access_token)` só se necessário."""
+        chave = self._chave(token)
+        agora = time.time()
+        with self._trava:
+            entrada = self._entradas.get(chave)
+            if entrada and agora < entrada[2] - self.margem_segundos:
+                return entrada[0], entrada[1]
+
+        email = buscar(token["access_token"])
+        autorizado = email in self.emails_autorizados
+        with self._trava:
+            # Aproveita para descartar entradas de tokens que já expiraram
+            self._entradas = {c: e for c, e in self._entradas.items() if e[2] > agora}
+            self._entradas[chave] = (email, autorizado, self._expira_em(token))
+        return email, autorizado
+
+    def descartar(self, token):
+        """Remove a entrada do token, forçando nova consulta ao userinfo."""
+        with self._trava:
+            self._entradas.pop(self._chave(token), None)
@@ -0,0 +1,147 @@
+"""Compara o pré-processamento antigo (por linha, com .apply) com o vetorizado.
+
+As duas versões convertem as mesmas colunas para os mesmos tipos, então o
+ganho medido é só o da vetorização. A conversão para categóricas, que só
+reduz a memória, é medida à parte, com o tamanho do DataFrame antes e depois.
+
+Uso: python benchmarks/bench_parsing.py [N_LINHAS ...]   (padrão: 10000 100000 500000)
+"""
+import os
+import random
+import re
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dados import (  # noqa: E402
+    COLUNAS_DATA, COLUNAS_DECIMAIS, COLUNAS_ESPERADAS, COLUNAS_NUMERICAS, COLUNAS_PERCENTUAIS,
+    COLUNAS_TEXTO, compactar_colunas, converter_colunas, parse_percent_string,
+)
+
+AUTORES = ["ALEXANDRE", "CAMILA", "CAROLINA", "GABRIEL MEURER", "Leo", "MATHEUS F.", "THATY", "WANDER"]
+
+
+def parse_decimal_string(valor):
+    """Converte um número no formato da planilha para float, uma célula por vez (vazio ou inválido vira NaN)."""
+    texto = str(valor).strip()
+    if ',' in texto:
+        texto = texto.replace('.', '').replace(',', '.')
+    try:
+        return float(texto) if texto else float('nan')
+    except ValueError:
+        return float('nan')
+
+
+def processar_dados_legado(df):
+    """Pré-processamento como era feito antes da versão vetorizada, com as mesmas colunas de `converter_colunas`."""
+    for col in COLUNAS_TEXTO:
+        if col in df.columns:
+            df[col] = df[col].astype(str).fillna('')
+    for col in COLUNAS_NUMERICAS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+    for col in COLUNAS_DECIMAIS:
+        if col in df.columns:
+            df[col] = df[col].apply(parse_decimal_string).astype(float)
+    for col in COLUNAS_PERCENTUAIS:
+        if col in df.columns:
+            df[col] = df[col].apply(parse_percent_string)
+    for col in COLUNAS_DATA:
+        if col in df.columns:
+            df[col] = df[col].apply(lambda x: None if str(x).strip() == '' else x)
+            df[col] = pd.to_datetime(df[col], errors='coerce', dayfirst=True)
+    if "AUTOR" in df.columns:
+        df['AUTOR_BASE'] = df['AUTOR'].apply(lambda x: re.sub(r'\s*\(Editado em \d{2}/\d{2}/\d{4} \d{2}:\d{2}\)$', '', x) if isinstance(x, str) else x)
+        df['AUTOR_BASE'] = df['AUTOR_BASE'].str.upper()
+    return df
+
+
+def gerar_registros(n, semente=42):
+    """Gera `n` registros no formato retornado por `get_all_records`."""
+    rnd = random.Random(semente)
+
+    def data():
+        if rnd.random() < 0.3:
+            return ""
+        return f"{rnd.randint(1, 28):02d}/{rnd.randint(1, 12):02d}/{rnd.randint(2022, 2026)}"
+
+    def percentual():
+        escolha = rnd.random()
+        if escolha < 0.4:
+            return rnd.choice([0, 25, 50, 100])
+        if escolha < 0.7:
+            return f"{rnd.randint(0, 100)},{rnd.randint(0, 9)}%"
+        if escolha < 0.9:
+            return round(rnd.uniform(0, 100), 1)
+        return ""
+
+    def decimal():
+        escolha = rnd.random()
+        if escolha < 0.2:
+            return ""
+        if escolha < 0.7:
+            return f"{rnd.randint(0, 9)}.{rnd.randint(0, 999):03d},{rnd.randint(0, 99)}"
+        return f"{rnd.randint(0, 99)},{rnd.randint(0, 9)}"
+
+    registros = []
+    for i in range(n):
+        autor = rnd.choice(AUTORES)
+        if rnd.random() < 0.5:
+            autor += f" (Editado em {rnd.randint(1, 28):02d}/{rnd.randint(1, 12):02d}/2025 {rnd.randint(0, 23):02d}:{rnd.randint(0, 59):02d})"
+        registro = {col: "" for col in COLUNAS_ESPERADAS}
+        registro.update({
+            "EDT": f"{rnd.randint(1, 9)}.{rnd.randint(1, 20)}",
+            "OS": rnd.randint(100, 999),
+            "NOME DA TAREFA": f"Tarefa {i}",
+            "AUTOR": autor,
+            "DURAÇÃO PLANEJADA (DIAS)": rnd.choice([rnd.randint(1, 60), ""]),
+            "DURAÇÃO REAL (DIAS)": rnd.choice([rnd.randint(1, 60), ""]),
+        })
+        for col in COLUNAS_DECIMAIS:
+            registro[col] = decimal()
+        for col in COLUNAS_PERCENTUAIS:
+            registro[col] = percentual()
+        for col in COLUNAS_DATA:
+            registro[col] = data()
+        registros.append(registro)
+    return registros
+
+
+def cronometrar(funcao, df):
+    inicio = time.perf_counter()
+    resultado = funcao(df)
+    return resultado, time.perf_counter() - inicio
+
+
+def megabytes(df):
+    return df.memory_usage(index=False, deep=True).sum() / 1e6
+
+
+def main(tamanhos):
+    print("Conversão das colunas (mesmas colunas e tipos nos dois caminhos)")
+    print(f"{'linhas':>8} {'legado (s)':>11} {'vetorizado (s)':>15} {'ganho':>7}")
+    convertidos = {}
+    for n in tamanhos:
+        registros = gerar_registros(n)
+        legado, t_legado = cronometrar(processar_dados_legado, pd.DataFrame(registros))
+        vetorizado, t_vetorizado = cronometrar(converter_colunas, pd.DataFrame(registros))
+        # Os dois caminhos precisam produzir exatamente o mesmo DataFrame
+        pd.testing.assert_frame_equal(legado, vetorizado)
+        print(f"{n:>8} {t_legado:>11.3f} {t_vetorizado:>15.3f} {t_legado / t_vetorizado:>6.1f}x")
+        convertidos[n] = vetorizado
+
+    print()
+    print("Esquema compacto (textos repetitivos como categóricas)")
+    print(f"{'linhas':>8} {'tempo (s)':>10} {'antes (MB)':>11} {'depois (MB)':>12} {'redução':>8}")
+    for n, df in convertidos.items():
+        antes = megabytes(df)
+        compacto, t_compactar = cronometrar(compactar_colunas, df.copy())
+        depois = megabytes(compacto)
+        print(f"{n:>8} {t_compactar:>10.3f} {antes:>11.1f} {depois:>12.1f} {antes / depois:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 500_000])
@@ -0,0 +1,195 @@
+"""Mede os caminhos principais da aplicação contra a planilha falsa, sem acessar o Google.
+
+Etapas: carga da planilha, pré-processamento, montagem dos índices e do
+espelho em SQLite, valor agregado, filtro por autor, localização de linha e escrita (montagem das alterações, aplicação no
+cache e gravação pela fila).
+
+Uso:
+    python benchmarks/bench_planilha.py [N_LINHAS ...]      (padrão: 1000 10000 100000)
+    python benchmarks/bench_planilha.py 500000 --salvar base.json
+    python benchmarks/bench_planilha.py 500000 --comparar base.json --tolerancia 0.25
+
+Com --comparar, o script termina com código 1 se alguma etapa ficar mais lenta
+que a base além da tolerância.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.planilha_falsa import AUTORES, PlanilhaFalsa  # noqa: E402
+from busca import IndiceBusca  # noqa: E402
+from cache_dados import DadosTarefas  # noqa: E402
+from consultas import selecionar_tarefas  # noqa: E402
+from dados import ler_planilha, processar_dados  # noqa: E402
+from edt import ArvoreEDT  # noqa: E402
+from escrita import FilaEscrita, calcular_alteracoes, valores_da_tarefa  # noqa: E402
+from evm import AGRUPAMENTOS, calcular_evm, consolidar  # noqa: E402
+from leitura_parcial import ler_listagem  # noqa: E402
+from modelo_leitura import ModeloLeitura  # noqa: E402
+from regras import agora_brasilia, campos_calculados  # noqa: E402
+
+
+def cronometrar(funcao, repeticoes=1):
+    """Executa `funcao` `repeticoes` vezes e retorna `(último resultado, segundos por execução)`."""
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        resultado = funcao()
+    return resultado, (time.perf_counter() - inicio) / repeticoes
+
+
+def medir(n, latencia=0.0, taxa_erro_cota=0.0, edicoes=200, semente=42):
+    """Roda todas as etapas para uma planilha de `n` linhas e retorna `{etapa: segundos}`."""
+    rnd = random.Random(semente)
+    planilha = PlanilhaFalsa.gerar(n, semente=semente, linhas_duplicadas=n // 1000)
+    tempos = {}
+
+    (df, cabecalho), tempos["carga (valores)"] = cronometrar(lambda: ler_planilha(planilha, "valores"))
+    _, tempos["carga (registros)"] = cronometrar(lambda: ler_planilha(planilha, "registros"))
+    _, tempos["carga (projeção)"] = cronometrar(lambda: ler_listagem(planilha))
+    df, tempos["pré-processamento"] = cronometrar(lambda: processar_dados(df))
+    dados, tempos["índices (com a árvore da EDT e a busca)"] = cronometrar(lambda: DadosTarefas(df))
+    evm, tempos["valor agregado (EVM)"] = cronometrar(lambda: calcular_evm(df, agora_brasilia().date()), repeticoes=5)
+    _, tempos["consolidação do EVM"] = cronometrar(
+        lambda: [consolidar(evm, df[col]) for col in AGRUPAMENTOS.values()], repeticoes=5
+    )
+    arvore, tempos["árvore da EDT"] = cronometrar(lambda: ArvoreEDT(df))
+    modelo = ModeloLeitura()
+    _, tempos["espelho SQLite"] = cronometrar(lambda: modelo.carregar(df, versao=1))
+
+    autores = [autor.upper() for autor in AUTORES]
+    _, tempos["filtro por autor (partição)"] = cronometrar(
+        lambda: [dados.por_autor.tarefas(autor) for autor in autores], repeticoes=20
+    )
+    _, tempos["filtro por autor (espelho)"] = cronometrar(
+        lambda: [modelo.tarefas_do_autor(1, autor) for autor in autores], repeticoes=20
+    )
+    _, tempos["filtro por autor (visualização)"] = cronometrar(
+        lambda: selecionar_tarefas(df, {"autores": autores[:3]}, ordenar_por="% CONCLUIDA"), repeticoes=5
+    )
+    _, tempos["filtro por autor (visualização, espelho)"] = cronometrar(
+        lambda: modelo.selecionar(1, {"autores": autores[:3]}, ordenar_por="% CONCLUIDA"), repeticoes=5
+    )
+
+    busca, tempos["índice de busca"] = cronometrar(lambda: IndiceBusca(df))
+    consultas = ["mecanica", "tarefa 12", "estrutra 3.1", "os 1"]
+    _, duracao = cronometrar(lambda: [busca.buscar(consulta) for consulta in consultas], repeticoes=5)
+    tempos["busca de tarefas (por consulta)"] = duracao / len(consultas)
+    _, duracao = cronometrar(
+        lambda: [busca.buscar(consulta, entre=dados.por_autor.tarefas(autores[0])) for consulta in consultas], repeticoes=5
+    )
+    tempos["busca nas tarefas do autor (por consulta)"] = duracao / len(consultas)
+
+    amostra = rnd.sample(list(df.index), min(1000, len(df)))
+    chaves = [(df.at[i, "OS"], df.at[i, "EDT"], df.at[i, "NOME DA TAREFA"]) for i in amostra]
+    _, duracao = cronometrar(lambda: [dados.indice.localizar(*chave) for chave in chaves])
+    tempos["localizar linha (por tarefa)"] = duracao / len(chaves)
+
+    editadas = amostra[:edicoes]
+    agora = agora_brasilia()
+
+    def montar_alteracoes():
+        alteracoes = {}
+        for df_index in editadas:
+            tarefa = dados.df.loc[df_index]
+            novos = {"% CONCLUIDA": "100.0", "OBSERVAÇÕES": "revisado"}
+            novos.update(campos_calculados(tarefa, 100.0, "bench@exemplo.com", agora))
+            alteracoes[df_index] = calcular_alteracoes(valores_da_tarefa(tarefa), novos)
+        return alteracoes
+
+    alteracoes, duracao = cronometrar(montar_alteracoes)
+    tempos["montar alterações (por tarefa)"] = duracao / len(editadas)
+
+    def aplicar_no_cache():
+        # Cada edição publica um novo retrato, como em CacheDados.aplicar_linha
+        retrato = dados
+        for df_index, valores in alteracoes.items():
+            retrato = retrato.com_linhas({df_index: valores})
+        return retrato
+
+    _, duracao = cronometrar(aplicar_no_cache)
+    tempos["aplicar no cache (por tarefa)"] = duracao / len(editadas)
+
+    def atualizar_arvore():
+        # Como em DadosTarefas.com_linhas: cópia rasa e recálculo do caminho da linha editada
+        for df_index in editadas:
+            arvore.copiar().atualizar(df, [df_index])
+
+    _, duracao = cronometrar(atualizar_arvore)
+    tempos["atualizar árvore da EDT (por tarefa)"] = duracao / len(editadas)
+
+    planilha.latencia, planilha.taxa_erro_cota = latencia, taxa_erro_cota
+    fila = FilaEscrita(planilha, obter_cabecalho=lambda: cabecalho, espera_base=0.05, espera_maxima=0.5)
+
+    def gravar():
+        protocolos = [fila.enviar(df_index + 2, valores) for df_index, valores in alteracoes.items()]
+        return [fila.aguardar(protocolo, tempo_limite=60) for protocolo in protocolos]
+
+    estados, tempos["gravação pela fila"] = cronometrar(gravar)
+    falhas = sum(estado["estado"] != "gravada" for estado in estados)
+    if falhas:
+        print(f"  aviso: {falhas} de {len(estados)} edições não foram gravadas")
+    print(f"  chamadas à planilha falsa: {dict(planilha.chamadas)}")
+    return tempos
+
+
+def formatar_tempo(segundos):
+    if segundos < 1e-3:
+        return f"{segundos * 1e6:.1f} µs"
+    if segundos < 1:
+        return f"{segundos * 1e3:.1f} ms"
+    return f"{segundos:.2f} s"
+
+
+def comparar(resultados, base, tolerancia):
+    """Lista as etapas que ficaram mais lentas que a base além da tolerância."""
+    regressoes = []
+    for n, tempos in resultados.items():
+        for etapa, segundos in tempos.items():
+            anterior = base.get(str(n), {}).get(etapa)
+            if anterior and segundos > anterior * (1 + tolerancia):
+                regressoes.append(f"{n} linhas, {etapa}: {formatar_tempo(anterior)} -> {formatar_tempo(segundos)}")
+    return regressoes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("tamanhos", nargs="*", type=int, default=[1_000, 10_000, 100_000])
+    parser.add_argument("--latencia", type=float, default=0.0, help="segundos de espera por chamada à planilha na gravação")
+    parser.add_argument("--erros-de-cota", type=float, default=0.0, help="probabilidade de 429 por chamada na gravação")
+    parser.add_argument("--edicoes", type=int, default=200)
+    parser.add_argument("--salvar", help="grava os tempos medidos neste arquivo JSON")
+    parser.add_argument("--comparar", help="compara com os tempos de um arquivo JSON salvo antes")
+    parser.add_argument("--tolerancia", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    resultados = {}
+    for n in args.tamanhos:
+        print(f"{n} linhas")
+        tempos = medir(n, args.latencia, args.erros_de_cota, args.edicoes)
+        for etapa, segundos in tempos.items():
+            print(f"  {etapa:<42} {formatar_tempo(segundos):>10}")
+        resultados[n] = tempos
+
+    if args.salvar:
+        with open(args.salvar, "w", encoding="utf-8") as arquivo:
+            json.dump({str(n): tempos for n, tempos in resultados.items()}, arquivo, ensure_ascii=False, indent=2)
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as arquivo:
+            regressoes = comparar(resultados, json.load(arquivo), args.tolerancia)
+        if regressoes:
+            print("Etapas mais lentas que a base:")
+            for regressao in regressoes:
+                print(f"  {regressao}")
+            return 1
+        print("Nenhuma regressão em relação à base.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,255 @@
+"""Substituto em memória do `gspread.Worksheet` para medir a aplicação sem acessar o Google.
+
+Implementa só os métodos que a aplicação usa (`get_values`, `batch_get`,
+`get_all_records`, `row_values`, `update`, `batch_update` e
+`spreadsheet.get_lastUpdateTime`), com latência por chamada e erros de cota
+(429) configuráveis. As células são guardadas como texto, exatamente como a
+API as devolve com FORMATTED_VALUE.
+"""
+import collections
+import datetime
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+import gspread
+import requests
+from gspread.utils import a1_range_to_grid_range, numericise_all, to_records
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dados import COLUNAS_DATA, COLUNAS_ESPERADAS, COLUNAS_PERCENTUAIS  # noqa: E402
+
+AUTORES = [
+    "ALEXANDRE", "ARQ QUANTA", "BRUNO ALMEIDA", "CAMILA", "CAROLINA", "GABRIEL MEURER",
+    "KAYKE CHELI", "Leo", "MATHEUS F.", "TARCISIO", "THATY", "VANESSA", "WANDER",
+]
+DISCIPLINAS = ["ARQUITETURA", "ESTRUTURA", "HIDRÁULICA", "ELÉTRICA", "MECÂNICA", "ORÇAMENTO", "PLANEJAMENTO"]
+TIPOS_DE_PROJETO = ["BÁSICO", "EXECUTIVO", "AS BUILT", "ESTUDO"]
+COLUNAS_HH = ["HH Orçado", "BCWS_HH", "BCWP_HH", "ACWP_HH", "EAC_HH"]
+COLUNAS_INDICES = ["SPI_HH", "CPI_HH"]
+
+
+def erro_de_cota():
+    """Monta o `APIError` que o gspread levanta quando a cota de leitura/escrita estoura."""
+    resposta = requests.Response()
+    resposta.status_code = 429
+    resposta._content = json.dumps({"error": {
+        "code": 429,
+        "message": "Quota exceeded for quota metric 'Requests' (planilha falsa)",
+        "status": "RESOURCE_EXHAUSTED",
+    }}).encode()
+    return gspread.exceptions.APIError(resposta)
+
+
+def gerar_grade(n, semente=42, linhas_duplicadas=0):
+    """Gera o cabeçalho e `n` linhas de tarefas como texto, no esquema de `COLUNAS_ESPERADAS`.
+
+    Os valores repetidos vêm de listas pré-montadas e são compartilhados entre
+    as linhas, para que 500 mil linhas caibam na memória. `linhas_duplicadas`
+    repete a chave (OS, EDT, NOME DA TAREFA) de algumas linhas, como acontece
+    na planilha real.
+    """
+    rnd = random.Random(semente)
+    datas = [f"{d:02d}/{m:02d}/{a}" for a in range(2022, 2027) for m in range(1, 13) for d in range(1, 29)]
+    percentuais = [f"{i // 10},{i % 10}%" for i in range(1001)]
+    horas = [f"{i},{j}" for i in range(0, 400, 7) for j in (0, 5)]
+    indices_desempenho = [f"{i / 100:.2f}".replace(".", ",") for i in range(50, 151)]
+    oss = [str(os_val) for os_val in rnd.sample(range(1000, 9999), max(1, min(500, n // 200 or 1)))]
+    carimbos = [
+        f" (Editado em {rnd.randint(1, 28):02d}/{rnd.randint(1, 12):02d}/2025 {rnd.randint(0, 23):02d}:{rnd.randint(0, 59):02d})"
+        for _ in range(200)
+    ]
+    autores = AUTORES + [autor + carimbo for autor in AUTORES for carimbo in carimbos[:15]]
+    posicao = {col: i for i, col in enumerate(COLUNAS_ESPERADAS)}
+
+    linhas = [list(COLUNAS_ESPERADAS)]
+    for i in range(n):
+        linha = [""] * len(COLUNAS_ESPERADAS)
+        os_val = rnd.choice(oss)
+        linha[posicao["OS"]] = os_val
+        linha[posicao["NOME DA OS"]] = f"OS {os_val}"
+        linha[posicao["EDT"]] = f"{rnd.randint(1, 9)}.{rnd.randint(1, 20)}.{rnd.randint(1, 30)}"
+        linha[posicao["NOME DA TAREFA"]] = f"Tarefa {i}"
+        linha[posicao["DISCIPLINA"]] = rnd.choice(DISCIPLINAS)
+        linha[posicao["TIPO DE PROJETO"]] = rnd.choice(TIPOS_DE_PROJETO)
+        linha[posicao["AUTOR"]] = rnd.choice(autores)
+        linha[posicao["DURAÇÃO PLANEJADA (DIAS)"]] = str(rnd.randint(1, 60))
+        if rnd.random() < 0.5:
+            linha[posicao["DURAÇÃO REAL (DIAS)"]] = str(rnd.randint(1, 60))
+        for col in COLUNAS_PERCENTUAIS:
+            linha[posicao[col]] = rnd.choice(percentuais) if rnd.random() < 0.8 else percentuais[0]
+        for col in COLUNAS_DATA:
+            if rnd.random() < 0.7:
+                linha[posicao[col]] = rnd.choice(datas)
+        for col in COLUNAS_HH:
+            linha[posicao[col]] = rnd.choice(horas)
+        for col in COLUNAS_INDICES:
+            linha[posicao[col]] = rnd.choice(indices_desempenho)
+        linhas.append(linha)
+
+    for _ in range(min(linhas_duplicadas, n // 2)):
+        origem, destino = rnd.sample(range(1, n + 1), 2)
+        for col in ("OS", "EDT", "NOME DA TAREFA"):
+            linhas[destino][posicao[col]] = linhas[origem][posicao[col]]
+    return linhas
+
+
+class ArquivoFalso:
+    """Faz o papel do `gspread.Spreadsheet` dono da aba, para a sonda de frescor do Drive."""
+
+    def __init__(self, planilha):
+        self._planilha = planilha
+
+    def get_lastUpdateTime(self):
+        self._planilha._chamar("get_lastUpdateTime")
+        with self._planilha._trava:
+            return self._planilha.modificada_em
+
+
+class PlanilhaFalsa:
+    """Aba de planilha em memória com a mesma interface usada do `gspread.Worksheet`.
+
+    Cada chamada espera `latencia` segundos e, com probabilidade `taxa_erro_cota`,
+    levanta o mesmo `APIError` 429 do Google. `chamadas` conta as chamadas por
+    método, para conferir quantas idas à API cada caminho faz.
+    """
+
+    def __init__(self, linhas, latencia=0.0, taxa_erro_cota=0.0, semente=0):
+        self._linhas = [list(linha) for linha in linhas]
+        self.latencia = latencia
+        self.taxa_erro_cota = taxa_erro_cota
+        self.chamadas = collections.Counter()
+        self._rnd = random.Random(semente)
+        self._trava = threading.Lock()
+        self.spreadsheet = ArquivoFalso(self)
+        self.modificada_em = datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+    @classmethod
+    def gerar(cls, n, semente=42, linhas_duplicadas=0, **kwargs):
+        """Cria uma planilha com `n` tarefas sintéticas (veja `gerar_grade`)."""
+        return cls(gerar_grade(n, semente, linhas_duplicadas), **kwargs)
+
+    @property
+    def row_count(self):
+        return len(self._linhas)
+
+    @property
+    def col_count(self):
+        return max((len(linha) for linha in self._linhas), default=0)
+
+    def _chamar(self, metodo):
+        with self._trava:
+            self.chamadas[metodo] += 1
+            estourou = self._rnd.random() < self.taxa_erro_cota
+        if self.latencia:
+            time.sleep(self.latencia)
+        if estourou:
+            raise erro_de_cota()
+
+    def _grade(self, range_name=None):
+        """Recorta a grade no intervalo A1 (ou devolve tudo), completando as linhas com ""."""
+        largura = self.col_count
+        if range_name is None:
+            inicio_l, fim_l, inicio_c, fim_c = 0, len(self._linhas), 0, largura
+        else:
+            grade = a1_range_to_grid_range(range_name.split("!")[-1])
+            inicio_l = grade.get("startRowIndex", 0)
+            fim_l = min(grade.get("endRowIndex", len(self._linhas)), len(self._linhas))
+            inicio_c = grade.get("startColumnIndex", 0)
+            fim_c = min(grade.get("endColumnIndex", largura), largura)
+        recorte = []
+        for linha in self._linhas[inicio_l:fim_l]:
+            valores = linha[inicio_c:fim_c]
+            recorte.append(valores + [""] * (fim_c - inicio_c - len(valores)))
+        # A API corta as linhas vazias do fim do intervalo
+        while recorte and not any(recorte[-1]):
+            recorte.pop()
+        return recorte
+
+    def get_values(self, range_name=None, major_dimension=None, **kwargs):
+        self._chamar("get_values")
+        with self._trava:
+            grade = self._grade(range_name)
+        if major_dimension in ("COLUMNS", gspread.utils.Dimension.cols):
+            return [list(coluna) for coluna in zip(*grade)]
+        return grade
+
+    def batch_get(self, ranges, major_dimension=None, **kwargs):
+        """Vários intervalos em uma chamada; como na API, células e linhas vazias do fim são cortadas."""
+        self._chamar("batch_get")
+        resultados = []
+        with self._trava:
+            for intervalo in ranges:
+                grade = self._grade(intervalo)
+                if major_dimension in ("COLUMNS", gspread.utils.Dimension.cols):
+                    grade = [list(coluna) for coluna in zip(*grade)]
+                for valores in grade:
+                    while valores and valores[-1] == "":
+                        valores.pop()
+                resultados.append(grade)
+        return resultados
+
+    def row_values(self, row, **kwargs):
+        self._chamar("row_values")
+        with self._trava:
+            if row > len(self._linhas):
+                return []
+            linha = list(self._linhas[row - 1])
+        while linha and linha[-1] == "":
+            linha.pop()
+        return linha
+
+    def get_all_records(self, head=1, expected_headers=None, default_blank="", numericise_ignore=(),
+                        allow_underscores_in_numeric_literals=False, empty2zero=False, **kwargs):
+        self._chamar("get_all_records")
+        with self._trava:
+            grade = self._grade()
+        if len(grade) < head:
+            return []
+        chaves, valores = grade[head - 1], grade[head:]
+        if expected_headers is not None and not set(expected_headers) <= set(chaves):
+            raise gspread.exceptions.GSpreadException(
+                "the given 'expected_headers' contains unknown headers: "
+                f"{set(expected_headers) - set(chaves)}"
+            )
+        if list(numericise_ignore) != ["all"]:
+            valores = [
+                numericise_all(linha, empty2zero, default_blank, allow_underscores_in_numeric_literals,
+                               list(numericise_ignore))
+                for linha in valores
+            ]
+        return to_records(chaves, valores)
+
+    def _escrever(self, range_name, valores):
+        self.modificada_em = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        grade = a1_range_to_grid_range(range_name.split("!")[-1])
+        linha0 = grade.get("startRowIndex", 0)
+        coluna0 = grade.get("startColumnIndex", 0)
+        for i, linha_valores in enumerate(valores):
+            while len(self._linhas) <= linha0 + i:
+                self._linhas.append([])
+            linha = self._linhas[linha0 + i]
+            for j, valor in enumerate(linha_valores):
+                if len(linha) <= coluna0 + j:
+                    linha.extend([""] * (coluna0 + j + 1 - len(linha)))
+                linha[coluna0 + j] = "" if valor is None else str(valor)
+
+    def update(self, values=None, range_name=None, **kwargs):
+        # Aceita a ordem antiga (range_name, values) usada em versões anteriores do gspread
+        if isinstance(values, str):
+            values, range_name = range_name, values
+        self._chamar("update")
+        with self._trava:
+            self._escrever(range_name or "A1", values)
+        return {"updatedRange": range_name}
+
+    def batch_update(self, data, **kwargs):
+        self._chamar("batch_update")
+        with self._trava:
+            for intervalo in data:
+                self._escrever(intervalo["range"], intervalo["values"])
+        return {"totalUpdatedCells": sum(len(linha) for d in data for linha in d["values"])}
@@ -0,0 +1,180 @@
+"""Busca aproximada de tarefas por índice de termos e trigramas, no lugar de percorrer os rótulos."""
+import copy
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+# Colunas cujo texto entra na busca
+COLUNAS_BUSCA = ["OS", "EDT", "NOME DA TAREFA", "NOME DA OS", "DISCIPLINA"]
+
+# Semelhança mínima (fração dos trigramas do termo buscado) para um termo do índice contar como encontrado
+SEMELHANCA_MINIMA = 0.5
+
+# Termos curtos (1 ou 2 letras) casam por prefixo; só os mais curtos que começam com eles entram
+# na busca, já que os longos ficariam com semelhança baixa de qualquer forma
+MAXIMO_TERMOS_POR_PREFIXO = 500
+
+_SEPARADORES = re.compile(r"[^a-z0-9.]+")
+
+
+def normalizar(texto):
+    """Minúsculas, sem acentos e quebrado em termos; pontos ficam dentro do termo (códigos de EDT)."""
+    texto = unicodedata.normalize("NFKD", str(texto).lower()).encode("ascii", "ignore").decode()
+    return [termo.strip(".") for termo in _SEPARADORES.split(texto) if termo.strip(".")]
+
+
+def trigramas(termo):
+    """Trigramas do termo com uma margem nas pontas, para que o início e o fim pesem na comparação."""
+    marcado = f" {termo} "
+    return {marcado[i:i + 3] for i in range(len(marcado) - 2)}
+
+
+def _semelhanca(buscado, trigramas_buscado, termo):
+    """Semelhança entre 0 e 1: igualdade vale 1; senão, trigramas em comum, com vantagem para prefixos."""
+    if termo == buscado:
+        return 1.0
+    comuns = len(trigramas_buscado & trigramas(termo))
+    contido = comuns / len(trigramas_buscado)
+    dice = 2 * comuns / (len(trigramas_buscado) + len(termo) + 1)
+    semelhanca = 0.8 * contido + 0.1 * dice
+    return semelhanca + 0.1 if termo.startswith(buscado) else semelhanca
+
+
+class IndiceBusca:
+    """Índice invertido das tarefas: termo -> `df_index` das linhas com ele, e trigrama -> termos.
+
+    Um termo buscado encontra os termos do índice que começam com ele ou que
+    têm trigramas suficientes em comum (erros de digitação, acentos). As
+    linhas são ordenadas pelos termos buscados que casaram e pela soma das
+    semelhanças. As estruturas nunca são alteradas no lugar: `copiar` é rasa e
+    `atualizar` substitui só as entradas da linha editada, como em
+    `indices.ParticaoAutores`.
+    """
+
+    def __init__(self, df):
+        self._colunas = [col for col in COLUNAS_BUSCA if col in df.columns]
+        self._linhas_por_termo = {}
+        self._termos_por_trigrama = {}
+        self._tamanho = int(df.index.max()) + 1 if len(df) else 0
+        if not len(df):
+            return
+
+        # Normaliza cada valor distinto uma vez e expande os termos para as linhas com numpy
+        termos = {}
+        pares_linhas, pares_termos = [], []
+        indices = df.index.to_numpy(dtype=np.int64)
+        for col in self._colunas:
+            codigos, valores = pd.factorize(df[col])
+            termos_do_valor = [[termos.setdefault(termo, len(termos)) for termo in normalizar(valor)] for valor in valores]
+            quantos = np.array([len(lista) for lista in termos_do_valor] + [0])
+            planos = np.array([numero for lista in termos_do_valor for numero in lista], dtype=np.int64)
+            inicios = np.concatenate([[0], np.cumsum(quantos[:-1])])
+            # Código -1 (vazio) aponta para a entrada extra sem termos
+            por_linha = quantos[codigos]
+            pares_linhas.append(np.repeat(indices, por_linha))
+            deslocamento = np.arange(por_linha.sum()) - np.repeat(np.cumsum(por_linha) - por_linha, por_linha)
+            pares_termos.append(planos[np.repeat(inicios[codigos], por_linha) + deslocamento])
+        numeros = np.concatenate(pares_termos)
+        linhas = np.concatenate(pares_linhas)
+
+        # Uma linha aparece uma vez por termo, mesmo que ele esteja em várias colunas
+        pares = np.sort(numeros * self._tamanho + linhas)
+        pares = pares[np.concatenate([[True], np.diff(pares) != 0])]
+        numeros, linhas = pares // self._tamanho, pares % self._tamanho
+        # Cada termo fica com uma fatia (sem cópia) do array de linhas ordenado por termo
+        limites = (np.flatnonzero(np.diff(numeros)) + 1).tolist()
+        nomes = list(termos)
+        for inicio, fim in zip([0] + limites, limites + [len(linhas)]):
+            self._linhas_por_termo[nomes[numeros[inicio]]] = linhas[inicio:fim]
+
+        por_trigrama = {}
+        for termo in self._linhas_por_termo:
+            for trigrama in trigramas(termo):
+                por_trigrama.setdefault(trigrama, []).append(termo)
+        self._termos_por_trigrama = {trigrama: frozenset(lista) for trigrama, lista in por_trigrama.items()}
+
+    def __len__(self):
+        return len(self._linhas_por_termo)
+
+    def copiar(self):
+        """Cópia rasa: os arrays de linhas e os conjuntos de termos são compartilhados, pois `atualizar` os substitui."""
+        copia = copy.copy(self)
+        copia._linhas_por_termo = dict(self._linhas_por_termo)
+        copia._termos_por_trigrama = dict(self._termos_por_trigrama)
+        return copia
+
+    def _termos_da_tarefa(self, tarefa):
+        return {termo for col in self._colunas if pd.notnull(tarefa[col]) for termo in normalizar(tarefa[col])}
+
+    def atualizar(self, df_index, tarefa_antiga, tarefa):
+        """Troca os termos de uma única linha após uma edição, mexendo só nos termos que mudaram."""
+        antigos, novos = self._termos_da_tarefa(tarefa_antiga), self._termos_da_tarefa(tarefa)
+        for termo in antigos - novos:
+            restantes = self._linhas_por_termo[termo]
+            restantes = restantes[restantes != df_index]
+            if len(restantes):
+                self._linhas_por_termo[termo] = restantes
+                continue
+            del self._linhas_por_termo[termo]
+            for trigrama in trigramas(termo):
+                sobram = self._termos_por_trigrama[trigrama] - {termo}
+                if sobram:
+                    self._termos_por_trigrama[trigrama] = sobram
+                else:
+                    del self._termos_por_trigrama[trigrama]
+        for termo in novos - antigos:
+            linhas = self._linhas_por_termo.get(termo)
+            if linhas is None:
+                for trigrama in trigramas(termo):
+                    self._termos_por_trigrama[trigrama] = self._termos_por_trigrama.get(trigrama, frozenset()) | {termo}
+                linhas = np.empty(0, dtype=np.int64)
+            self._linhas_por_termo[termo] = np.insert(linhas, np.searchsorted(linhas, df_index), df_index)
+        self._tamanho = max(self._tamanho, df_index + 1)
+
+    def _termos_semelhantes(self, buscado):
+        """`{termo do índice: semelhança}` para um termo buscado."""
+        trigramas_buscado = trigramas(buscado)
+        candidatos = set()
+        if len(buscado) < 3:
+            # Poucos trigramas para comparar: só os termos que começam com ele, pelos trigramas iniciais
+            inicio = " " + buscado
+            for trigrama, termos in self._termos_por_trigrama.items():
+                if trigrama.startswith(inicio):
+                    candidatos.update(termo for termo in termos if termo.startswith(buscado))
+            mais_curtos = sorted(candidatos, key=lambda termo: (len(termo), termo))[:MAXIMO_TERMOS_POR_PREFIXO]
+            return {termo: _semelhanca(buscado, trigramas_buscado, termo) for termo in mais_curtos}
+        for trigrama in trigramas_buscado:
+            candidatos.update(self._termos_por_trigrama.get(trigrama, ()))
+        semelhancas = {termo: _semelhanca(buscado, trigramas_buscado, termo) for termo in candidatos}
+        return {termo: valor for termo, valor in semelhancas.items() if valor >= SEMELHANCA_MINIMA}
+
+    def buscar(self, texto, entre=None, limite=50):
+        """Retorna os `df_index` das tarefas que casam com `texto`, da mais para a menos relevante.
+
+        Com `entre`, só as linhas desse conjunto de `df_index` são consideradas.
+        Empates ficam na ordem da planilha.
+        """
+        buscados = normalizar(texto)
+        if not buscados or not self._tamanho:
+            return []
+        pontos = np.zeros(self._tamanho)
+        casados = np.zeros(self._tamanho, dtype=np.int64)
+        for buscado in dict.fromkeys(buscados):
+            semelhantes = self._termos_semelhantes(buscado)
+            if not semelhantes:
+                continue
+            linhas = [self._linhas_por_termo[termo] for termo in semelhantes]
+            # Cada linha fica com a maior semelhança entre os termos dela
+            melhor = np.zeros(self._tamanho)
+            np.maximum.at(melhor, np.concatenate(linhas), np.repeat(list(semelhantes.values()), [len(grupo) for grupo in linhas]))
+            pontos += melhor
+            casados += melhor > 0
+
+        candidatas = np.flatnonzero(casados) if entre is None else np.fromiter(entre, dtype=np.int64)
+        candidatas = candidatas[(candidatas < self._tamanho)]
+        candidatas = candidatas[casados[candidatas] > 0]
+        # lexsort usa a última chave como principal: mais termos casados, depois mais pontos, depois a linha
+        ordem = np.lexsort((candidatas, -pontos[candidatas], -casados[candidatas]))
+        return candidatas[ordem][:limite].tolist()
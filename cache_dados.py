@@ -0,0 +1,414 @@
+"""Cache dos dados de tarefas compartilhado por todas as sessões do processo."""
+import contextlib
+import copy
+import threading
+import time
+
+from busca import IndiceBusca
+from consultas import selecionar_tarefas
+from dados import atribuir_valor, processar_linha, relatorio_memoria
+from edt import ArvoreEDT
+from evm import calcular_evm
+from indices import IndiceTarefas, ParticaoAutores, chave_tarefa, linha_planilha
+from limitador import PRIORIDADE_SEGUNDO_PLANO, em_prioridade
+
+
+class DadosTarefas:
+    """Retrato imutável do DataFrame de tarefas e dos índices construídos a partir dele.
+
+    O mesmo retrato é lido por todas as sessões sem cópia. Uma edição não o
+    altera: `com_linhas` devolve um novo retrato, e quem ainda está lendo o
+    anterior continua vendo dados consistentes.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self.indice = IndiceTarefas(df)
+        self.por_autor = ParticaoAutores(df)
+        # Montados junto com os demais índices, fora da trava, para nenhuma sessão pagar por eles
+        self._arvore = ArvoreEDT(df)
+        self._busca = IndiceBusca(df)
+        # Preenchidos por CacheDados ao publicar o retrato, se houver um espelho em SQLite
+        self.modelo = None
+        self.versao = None
+        self._distintos = {}
+        self._memoria = None
+        self._evm = None
+
+    def com_linhas(self, valores_por_indice):
+        """Retorna um novo retrato com os valores gravados aplicados às linhas `{df_index: valores}`."""
+        novo = copy.copy(self)
+        # Cópia rasa: as colunas continuam compartilhadas com este retrato e `_aplicar_linha`
+        # troca por uma cópia só as que forem alteradas (sem depender do copy-on-write do pandas)
+        novo.df = self.df.copy(deep=False)
+        novo.indice = self.indice.copiar()
+        novo.por_autor = self.por_autor.copiar()
+        novo._distintos = {}
+        novo._memoria = None
+        novo._evm = None
+        # A árvore da EDT é corrigida só nos caminhos das linhas alteradas
+        novo._arvore = self._arvore.copiar()
+        novo._busca = self._busca.copiar()
+        copiadas = set()
+        for df_index, valores in valores_por_indice.items():
+            novo._aplicar_linha(df_index, valores, copiadas)
+        return novo
+
+    def _aplicar_linha(self, df_index, valores, copiadas):
+        chave_antiga = self._chave(df_index)
+        autor_antigo = self.df.at[df_index, "AUTOR_BASE"]
+        tarefa_antiga = self.df.loc[df_index]
+        linha = processar_linha(valores)
+        for col in linha.columns:
+            if col in self.df.columns:
+                if col not in copiadas:
+                    self.df[col] = self.df[col].copy()
+                    copiadas.add(col)
+                atribuir_valor(self.df, df_index, col, linha.at[0, col])
+        self.indice.mover(linha_planilha(df_index), chave_antiga, self._chave(df_index))
+        self.por_autor.atualizar(df_index, autor_antigo, self.df.loc[df_index])
+        self._arvore.atualizar(self.df, [df_index])
+        self._busca.atualizar(df_index, tarefa_antiga, self.df.loc[df_index])
+
+    def memoria(self):
+        """Relatório de memória por coluna (veja `dados.relatorio_memoria`), calculado uma vez por retrato."""
+        if self._memoria is None:
+            self._memoria = relatorio_memoria(self.df)
+        return self._memoria
+
+    def evm(self, hoje):
+        """Valor agregado de cada tarefa em `hoje` (veja `evm.calcular_evm`), calculado uma vez por retrato e por dia."""
+        if self._evm is None or self._evm[0] != hoje:
+            self._evm = (hoje, calcular_evm(self.df, hoje))
+        return self._evm[1]
+
+    def arvore(self):
+        """Árvore da EDT com os consolidados por nó (veja `edt.ArvoreEDT`)."""
+        return self._arvore
+
+    def buscar(self, texto, entre=None, limite=50):
+        """`df_index` das tarefas que casam com `texto`, das mais relevantes para as menos (veja `busca.IndiceBusca`)."""
+        return self._busca.buscar(texto, entre, limite)
+
+    def valores_distintos(self, col):
+        """Valores distintos e não vazios de uma coluna, ordenados; calculados uma vez por retrato."""
+        if col not in self._distintos:
+            valores = self._consultar_modelo("valores_distintos", col)
+            if valores is None:
+                valores = sorted(valor for valor in self.df[col].dropna().unique() if valor != "")
+            self._distintos[col] = valores
+        return self._distintos[col]
+
+    # As consultas abaixo vão ao espelho em SQLite quando ele reflete este retrato;
+    # um retrato já substituído (ou sem espelho) responde pelos índices em memória
+
+    def _consultar_modelo(self, consulta, *args, **kwargs):
+        if self.modelo is None:
+            return None
+        return getattr(self.modelo, consulta)(self.versao, *args, **kwargs)
+
+    def tarefas_do_autor(self, autor_base):
+        """`{df_index: rótulo}` das tarefas em aberto do autor, na ordem da planilha."""
+        tarefas = self._consultar_modelo("tarefas_do_autor", autor_base)
+        return self.por_autor.tarefas(autor_base) if tarefas is None else tarefas
+
+    def localizar(self, os_val, edt, nome_tarefa):
+        """Linhas da planilha com a chave (OS, EDT, NOME DA TAREFA); mais de uma indica duplicidade."""
+        linhas = self._consultar_modelo("localizar", os_val, edt, nome_tarefa)
+        return self.indice.localizar(os_val, edt, nome_tarefa) if linhas is None else linhas
+
+    def selecionar(self, filtros=None, ordenar_por=None, crescente=True):
+        """Índice das tarefas filtradas e ordenadas (veja `consultas.selecionar_tarefas`)."""
+        selecionadas = self._consultar_modelo("selecionar", filtros, ordenar_por, crescente)
+        if selecionadas is None:
+            selecionadas = selecionar_tarefas(self.df, filtros, ordenar_por, crescente)
+        return selecionadas
+
+    def _chave(self, df_index):
+        return chave_tarefa(
+            self.df.at[df_index, "OS"], self.df.at[df_index, "EDT"], self.df.at[df_index, "NOME DA TAREFA"]
+        )
+
+
+class TravaLeituraEscrita:
+    """Permite vários leitores ao mesmo tempo ou um único escritor.
+
+    Escritores esperando têm prioridade sobre novos leitores, para que uma
+    recarga ou edição não fique esperando indefinidamente. Não é reentrante.
+    """
+
+    def __init__(self):
+        self._condicao = threading.Condition()
+        self._leitores = 0
+        self._escrevendo = False
+        self._escritores_esperando = 0
+
+    @contextlib.contextmanager
+    def leitura(self):
+        with self._condicao:
+            self._condicao.wait_for(lambda: not self._escrevendo and not self._escritores_esperando)
+            self._leitores += 1
+        try:
+            yield
+        finally:
+            with self._condicao:
+                self._leitores -= 1
+                if not self._leitores:
+                    self._condicao.notify_all()
+
+    @contextlib.contextmanager
+    def escrita(self):
+        with self._condicao:
+            self._escritores_esperando += 1
+            try:
+                self._condicao.wait_for(lambda: not self._escrevendo and not self._leitores)
+            finally:
+                self._escritores_esperando -= 1
+            self._escrevendo = True
+        try:
+            yield
+        finally:
+            with self._condicao:
+                self._escrevendo = False
+                self._condicao.notify_all()
+
+
+class CacheDados:
+    """Guarda os dados processados da planilha por até `ttl_segundos`.
+
+    A instância é única por processo (criada com `st.cache_resource`), então
+    todas as sessões leem o mesmo retrato (`DadosTarefas`) e a planilha é
+    baixada uma vez por recarga, não uma vez por sessão. Recargas e edições
+    publicam um retrato novo sob a trava de escrita; cada publicação
+    incrementa `versao` e, se houver um `modelo` (`modelo_leitura.ModeloLeitura`),
+    atualiza também o espelho em SQLite.
+
+    Com `em_segundo_plano`, um cache expirado continua sendo servido enquanto
+    uma thread confere a planilha; só a primeira carga espera pela API.
+
+    Uma marca igual só adia a leitura até `max_idade_segundos` depois da
+    última vez que os dados vieram da planilha; passado esse prazo, a próxima
+    validação lê a planilha mesmo com a marca igual (uma sonda pode não ver
+    todas as mudanças, como a sentinela fora do intervalo conferido).
+
+    Uma leitura da planilha pode não conter edições recentes: as aplicadas
+    com `aplicar_linhas` enquanto ela corria e as que ainda estão na fila de
+    gravação (`pendentes`). Elas são aplicadas de novo ao retrato lido antes
+    da publicação, para que ninguém deixe de ver a própria edição.
+    """
+
+    def __init__(self, ttl_segundos, modelo=None, em_segundo_plano=False, max_idade_segundos=3600):
+        self.ttl_segundos = ttl_segundos
+        self.modelo = modelo
+        self.em_segundo_plano = em_segundo_plano
+        self.max_idade_segundos = max_idade_segundos
+        self.versao = 0
+        self._trava = TravaLeituraEscrita()
+        # Garante uma única ida à planilha por vez; a trava de escrita só é tomada para publicar
+        self._trava_renovacao = threading.Lock()
+        # Edições montam o novo retrato fora da trava de escrita, uma de cada vez
+        self._trava_edicao = threading.Lock()
+        # Edições aplicadas enquanto uma leitura da planilha está em andamento, para reaplicar no resultado
+        self._lendo = False
+        self._geracao = 0
+        self._edicoes = []
+        self._dados = None
+        self._carregado_em = None
+        self._lido_em = None  # última vez que os dados vieram da planilha, e não só a marca
+        self._cabecalho = None
+        self._marca = None
+        self.recargas_evitadas = 0
+
+    def _valido(self):
+        return self._dados is not None and time.monotonic() - self._carregado_em < self.ttl_segundos
+
+    def _publicar(self, dados, linhas_alteradas=None, espelho=None):
+        """Troca o retrato atual (com a trava de escrita já tomada) e leva a mudança ao espelho.
+
+        `espelho` é o banco já montado com `ModeloLeitura.preparar` numa carga completa.
+        """
+        self.versao += 1
+        dados.versao = self.versao
+        dados.modelo = self.modelo
+        if self.modelo is not None:
+            if linhas_alteradas is None:
+                self.modelo.carregar(dados.df, self.versao, espelho)
+            else:
+                self.modelo.aplicar_linhas(dados.df, linhas_alteradas, self.versao)
+        self._dados = dados
+
+    def obter(self, carregar, marca=None, atualizar=None, pendentes=None):
+        """Retorna o retrato em cache, chamando `carregar()` se estiver vazio ou expirado.
+
+        `carregar()` retorna `(df, cabecalho)`; se o cabeçalho vier como None,
+        ele será lido à parte na próxima validação. Se `marca` for dada (veja
+        `frescor.VerificadorFrescor.marca`), um cache expirado só é recarregado
+        quando a marca mudou desde a última carga; senão vale por mais um TTL.
+
+        Se `atualizar` for dada, um cache expirado é corrigido com o
+        `{df_index: valores}` que ela retorna, em vez de carregado do zero; se
+        ela retornar None, `carregar()` é chamada.
+
+        `pendentes()`, se dada, retorna o `{df_index: valores}` das edições
+        enviadas que a planilha pode ainda não mostrar.
+        """
+        with self._trava.leitura():
+            if self._valido():
+                return self._dados
+            vencidos = self._dados if self.em_segundo_plano else None
+
+        if vencidos is not None:
+            self._renovar_em_segundo_plano(carregar, marca, atualizar, pendentes)
+            return vencidos
+
+        # Sessões simultâneas esperam uma única leitura em vez de baixarem a planilha cada uma
+        with self._trava_renovacao:
+            if not self._valido():
+                self._renovar(carregar, marca, atualizar, pendentes)
+        with self._trava.leitura():
+            return self._dados
+
+    def _renovar_em_segundo_plano(self, carregar, marca, atualizar, pendentes):
+        if not self._trava_renovacao.acquire(blocking=False):
+            return  # Outra thread já está conferindo a planilha
+
+        def renovar():
+            try:
+                # Ninguém espera por esta leitura: ela cede a vez na cota às sessões e às gravações
+                with em_prioridade(PRIORIDADE_SEGUNDO_PLANO):
+                    if not self._valido():
+                        self._renovar(carregar, marca, atualizar, pendentes)
+            except Exception as e:
+                # Os dados vencidos continuam sendo servidos; a próxima leitura tenta de novo
+                print(f"Não foi possível atualizar os dados em segundo plano: {e}")
+            finally:
+                self._trava_renovacao.release()
+
+        threading.Thread(target=renovar, name="renovar-cache-dados", daemon=True).start()
+
+    def _renovar(self, carregar, marca, atualizar, pendentes=None):
+        """Consulta a planilha sem bloquear os leitores e publica o resultado sob a trava de escrita."""
+        marca_atual = marca() if marca else None
+        recente = self._lido_em is not None and time.monotonic() - self._lido_em < self.max_idade_segundos
+        if self._dados is not None and marca_atual is not None and marca_atual == self._marca and recente:
+            with self._trava.escrita():
+                self._carregado_em = time.monotonic()
+                self.recargas_evitadas += 1
+            return
+        with self._trava.escrita():
+            self._lendo = True
+        try:
+            # Edições ainda na fila agora podem ser gravadas durante a leitura e não aparecer nela
+            pendentes_antes = pendentes() if pendentes else {}
+            if self._dados is not None and atualizar is not None:
+                alteracoes = atualizar()
+                if alteracoes is not None:
+                    self._publicar_lidos(None, alteracoes, marca_atual, pendentes_antes, pendentes)
+                    return
+            # A marca é lida antes da carga: uma mudança feita durante a leitura
+            # aparece como marca nova na próxima verificação
+            df, cabecalho = carregar()
+            self._publicar_lidos(DadosTarefas(df), None, marca_atual, pendentes_antes, pendentes, cabecalho)
+        finally:
+            with self._trava.escrita():
+                self._lendo = False
+                self._edicoes = []
+
+    def _publicar_lidos(self, dados, alteracoes, marca_atual, pendentes_antes, pendentes, cabecalho=None):
+        """Publica o que veio da planilha com as edições que a leitura pode não ter visto reaplicadas.
+
+        Com `dados`, uma carga completa; senão, as `alteracoes` lidas são aplicadas
+        ao retrato atual. O retrato é montado sem trava e montado de novo se uma
+        edição chegar antes da publicação.
+        """
+        while True:
+            with self._trava.leitura():
+                geracao, edicoes, base = self._geracao, list(self._edicoes), self._dados
+            reaplicar = {}
+            for valores_por_indice in [pendentes_antes, *edicoes, pendentes() if pendentes else {}]:
+                for df_index, valores in valores_por_indice.items():
+                    reaplicar.setdefault(df_index, {}).update(valores)
+            if dados is None:
+                if base is None:
+                    return  # Invalidado durante a leitura: a próxima chamada carrega do zero
+                linhas = {df_index: dict(valores) for df_index, valores in alteracoes.items()}
+                for df_index, valores in reaplicar.items():
+                    linhas.setdefault(df_index, {}).update(valores)
+                linhas = {i: v for i, v in linhas.items() if i in base.df.index}
+                novo = base.com_linhas(linhas) if linhas else base
+                espelho = None
+            else:
+                linhas = None
+                reaplicar = {i: v for i, v in reaplicar.items() if i in dados.df.index}
+                novo = dados.com_linhas(reaplicar) if reaplicar else dados
+                espelho = self.modelo.preparar(novo.df) if self.modelo is not None else None
+            with self._trava.escrita():
+                if self._geracao != geracao or (dados is None and self._dados is not base):
+                    continue
+                if dados is not None:
+                    self._cabecalho = cabecalho
+                if novo is not base:
+                    self._publicar(novo, linhas, espelho)
+                self._carregado_em = self._lido_em = time.monotonic()
+                self._marca = marca_atual
+                return
+
+    def obter_cabecalho(self, ler):
+        """Retorna a linha de cabeçalho memorizada, chamando `ler()` apenas quando necessário.
+
+        A leitura (que pode esperar pela cota) é feita sem trava; se outra
+        thread memorizou um cabeçalho nesse meio-tempo, ele é mantido.
+        """
+        with self._trava.leitura():
+            if self._cabecalho is not None:
+                return self._cabecalho
+        lido = tuple(ler())
+        with self._trava.escrita():
+            if self._cabecalho is None:
+                self._cabecalho = lido
+            return self._cabecalho
+
+    def idade_segundos(self):
+        """Segundos desde a última carga completa, ou None se nada foi carregado."""
+        with self._trava.leitura():
+            if self._carregado_em is None:
+                return None
+            return time.monotonic() - self._carregado_em
+
+    def invalidar(self):
+        """Descarta os dados em cache, forçando uma nova leitura na próxima chamada."""
+        with self._trava.escrita():
+            self._dados = None
+            self._carregado_em = None
+            self._lido_em = None
+            self._cabecalho = None
+            self._marca = None
+            self.versao += 1
+            if self.modelo is not None:
+                self.modelo.invalidar()
+
+    def aplicar_linha(self, df_index, valores):
+        """Aplica no cache os valores gravados em uma linha, sem recarregar a planilha."""
+        self.aplicar_linhas({df_index: valores})
+
+    def aplicar_linhas(self, valores_por_indice):
+        """Publica um novo retrato com os valores gravados em várias linhas `{df_index: valores}`.
+
+        O retrato é montado sem a trava de escrita, que só é tomada para trocá-lo.
+        """
+        with self._trava_edicao:
+            with self._trava.escrita():
+                self._geracao += 1
+                if self._lendo:
+                    self._edicoes.append(valores_por_indice)
+            while True:
+                with self._trava.leitura():
+                    base = self._dados
+                if base is None:
+                    return
+                novo = base.com_linhas(valores_por_indice)
+                with self._trava.escrita():
+                    # Se uma recarga publicou outro retrato nesse meio-tempo, a edição é montada de novo sobre ele
+                    if self._dados is base:
+                        self._publicar(novo, valores_por_indice)
+                        return
@@ -0,0 +1,88 @@
+"""Filtros, ordenação e paginação da visualização de tarefas, feitos no servidor."""
+import numpy as np
+
+from dados import (
+    COLUNAS_DATA, COLUNAS_DECIMAIS, COLUNAS_ESPERADAS, COLUNAS_NUMERICAS, COLUNAS_PERCENTUAIS, FORMATO_DATA,
+    formatar_decimal,
+)
+
+NAO_INICIADA = "Não iniciada"
+EM_ANDAMENTO = "Em andamento"
+CONCLUIDA = "Concluída"
+STATUS = (NAO_INICIADA, EM_ANDAMENTO, CONCLUIDA)
+
+
+def status_tarefas(perc_concluida):
+    """Classifica cada tarefa pelo % CONCLUIDA: 0 não iniciada, 100 concluída, o resto em andamento."""
+    return np.select(
+        [perc_concluida <= 0.0, perc_concluida >= 100.0],
+        [NAO_INICIADA, CONCLUIDA],
+        default=EM_ANDAMENTO,
+    )
+
+
+def filtrar_tarefas(df, os_vals=None, disciplinas=None, autores=None, status=None,
+                    coluna_data=None, periodo=None):
+    """Retorna o índice das tarefas que passam em todos os filtros informados.
+
+    Filtros vazios ou None são ignorados. `periodo` é um par `(inicio, fim)`
+    de datas, inclusivo, aplicado em `coluna_data`.
+    """
+    mascara = np.ones(len(df), dtype=bool)
+    if os_vals:
+        mascara &= df["OS"].isin(os_vals).to_numpy()
+    if disciplinas:
+        mascara &= df["DISCIPLINA"].isin(disciplinas).to_numpy()
+    if autores:
+        mascara &= df["AUTOR_BASE"].isin(autores).to_numpy()
+    if status:
+        mascara &= np.isin(status_tarefas(df["% CONCLUIDA"].to_numpy()), list(status))
+    if coluna_data and periodo:
+        inicio, fim = periodo
+        datas = df[coluna_data].dt.normalize()
+        mascara &= (datas >= np.datetime64(inicio)).to_numpy() & (datas <= np.datetime64(fim)).to_numpy()
+    return df.index[mascara]
+
+
+def selecionar_tarefas(df, filtros=None, ordenar_por=None, crescente=True):
+    """Aplica os filtros e a ordenação e retorna apenas o índice das tarefas, sem copiar o DataFrame."""
+    selecionadas = filtrar_tarefas(df, **(filtros or {}))
+    if ordenar_por:
+        # Ordena só a coluna escolhida, nas linhas filtradas; vazios vão para o fim
+        selecionadas = (
+            df.loc[selecionadas, ordenar_por]
+            .sort_values(ascending=crescente, kind="stable", na_position="last")
+            .index
+        )
+    return selecionadas
+
+
+def paginar(df, selecionadas, pagina=1, tamanho_pagina=50):
+    """Retorna as linhas de uma página (começando em 1) do índice já filtrado e ordenado."""
+    inicio = (max(pagina, 1) - 1) * tamanho_pagina
+    return df.loc[selecionadas[inicio:inicio + tamanho_pagina]]
+
+
+def formatar_para_exibicao(df):
+    """Converte datas, percentuais e durações em texto e põe as colunas na ordem da planilha."""
+    dados_formatados = df.copy()
+
+    for col in COLUNAS_DATA:
+        if col in dados_formatados.columns:
+            dados_formatados[col] = dados_formatados[col].dt.strftime(FORMATO_DATA).fillna('')
+
+    for col in COLUNAS_PERCENTUAIS:
+        if col in dados_formatados.columns:
+            dados_formatados[col] = dados_formatados[col].round(1).astype(str) + "%"
+
+    for col in COLUNAS_NUMERICAS:
+        if col in dados_formatados.columns:
+            dados_formatados[col] = dados_formatados[col].astype(str)
+
+    # Só a página visível chega aqui, então formatar valor a valor é barato
+    for col in COLUNAS_DECIMAIS:
+        if col in dados_formatados.columns:
+            dados_formatados[col] = dados_formatados[col].map(formatar_decimal)
+
+    colunas_ordenadas = [col for col in COLUNAS_ESPERADAS if col in dados_formatados.columns]
+    return dados_formatados[colunas_ordenadas]
@@ -0,0 +1,279 @@
+"""Esquema da planilha de tarefas e pré-processamento dos dados carregados."""
+import functools
+import re
+
+import gspread
+import pandas as pd
+
+# Define a ordem e nome das colunas esperadas na planilha
+COLUNAS_ESPERADAS = [
+    "% CONCLUIDA", "MEMORIAL DE CÁLCULO", "MEMORIAL DE DESCRITIVO", "EDT", "OS",
+    "PRODUTO", "NOME DA OS", "TIPO DE PROJETO", "NOME DA TAREFA", "DISCIPLINA",
+    "SUBDISCIPLINA", "AUTOR", "RESPONSAVEL TÉCNICO (Lider)", "INÍCIO CONTRATUAL",
+    "TÉRMINO CONTRATUAL", "INÍCIO REAL", "TÉRMINO REAL", "DATA REVISÃO DOC",
+    "DATA REVISÃO PROJETO", "DURAÇÃO PLANEJADA (DIAS)", "DURAÇÃO REAL (DIAS)",
+    "% AVANÇO PLANEJADO", "% AVANÇO REAL", "HH Orçado", "BCWS_HH", "BCWP_HH",
+    "ACWP_HH", "SPI_HH", "CPI_HH", "EAC_HH", "OBSERVAÇÕES", "EMAIL"
+]
+
+# Formato das datas gravadas na planilha
+FORMATO_DATA = "%d/%m/%Y"
+
+# Timestamp que a aplicação acrescenta ao AUTOR a cada edição
+REGEX_TIMESTAMP_AUTOR = re.compile(r'\s*\(Editado em \d{2}/\d{2}/\d{4} \d{2}:\d{2}\)$')
+
+# Modos de leitura da planilha: "valores" busca a grade bruta coluna a coluna em uma
+# chamada; "registros" usa get_all_records (um dicionário por linha)
+MODOS_LEITURA = ("valores", "registros")
+
+# Colunas sem as quais não é possível localizar a linha de uma tarefa
+COLUNAS_ESSENCIAIS = ["EDT", "OS", "NOME DA TAREFA"]
+
+COLUNAS_TEXTO = [
+    "EDT", "OS", "NOME DA TAREFA", "MEMORIAL DE CÁLCULO", "MEMORIAL DE DESCRITIVO",
+    "PRODUTO", "NOME DA OS", "TIPO DE PROJETO", "DISCIPLINA", "SUBDISCIPLINA",
+    "AUTOR", "RESPONSAVEL TÉCNICO (Lider)", "OBSERVAÇÕES", "EMAIL"
+]
+
+COLUNAS_NUMERICAS = ["DURAÇÃO PLANEJADA (DIAS)", "DURAÇÃO REAL (DIAS)"]
+
+# Horas-homem e índices de valor agregado, exibidos na planilha com vírgula decimal
+COLUNAS_DECIMAIS = ["HH Orçado", "BCWS_HH", "BCWP_HH", "ACWP_HH", "SPI_HH", "CPI_HH", "EAC_HH"]
+
+# Colunas de texto com no máximo esta fração de valores distintos viram categóricas:
+# cada valor repetido (autor, disciplina, OS...) é guardado uma vez só
+LIMITE_CARDINALIDADE_CATEGORIA = 0.5
+
+# Carimbadas em toda gravação (AUTOR leva a data e hora da edição): cada edição traria um valor novo,
+# e incluí-lo nas categorias recodifica a coluna inteira, então elas continuam texto comum
+COLUNAS_NAO_CATEGORICAS = ["AUTOR", "EMAIL"]
+
+COLUNAS_PERCENTUAIS = ["% CONCLUIDA", "% AVANÇO PLANEJADO", "% AVANÇO REAL"]
+
+COLUNAS_DATA = [
+    "INÍCIO CONTRATUAL", "TÉRMINO CONTRATUAL", "INÍCIO REAL", "TÉRMINO REAL",
+    "DATA REVISÃO DOC", "DATA REVISÃO PROJETO"
+]
+
+
+@functools.lru_cache(maxsize=8)
+def validar_cabecalho(cabecalho):
+    """Compara a linha de cabeçalho da planilha (tupla) com as colunas esperadas.
+
+    Retorna `(essenciais_faltando, colunas_faltando)`. O resultado é memorizado,
+    então a validação só é refeita quando o cabeçalho muda.
+    """
+    presentes = set(cabecalho)
+    essenciais_faltando = [col for col in COLUNAS_ESSENCIAIS if col not in presentes]
+    colunas_faltando = [col for col in COLUNAS_ESPERADAS if col not in presentes]
+    return essenciais_faltando, colunas_faltando
+
+
+def verificar_colunas_esperadas(cabecalho):
+    """Garante que todas as colunas esperadas existem no cabeçalho, como o `expected_headers` do gspread."""
+    desconhecidas = set(COLUNAS_ESPERADAS) - set(cabecalho)
+    if desconhecidas:
+        raise gspread.exceptions.GSpreadException(
+            f"the given 'expected_headers' contains unknown headers: {desconhecidas}"
+        )
+
+
+def ler_valores(sheet):
+    """Lê a grade bruta em uma única chamada e monta o DataFrame coluna a coluna.
+
+    Retorna `(df, cabecalho)`. As células chegam como texto, exatamente como
+    exibidas na planilha.
+    """
+    colunas = sheet.get_values(major_dimension="COLUMNS")
+    if not any(colunas):
+        return pd.DataFrame(), ()
+
+    cabecalho = tuple(coluna[0] for coluna in colunas)
+    verificar_colunas_esperadas(cabecalho)
+    return pd.DataFrame({nome: colunas[i][1:] for nome, i in posicoes_das_colunas(cabecalho).items()}), cabecalho
+
+
+def posicoes_das_colunas(cabecalho):
+    """Mapeia cada nome de coluna para sua posição; em nomes repetidos vale a última, como em get_all_records."""
+    return {nome: i for i, nome in enumerate(cabecalho)}
+
+
+def montar_dataframe(cabecalho, linhas):
+    """Monta o DataFrame bruto a partir do cabeçalho e das linhas de texto (já completadas com "")."""
+    verificar_colunas_esperadas(cabecalho)
+    return pd.DataFrame({
+        nome: [linha[i] for linha in linhas] for nome, i in posicoes_das_colunas(cabecalho).items()
+    })
+
+
+def ler_registros(sheet):
+    """Lê a planilha com `get_all_records`. Retorna `(df, None)`, pois o cabeçalho não é exposto."""
+    return pd.DataFrame(sheet.get_all_records(expected_headers=COLUNAS_ESPERADAS)), None
+
+
+def ler_planilha(sheet, modo="valores"):
+    """Lê os dados brutos da planilha no modo indicado. Retorna `(df, cabecalho)`."""
+    if modo not in MODOS_LEITURA:
+        raise ValueError(f"Modo de leitura desconhecido: {modo!r}. Use um de {MODOS_LEITURA}.")
+    if modo == "registros":
+        return ler_registros(sheet)
+    return ler_valores(sheet)
+
+
+def parse_percent_string(percent_str):
+    """Converte uma string de percentual para float."""
+    try:
+        if isinstance(percent_str, (int, float)):
+            return float(percent_str)
+        if isinstance(percent_str, str):
+            cleaned_str = percent_str.replace('%', '').replace(',', '.').strip()
+            if cleaned_str:
+                return float(cleaned_str)
+        return 0.0
+    except ValueError:
+        return 0.0
+
+
+def converter_percentuais(serie):
+    """Versão vetorizada de `parse_percent_string` para uma coluna inteira."""
+    limpos = (
+        serie.astype(str)
+        .str.replace('%', '', regex=False)
+        .str.replace(',', '.', regex=False)
+        .str.strip()
+    )
+    limpos = limpos.where(limpos != '', '0')
+    try:
+        return limpos.astype(float)
+    except ValueError:
+        # Só cai aqui se houver algum texto não numérico, que vira 0.0 como em parse_percent_string
+        return pd.to_numeric(limpos, errors='coerce').fillna(0.0)
+
+
+def converter_decimais(serie):
+    """Converte números no formato da planilha ("1.234,5" ou "0,95") para float; vazios viram NaN."""
+    textos = serie.astype(str).str.strip()
+    com_virgula = textos.str.contains(',', regex=False)
+    if com_virgula.any():
+        # Com vírgula decimal, o ponto é separador de milhar
+        textos = textos.where(~com_virgula, textos.str.replace('.', '', regex=False).str.replace(',', '.', regex=False))
+    textos = textos.where(textos != '', 'nan')
+    try:
+        return textos.astype(float)
+    except ValueError:
+        # Textos não numéricos (ex.: "#DIV/0!") também viram NaN
+        return pd.to_numeric(textos, errors='coerce').astype(float)
+
+
+def formatar_decimal(valor):
+    """Formata um número como na planilha, com vírgula decimal e sem zeros à direita (vazio se NaN)."""
+    if pd.isnull(valor):
+        return ""
+    return f"{float(valor):.6f}".rstrip('0').rstrip('.').replace('.', ',')
+
+
+def converter_datas(serie):
+    """Converte uma coluna de datas DD/MM/AAAA, tratando células vazias como NaT."""
+    textos = serie.astype(str).str.strip()
+    # Com errors='coerce' as células vazias já viram NaT
+    datas = pd.to_datetime(textos, format=FORMATO_DATA, errors='coerce')
+    # Valores preenchidos fora do formato padrão ainda passam pela inferência com dia primeiro
+    pendentes = datas.isna() & (textos != '')
+    if pendentes.any():
+        datas[pendentes] = pd.to_datetime(textos[pendentes], errors='coerce', dayfirst=True, format='mixed')
+    return datas
+
+
+def extrair_autor_base(serie):
+    """Remove o "(Editado em DD/MM/AAAA HH:MM)" do autor e converte para maiúsculas."""
+    # Passa o padrão em texto para o pandas usar o motor de regex vetorizado da coluna;
+    # com o objeto compilado ele recai em um laço Python por linha
+    return serie.str.replace(REGEX_TIMESTAMP_AUTOR.pattern, '', regex=True).str.upper()
+
+
+def compactar_texto(serie):
+    """Converte a coluna de texto em categórica se ela tiver poucos valores distintos."""
+    # Um único factorize serve para medir a cardinalidade e montar as categorias; ordenadas,
+    # para a ordenação da coluna continuar sendo a alfabética
+    codigos, categorias = pd.factorize(serie, sort=True)
+    if len(serie) and len(categorias) <= LIMITE_CARDINALIDADE_CATEGORIA * len(serie):
+        return pd.Series(pd.Categorical.from_codes(codigos, categories=categorias), index=serie.index, name=serie.name)
+    return serie
+
+
+def converter_colunas(df):
+    """Converte cada coluna bruta da planilha para o seu tipo; os textos continuam objetos Python.
+
+    HH e índices viram float e as datas datetime com NaT nos vazios.
+    """
+    for col in COLUNAS_TEXTO:
+        if col in df.columns:
+            df[col] = df[col].astype(str).fillna('')
+
+    for col in COLUNAS_NUMERICAS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+
+    for col in COLUNAS_DECIMAIS:
+        if col in df.columns:
+            df[col] = converter_decimais(df[col])
+
+    for col in COLUNAS_PERCENTUAIS:
+        if col in df.columns:
+            df[col] = converter_percentuais(df[col])
+
+    for col in COLUNAS_DATA:
+        if col in df.columns:
+            df[col] = converter_datas(df[col])
+
+    # Nome base do autor, sem o timestamp de edição, para o filtro insensível a maiúsculas
+    if "AUTOR" in df.columns:
+        df['AUTOR_BASE'] = extrair_autor_base(df['AUTOR'])
+
+    return df
+
+
+def compactar_colunas(df):
+    """Converte as colunas de texto repetitivo (e AUTOR_BASE) em categóricas."""
+    for col in COLUNAS_TEXTO + ['AUTOR_BASE']:
+        if col in df.columns and col not in COLUNAS_NAO_CATEGORICAS:
+            df[col] = compactar_texto(df[col])
+    return df
+
+
+def processar_dados(df):
+    """Converte as colunas brutas da planilha para os tipos usados pela aplicação.
+
+    Textos repetitivos viram categóricos, HH e índices viram float e as datas
+    datetime com NaT nos vazios.
+    """
+    return compactar_colunas(converter_colunas(df))
+
+
+def atribuir_valor(df, df_index, col, valor):
+    """Grava um valor em uma célula, incluindo-o nas categorias se a coluna for categórica."""
+    serie = df[col]
+    if isinstance(serie.dtype, pd.CategoricalDtype) and pd.notnull(valor) and valor not in serie.cat.categories:
+        df[col] = serie.cat.set_categories(sorted([*serie.cat.categories, valor]))
+    df.at[df_index, col] = valor
+
+
+def como_texto(df):
+    """Cópia do DataFrame com as colunas categóricas de volta a texto (para widgets editáveis)."""
+    categoricas = [col for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype)]
+    return df.astype({col: str for col in categoricas})
+
+
+def relatorio_memoria(df):
+    """Memória ocupada por coluna, com o tipo e a quantidade de valores distintos, da maior para a menor."""
+    memoria = df.memory_usage(index=False, deep=True)
+    return pd.DataFrame({
+        "tipo": df.dtypes.astype(str),
+        "distintos": df.nunique(),
+        "bytes": memoria,
+    }).sort_values("bytes", ascending=False)
+
+
+def processar_linha(valores):
+    """Converte uma linha no formato gravado na planilha para os tipos do DataFrame."""
+    return processar_dados(pd.DataFrame([valores]))
@@ -0,0 +1,314 @@
+"""Árvore da EDT de cada OS, com % CONCLUIDA ponderado pelo HH e datas consolidados em cada nó."""
+import collections
+import copy
+import datetime
+import math
+
+import numpy as np
+import pandas as pd
+
+from evm import em_dias
+
+# Contribuição de uma tarefa (ou soma de várias) para um nó:
+# hh, hh × %, quantidade de tarefas, soma dos %, menor início e maior término (em dias, NaN se vazio)
+Agregado = collections.namedtuple("Agregado", "hh hh_perc quantidade soma_perc inicio termino")
+VAZIO = Agregado(0.0, 0.0, 0, 0.0, math.nan, math.nan)
+
+# Nó da árvore: códigos dos filhos, df_index das tarefas com exatamente este código (em
+# ordem), o agregado dessas tarefas e o total com os descendentes
+No = collections.namedtuple("No", "filhos tarefas proprio total")
+
+ResumoEDT = collections.namedtuple("ResumoEDT", "os edt nivel tarefas hh perc_concluida inicio termino")
+ResumoEDT.__doc__ = """Consolidado de um nó: `perc_concluida` é ponderado pelo HH Orçado
+(média simples se o nó não tem HH) e `inicio`/`termino` são o menor início
+e o maior término contratual das tarefas abaixo dele."""
+
+_EPOCA = datetime.date(1970, 1, 1)
+
+
+def codigo_edt(edt):
+    """Quebra o código da EDT ("1.2.3") na tupla de níveis ("1", "2", "3"); vazio é a raiz da OS."""
+    if pd.isna(edt):
+        return ()
+    return tuple(parte.strip() for parte in str(edt).split(".") if parte.strip())
+
+
+def nome_os(os_val):
+    """OS como chave da árvore: o texto sem espaços nas pontas; vazio se não houver."""
+    return "" if pd.isna(os_val) else str(os_val).strip()
+
+
+def _ordem_natural(codigo):
+    return [(0, int(parte), "") if parte.isdigit() else (1, 0, parte) for parte in codigo]
+
+
+def _menor(a, b):
+    return b if math.isnan(a) else a if math.isnan(b) else min(a, b)
+
+
+def _maior(a, b):
+    return b if math.isnan(a) else a if math.isnan(b) else max(a, b)
+
+
+def somar(agregados):
+    """Combina agregados: soma HH, % e quantidades; menor início e maior término."""
+    hh = hh_perc = soma_perc = 0.0
+    quantidade = 0
+    inicio = termino = math.nan
+    for agregado in agregados:
+        hh += agregado.hh
+        hh_perc += agregado.hh_perc
+        quantidade += agregado.quantidade
+        soma_perc += agregado.soma_perc
+        inicio = _menor(inicio, agregado.inicio)
+        termino = _maior(termino, agregado.termino)
+    return Agregado(hh, hh_perc, quantidade, soma_perc, inicio, termino)
+
+
+def _data(dias):
+    return None if math.isnan(dias) else _EPOCA + datetime.timedelta(days=int(dias))
+
+
+def contribuicoes(df):
+    """Colunas de cada tarefa usadas na consolidação, como arrays: hh, hh × %, %, início e término (dias).
+
+    HH e % vazios contam como zero; datas vazias ficam NaN.
+    """
+    def coluna(col):
+        return df[col].to_numpy(dtype=float, na_value=np.nan) if col in df.columns else np.full(len(df), np.nan)
+
+    def datas(col):
+        return em_dias(df[col]) if col in df.columns else np.full(len(df), np.nan)
+
+    hh = np.nan_to_num(coluna("HH Orçado"))
+    perc = np.nan_to_num(coluna("% CONCLUIDA"))
+    return {"hh": hh, "hh_perc": hh * perc, "soma_perc": perc,
+            "inicio": datas("INÍCIO CONTRATUAL"), "termino": datas("TÉRMINO CONTRATUAL")}
+
+
+def agregar(df):
+    """Agregado de todas as tarefas do DataFrame."""
+    if not len(df):
+        return VAZIO
+    valores = contribuicoes(df)
+    return Agregado(
+        float(valores["hh"].sum()), float(valores["hh_perc"].sum()), len(df), float(valores["soma_perc"].sum()),
+        float(np.nanmin(valores["inicio"])) if not np.isnan(valores["inicio"]).all() else math.nan,
+        float(np.nanmax(valores["termino"])) if not np.isnan(valores["termino"]).all() else math.nan,
+    )
+
+
+class ArvoreEDT:
+    """Árvore de nós `(OS, código da EDT)` montada a partir da numeração da EDT.
+
+    Cada nó guarda as tarefas com exatamente aquele código e o total
+    consolidado de tudo abaixo dele. A montagem agrega a planilha inteira de
+    uma vez, nível a nível; `atualizar` reposiciona as tarefas editadas
+    recalculando só os nós do caminho delas até a raiz da OS. Os nós são
+    imutáveis e `copiar` é rasa, então a árvore acompanha os retratos de
+    `cache_dados.DadosTarefas` como os outros índices.
+    """
+
+    def __init__(self, df):
+        self._nos = {}
+        self._posicao = {}  # df_index -> chave do nó da tarefa
+        if not len(df):
+            return
+
+        # Cada par (OS, código da EDT) distinto é um nó com tarefas. OS e EDT são normalizados uma vez
+        # por valor distinto e numerados pelo resultado, pois textos diferentes ("1.2", "1.2.", " 1.2")
+        # dão o mesmo nó; a posição extra no fim de cada tabela atende os vazios (código -1 do factorize)
+        codigos_os, valores_os = pd.factorize(df["OS"])
+        codigos_edt, valores_edt = pd.factorize(df["EDT"])
+        numero_os, numero_codigo = {}, {}
+        os_do_valor = np.array([numero_os.setdefault(nome_os(os_val), len(numero_os)) for os_val in [*valores_os, None]])
+        codigo_do_valor = np.array(
+            [numero_codigo.setdefault(codigo_edt(edt), len(numero_codigo)) for edt in [*valores_edt, None]]
+        )
+        nomes_os, codigos = list(numero_os), list(numero_codigo)
+        grupos, pares = pd.factorize(os_do_valor[codigos_os] * len(codigos) + codigo_do_valor[codigos_edt])
+        chaves_proprias = [(nomes_os[par // len(codigos)], codigos[par % len(codigos)]) for par in pares.tolist()]
+
+        valores = pd.DataFrame(contribuicoes(df))
+        por_grupo = valores.groupby(grupos)
+        proprios = pd.concat(
+            [por_grupo[["hh", "hh_perc", "soma_perc"]].sum(), por_grupo.size().rename("quantidade"),
+             por_grupo["inicio"].min(), por_grupo["termino"].max()],
+            axis=1,
+        ).sort_index()
+
+        # df_index das tarefas de cada grupo, em ordem: fatias de uma única lista ordenada pelo grupo
+        indices = df.index.to_numpy()[np.argsort(grupos, kind="stable")].tolist()
+        limites = np.cumsum(np.bincount(grupos, minlength=len(pares))).tolist()
+        tarefas = (tuple(indices[inicio:fim]) for inicio, fim in zip([0] + limites[:-1], limites))
+        self._posicao = dict(zip(df.index.tolist(), (chaves_proprias[g] for g in grupos.tolist())))
+
+        # Numera todos os nós, incluindo os ancestrais sem tarefa própria e a raiz de cada OS
+        numero = {}
+        pais = []
+        for chave in chaves_proprias:
+            os_val, codigo = chave
+            filho = None
+            for nivel in range(len(codigo), -1, -1):
+                atual = (os_val, codigo[:nivel])
+                existente = numero.get(atual)
+                if filho is not None:
+                    pais[filho] = existente if existente is not None else len(pais)
+                if existente is not None:
+                    break
+                numero[atual] = filho = len(pais)
+                pais.append(-1)
+        chaves = list(numero)
+        pais = np.array(pais)
+        niveis = np.array([len(codigo) for _, codigo in chaves])
+
+        # Totais: começam pelo próprio de cada nó e sobem nível a nível até a raiz
+        proprios_por_no = {campo: np.zeros(len(chaves)) for campo in Agregado._fields}
+        for campo in ("inicio", "termino"):
+            proprios_por_no[campo][:] = np.nan
+        linhas_proprias = np.array([numero[chave] for chave in chaves_proprias])
+        for campo in Agregado._fields:
+            proprios_por_no[campo][linhas_proprias] = proprios[campo].to_numpy(dtype=float)
+        totais = {campo: valores_campo.copy() for campo, valores_campo in proprios_por_no.items()}
+        for nivel in range(int(niveis.max()), 0, -1):
+            nos_nivel = np.flatnonzero(niveis == nivel)
+            destino = pais[nos_nivel]
+            for campo in ("hh", "hh_perc", "quantidade", "soma_perc"):
+                np.add.at(totais[campo], destino, totais[campo][nos_nivel])
+            np.fmin.at(totais["inicio"], destino, totais["inicio"][nos_nivel])
+            np.fmax.at(totais["termino"], destino, totais["termino"][nos_nivel])
+
+        filhos = collections.defaultdict(set)
+        for no, pai in enumerate(pais.tolist()):
+            if pai >= 0:
+                filhos[pai].add(chaves[no][1])
+        tarefas_por_no = dict(zip(linhas_proprias.tolist(), tarefas))
+
+        def agregados(colunas):
+            colunas["quantidade"] = colunas["quantidade"].astype(np.int64)
+            return map(Agregado._make, zip(*(colunas[campo].tolist() for campo in Agregado._fields)))
+
+        # Folhas e nós sem tarefa própria compartilham os valores vazios, o que poupa objetos na carga
+        sem_filhos = frozenset()
+        for no, chave, proprio, total in zip(range(len(chaves)), chaves, agregados(proprios_por_no), agregados(totais)):
+            tarefas_no = tarefas_por_no.get(no)
+            self._nos[chave] = No(
+                frozenset(filhos[no]) if no in filhos else sem_filhos,
+                tarefas_no or (),
+                proprio if tarefas_no else VAZIO,
+                total,
+            )
+
+    def copiar(self):
+        """Cópia rasa: os nós são compartilhados, pois `atualizar` sempre os substitui."""
+        copia = copy.copy(self)
+        copia._nos = dict(self._nos)
+        copia._posicao = dict(self._posicao)
+        return copia
+
+    def atualizar(self, df, indices):
+        """Reposiciona as tarefas `indices` do DataFrame (já atualizado) e recalcula só os caminhos afetados."""
+        for df_index in indices:
+            chave_nova = (nome_os(df.at[df_index, "OS"]), codigo_edt(df.at[df_index, "EDT"]))
+            chave_antiga = self._posicao.get(df_index)
+            if chave_antiga is not None and chave_antiga != chave_nova:
+                no = self._nos[chave_antiga]
+                self._nos[chave_antiga] = no._replace(tarefas=tuple(i for i in no.tarefas if i != df_index))
+                self._recalcular_caminho(df, chave_antiga)
+
+            self._garantir_caminho(chave_nova)
+            no = self._nos[chave_nova]
+            if df_index not in no.tarefas:
+                self._nos[chave_nova] = no._replace(tarefas=tuple(sorted((*no.tarefas, df_index))))
+            self._posicao[df_index] = chave_nova
+            self._recalcular_caminho(df, chave_nova)
+
+    def _garantir_caminho(self, chave):
+        os_val, codigo = chave
+        for nivel in range(len(codigo) + 1):
+            atual = (os_val, codigo[:nivel])
+            if atual not in self._nos:
+                self._nos[atual] = No(frozenset(), (), VAZIO, VAZIO)
+                if nivel:
+                    pai = (os_val, codigo[:nivel - 1])
+                    self._nos[pai] = self._nos[pai]._replace(filhos=self._nos[pai].filhos | {codigo[:nivel]})
+
+    def _recalcular_caminho(self, df, chave):
+        """Recalcula o nó e seus ancestrais, removendo os que ficaram sem tarefas e sem filhos."""
+        os_val, codigo = chave
+        for nivel in range(len(codigo), -1, -1):
+            atual = (os_val, codigo[:nivel])
+            no = self._nos[atual]
+            if not no.tarefas and not no.filhos:
+                del self._nos[atual]
+                if nivel:
+                    pai = (os_val, codigo[:nivel - 1])
+                    self._nos[pai] = self._nos[pai]._replace(filhos=self._nos[pai].filhos - {codigo[:nivel]})
+                continue
+            # Só no nó da tarefa as próprias mudam; nos ancestrais basta somar os filhos de novo
+            proprio = agregar(df.loc[list(no.tarefas)]) if nivel == len(codigo) else no.proprio
+            total = somar([proprio, *(self._nos[(os_val, filho)].total for filho in no.filhos)])
+            self._nos[atual] = no._replace(proprio=proprio, total=total)
+
+    def _resumo(self, os_val, codigo):
+        total = self._nos[(os_val, codigo)].total
+        if total.hh > 0:
+            perc = total.hh_perc / total.hh
+        else:
+            perc = total.soma_perc / total.quantidade if total.quantidade else math.nan
+        return ResumoEDT(os_val, ".".join(codigo), len(codigo), total.quantidade, total.hh, perc,
+                         _data(total.inicio), _data(total.termino))
+
+    def oss(self):
+        """OS presentes na árvore, em ordem natural."""
+        return sorted((os_val for os_val, codigo in self._nos if not codigo), key=lambda os_val: _ordem_natural((os_val,)))
+
+    def no(self, os_val, edt=""):
+        """Consolidado de um nó (a OS inteira com `edt` vazio), ou None se ele não existe."""
+        codigo = codigo_edt(edt)
+        os_val = nome_os(os_val)
+        return self._resumo(os_val, codigo) if (os_val, codigo) in self._nos else None
+
+    def caminho(self, os_val, edt):
+        """Consolidados da raiz da OS até o nó `edt`, inclusive."""
+        codigo = codigo_edt(edt)
+        os_val = nome_os(os_val)
+        return [self._resumo(os_val, codigo[:nivel]) for nivel in range(len(codigo) + 1)
+                if (os_val, codigo[:nivel]) in self._nos]
+
+    def linhas(self, os_val, profundidade=None):
+        """Consolidados da OS em pré-ordem (pai antes dos filhos, filhos em ordem natural), até `profundidade` níveis."""
+        os_val = nome_os(os_val)
+        if (os_val, ()) not in self._nos:
+            return []
+        resultado = []
+        pilha = [()]
+        while pilha:
+            codigo = pilha.pop()
+            resultado.append(self._resumo(os_val, codigo))
+            if profundidade is None or len(codigo) < profundidade:
+                filhos = sorted(self._nos[(os_val, codigo)].filhos, key=_ordem_natural, reverse=True)
+                pilha.extend(filhos)
+        return resultado
+
+
+def descrever_caminho(resumos):
+    """Resumo em texto de `ArvoreEDT.caminho`: o % consolidado de cada nível, da OS até a tarefa."""
+    def nivel(resumo):
+        perc = f"{resumo.perc_concluida:.1f}".replace(".", ",") if not math.isnan(resumo.perc_concluida) else "—"
+        return f"{resumo.edt or 'OS ' + resumo.os}: {perc}%"
+    return " › ".join(nivel(resumo) for resumo in resumos)
+
+
+def tabela(resumos):
+    """DataFrame para exibição de uma lista de consolidados, com a EDT recuada pelo nível."""
+    return pd.DataFrame(
+        {
+            "EDT": [" " * resumo.nivel + (resumo.edt or f"OS {resumo.os}") for resumo in resumos],
+            "TAREFAS": [resumo.tarefas for resumo in resumos],
+            "HH Orçado": [resumo.hh for resumo in resumos],
+            "% CONCLUIDA": [resumo.perc_concluida for resumo in resumos],
+            "INÍCIO": [resumo.inicio for resumo in resumos],
+            "TÉRMINO": [resumo.termino for resumo in resumos],
+        }
+    )
@@ -0,0 +1,306 @@
+"""Gravação das edições na planilha, célula a célula, por uma fila em segundo plano."""
+import collections
+import functools
+import itertools
+import random
+import threading
+import time
+
+import gspread
+import pandas as pd
+import requests
+
+from dados import (
+    COLUNAS_DATA, COLUNAS_DECIMAIS, COLUNAS_ESPERADAS, COLUNAS_NUMERICAS, COLUNAS_PERCENTUAIS, FORMATO_DATA,
+    formatar_decimal,
+)
+from limitador import PRIORIDADE_ESCRITA, em_prioridade
+
+# Códigos HTTP que indicam limite de uso ou falha passageira do Google, e valem nova tentativa
+CODIGOS_TEMPORARIOS = (429, 500, 502, 503, 504)
+
+# Estados de uma edição enviada para a fila
+PENDENTE = "pendente"
+GRAVANDO = "gravando"
+GRAVADA = "gravada"
+FALHOU = "falhou"
+
+# Colunas carimbadas pela aplicação em toda gravação; sozinhas não contam como alteração
+COLUNAS_DE_REGISTRO = ("AUTOR", "EMAIL")
+
+
+def get_column_letter(n):
+    """Converte um número de coluna em letra do Google Sheets (A, B, ..., Z, AA, AB, etc.)"""
+    result = ""
+    while n:
+        n, remainder = divmod(n - 1, 26)
+        result = chr(65 + remainder) + result
+    return result
+
+
+@functools.lru_cache(maxsize=8)
+def letras_das_colunas(cabecalho):
+    """Mapeia cada nome de coluna do cabeçalho (tupla) para a sua letra na planilha."""
+    return {nome: get_column_letter(i + 1) for i, nome in enumerate(cabecalho)}
+
+
+def formatar_valor(col, valor):
+    """Formata um valor do DataFrame como o formulário o grava na planilha."""
+    if col in COLUNAS_DATA:
+        valor = pd.to_datetime(valor, errors='coerce')
+        return valor.strftime(FORMATO_DATA) if pd.notnull(valor) else ""
+    if col in COLUNAS_PERCENTUAIS:
+        return f"{float(valor):.1f}"
+    if col in COLUNAS_NUMERICAS:
+        return str(int(valor)) if pd.notnull(valor) else "0"
+    if col in COLUNAS_DECIMAIS:
+        return formatar_decimal(valor)
+    return str(valor)
+
+
+def valores_da_tarefa(tarefa):
+    """Retorna a linha carregada no mesmo formato de texto usado na gravação."""
+    return {col: formatar_valor(col, tarefa[col]) for col in COLUNAS_ESPERADAS if col in tarefa.index}
+
+
+def calcular_alteracoes(originais, novos):
+    """Retorna `{coluna: valor}` só com as células cujo valor mudou.
+
+    Se nada além das colunas de registro (AUTOR, EMAIL) mudou, retorna um
+    dicionário vazio: não há o que gravar.
+    """
+    alteracoes = {
+        col: str(valor) for col, valor in novos.items()
+        if str(valor) != originais.get(col)
+    }
+    if all(col in COLUNAS_DE_REGISTRO for col in alteracoes):
+        return {}
+    return alteracoes
+
+
+def montar_atualizacoes(linha, alteracoes, cabecalho):
+    """Monta os intervalos de `batch_update` para as células alteradas de uma linha."""
+    letras = letras_das_colunas(tuple(cabecalho))
+    return [
+        {"range": f"{letras[col]}{linha}", "values": [[valor]]}
+        for col, valor in alteracoes.items()
+    ]
+
+
+def erro_temporario(erro):
+    """Indica se vale repetir a chamada: limite de uso (429), erro 5xx ou falha de rede."""
+    if isinstance(erro, gspread.exceptions.APIError):
+        codigo = getattr(erro.response, "status_code", None) or erro.code
+        return codigo in CODIGOS_TEMPORARIOS
+    return isinstance(erro, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+
+class FilaEscrita:
+    """Fila de gravações na planilha atendida por uma thread em segundo plano.
+
+    Edições da mesma linha que ainda não foram enviadas são mescladas (o valor
+    mais recente de cada célula vence) e as linhas pendentes seguem juntas em
+    um `batch_update`, até `max_linhas_por_lote` (200) por chamada. Erros
+    temporários são repetidos com espera
+    exponencial e jitter. Cada chamada a `enviar` retorna um protocolo cujo
+    estado pode ser consultado com `estado()`.
+    """
+
+    def __init__(self, sheet, obter_cabecalho, ao_falhar=None, max_tentativas=6,
+                 espera_base=1.0, espera_maxima=32.0, max_linhas_por_lote=200, historico=1000):
+        self._sheet = sheet
+        self._obter_cabecalho = obter_cabecalho
+        self._ao_falhar = ao_falhar
+        self.max_tentativas = max_tentativas
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+        self.max_linhas_por_lote = max_linhas_por_lote
+
+        self._condicao = threading.Condition()
+        self._pendentes = {}  # linha -> {coluna: valor}
+        self._em_voo = {}  # lote sendo gravado agora, no mesmo formato
+        self._protocolos_por_linha = {}  # linha -> [protocolos aguardando]
+        self._estados = collections.OrderedDict()
+        self._historico = historico
+        self._contador = itertools.count(1)
+
+        self._thread = threading.Thread(target=self._trabalhar, name="fila-escrita", daemon=True)
+        self._thread.start()
+
+    def enviar(self, linha, alteracoes):
+        """Enfileira as células alteradas de uma linha e retorna o protocolo da edição."""
+        return self.enviar_lote({linha: alteracoes})
+
+    def enviar_lote(self, alteracoes_por_linha):
+        """Enfileira várias linhas de uma vez, para seguirem juntas no mesmo `batch_update`.
+
+        Retorna um único protocolo, considerado gravado quando todas as linhas forem gravadas.
+        """
+        with self._condicao:
+            protocolo = next(self._contador)
+            for linha, alteracoes in alteracoes_por_linha.items():
+                self._pendentes.setdefault(linha, {}).update(alteracoes)
+                self._protocolos_por_linha.setdefault(linha, []).append(protocolo)
+            self._estados[protocolo] = {
+                "estado": PENDENTE, "linhas": sorted(alteracoes_por_linha), "erro": None,
+                "enviada_em": time.time(), "restantes": set(alteracoes_por_linha),
+            }
+            while len(self._estados) > self._historico:
+                self._estados.popitem(last=False)
+            self._condicao.notify_all()
+            return protocolo
+
+    def estado(self, protocolo):
+        """Retorna o estado de uma edição (pendente, gravando, gravada ou falhou), ou None se desconhecida."""
+        with self._condicao:
+            estado = self._estados.get(protocolo)
+            if estado is None:
+                return None
+            return {chave: valor for chave, valor in estado.items() if chave != "restantes"}
+
+    def aguardar(self, protocolo, tempo_limite=None):
+        """Espera a edição ser gravada ou falhar e retorna seu estado (o atual, se o tempo acabar)."""
+        with self._condicao:
+            self._condicao.wait_for(
+                lambda: self._estados.get(protocolo, {}).get("estado") in (GRAVADA, FALHOU, None),
+                tempo_limite,
+            )
+            return self.estado(protocolo)
+
+    def pendentes(self):
+        """Quantidade de linhas aguardando gravação."""
+        with self._condicao:
+            return len(self._pendentes)
+
+    def alteracoes_pendentes(self, linha):
+        """Células da linha enfileiradas ou sendo gravadas, que uma leitura da planilha ainda não mostra."""
+        with self._condicao:
+            return {**self._em_voo.get(linha, {}), **self._pendentes.get(linha, {})}
+
+    def todas_alteracoes_pendentes(self):
+        """`{linha: {coluna: valor}}` de todas as linhas enfileiradas ou sendo gravadas."""
+        with self._condicao:
+            return {
+                linha: {**self._em_voo.get(linha, {}), **self._pendentes.get(linha, {})}
+                for linha in {**self._em_voo, **self._pendentes}
+            }
+
+    def _marcar(self, protocolos, estado, erro=None):
+        for protocolo in protocolos:
+            if protocolo in self._estados and self._estados[protocolo]["estado"] != FALHOU:
+                self._estados[protocolo]["estado"] = estado
+                self._estados[protocolo]["erro"] = erro
+        self._condicao.notify_all()
+
+    def _marcar_gravadas(self, protocolos_por_linha):
+        """Marca as linhas como gravadas; o protocolo só fica gravado quando todas as suas linhas forem."""
+        for linha, protocolos in protocolos_por_linha.items():
+            for protocolo in protocolos:
+                estado = self._estados.get(protocolo)
+                if estado is None or estado["estado"] == FALHOU:
+                    continue
+                estado["restantes"].discard(linha)
+                if not estado["restantes"]:
+                    estado["estado"] = GRAVADA
+        self._condicao.notify_all()
+
+    def _retirar_lote(self):
+        """Retira até `max_linhas_por_lote` linhas pendentes (chamado com a condição adquirida)."""
+        linhas = list(self._pendentes)[:self.max_linhas_por_lote]
+        lote = {linha: self._pendentes.pop(linha) for linha in linhas}
+        protocolos = {linha: self._protocolos_por_linha.pop(linha) for linha in linhas}
+        self._marcar([p for ps in protocolos.values() for p in ps], GRAVANDO)
+        self._em_voo = lote
+        return lote, protocolos
+
+    def _devolver_lote(self, lote, protocolos):
+        """Devolve linhas à fila; edições feitas enquanto elas estavam em voo têm prioridade."""
+        for linha, alteracoes in lote.items():
+            self._pendentes[linha] = {**alteracoes, **self._pendentes.get(linha, {})}
+            self._protocolos_por_linha[linha] = protocolos[linha] + self._protocolos_por_linha.get(linha, [])
+            self._marcar(protocolos[linha], PENDENTE)
+
+    def _gravar(self, lote):
+        cabecalho = self._obter_cabecalho()
+        atualizacoes = [
+            intervalo
+            for linha, alteracoes in lote.items()
+            for intervalo in montar_atualizacoes(linha, alteracoes, cabecalho)
+        ]
+        self._sheet.batch_update(atualizacoes)
+
+    def _gravar_separadas(self, lote, protocolos):
+        """Grava as linhas de um lote uma a uma e retorna as que falharam de vez.
+
+        Só os protocolos das linhas que falharam ficam como FALHOU; linhas com
+        erro temporário voltam para a fila.
+        """
+        falharam = []
+        for linha, alteracoes in lote.items():
+            try:
+                self._gravar({linha: alteracoes})
+            except Exception as e:
+                with self._condicao:
+                    if erro_temporario(e):
+                        self._devolver_lote({linha: alteracoes}, {linha: protocolos[linha]})
+                        continue
+                    self._marcar(protocolos[linha], FALHOU, str(e))
+                print(f"Erro ao gravar a linha {linha}: {e}")
+                falharam.append(linha)
+                continue
+            with self._condicao:
+                self._marcar_gravadas({linha: protocolos[linha]})
+        with self._condicao:
+            self._em_voo = {}
+        return falharam
+
+    def _trabalhar(self):
+        # As chamadas desta thread (inclusive a leitura do cabeçalho) passam à frente na cota do Sheets
+        with em_prioridade(PRIORIDADE_ESCRITA):
+            self._atender()
+
+    def _atender(self):
+        tentativa = 0
+        while True:
+            with self._condicao:
+                while not self._pendentes:
+                    self._condicao.wait()
+                lote, protocolos = self._retirar_lote()
+
+            try:
+                self._gravar(lote)
+            except Exception as e:
+                tentativa += 1
+                if erro_temporario(e) and tentativa < self.max_tentativas:
+                    espera = random.uniform(0, min(self.espera_maxima, self.espera_base * 2 ** tentativa))
+                    print(f"Gravação de {len(lote)} linha(s) falhou ({e}); nova tentativa em {espera:.1f} s")
+                    with self._condicao:
+                        self._em_voo = {}
+                        self._devolver_lote(lote, protocolos)
+                    time.sleep(espera)
+                    continue
+
+                tentativa = 0
+                if len(lote) > 1 and not erro_temporario(e):
+                    # O lote junta edições de várias sessões: um erro permanente (um intervalo inválido,
+                    # por exemplo) costuma vir de uma linha só, então cada linha é tentada sozinha
+                    print(f"Gravação de {len(lote)} linha(s) falhou ({e}); gravando uma linha por vez")
+                    falharam = self._gravar_separadas(lote, protocolos)
+                else:
+                    print(f"Erro ao gravar as linhas {sorted(lote)}: {e}")
+                    with self._condicao:
+                        self._em_voo = {}
+                        self._marcar([p for ps in protocolos.values() for p in ps], FALHOU, str(e))
+                    falharam = sorted(lote)
+                if falharam and self._ao_falhar:
+                    try:
+                        self._ao_falhar(falharam)
+                    except Exception as erro_callback:
+                        # Um erro aqui não pode derrubar a thread: as próximas edições ficariam pendentes para sempre
+                        print(f"Erro ao tratar a falha na gravação das linhas {falharam}: {erro_callback}")
+                continue
+
+            tentativa = 0
+            with self._condicao:
+                self._em_voo = {}
+                self._marcar_gravadas(protocolos)
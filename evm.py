@@ -0,0 +1,119 @@
+"""Valor agregado (EVM) das tarefas em horas-homem, calculado de uma vez para a carteira inteira."""
+import numpy as np
+import pandas as pd
+
+# Colunas de saída de `calcular_evm`. BAC é o HH Orçado; PV, EV e AC são o valor planejado,
+# o agregado e o custo real até a data de referência
+COLUNAS_EVM = ["BAC", "% PLANEJADO", "PV", "EV", "AC", "SPI", "CPI", "EAC"]
+
+# Agrupamentos disponíveis para a consolidação: rótulo exibido -> coluna do DataFrame
+AGRUPAMENTOS = {"OS": "OS", "DISCIPLINA": "DISCIPLINA", "AUTOR": "AUTOR_BASE"}
+
+# Colunas do DataFrame de tarefas necessárias para o cálculo
+COLUNAS_NECESSARIAS = ["HH Orçado", "ACWP_HH", "% CONCLUIDA", "INÍCIO CONTRATUAL", "TÉRMINO CONTRATUAL"]
+
+
+def _dividir(numerador, denominador):
+    """Divisão elemento a elemento com NaN onde o denominador é zero ou vazio."""
+    resultado = np.full(np.shape(numerador), np.nan)
+    np.divide(numerador, denominador, out=resultado, where=np.nan_to_num(denominador) != 0)
+    return resultado
+
+
+def em_dias(datas):
+    """Datas do DataFrame como dias desde a época (float, NaN nos vazios)."""
+    dias = datas.to_numpy(dtype="datetime64[D]")
+    resultado = dias.astype(np.int64).astype(float)
+    resultado[np.isnat(dias)] = np.nan
+    return resultado
+
+
+def fracao_planejada(inicio, termino, hoje):
+    """Fração (0 a 1) do prazo contratual já decorrida em `hoje`, linear entre início e término.
+
+    `inicio` e `termino` são arrays de dias; sem as duas datas a fração é NaN.
+    Tarefas de um dia só (início = término) valem 0 antes e 1 a partir dele.
+    """
+    dia = float(np.datetime64(hoje, "D").astype(np.int64))
+    duracao = termino - inicio
+    fracao = _dividir(dia - inicio, duracao)
+    fracao = np.where(duracao == 0, (dia >= inicio).astype(float), fracao)
+    fracao = np.clip(fracao, 0.0, 1.0)
+    fracao[np.isnan(inicio) | np.isnan(termino)] = np.nan
+    return fracao
+
+
+def calcular_evm(df, hoje):
+    """Calcula o valor agregado de cada tarefa em uma única passada vetorizada.
+
+    PV = BAC × fração do prazo contratual decorrida em `hoje`; EV = BAC ×
+    % CONCLUIDA; AC = ACWP_HH informado. SPI = EV/PV, CPI = EV/AC e EAC = BAC/CPI
+    (com AC zerado, EAC = BAC). Retorna um DataFrame com `COLUNAS_EVM` e o mesmo
+    índice de `df`.
+    """
+    bac = df["HH Orçado"].to_numpy(dtype=float, na_value=np.nan)
+    ac = df["ACWP_HH"].to_numpy(dtype=float, na_value=np.nan)
+    concluida = df["% CONCLUIDA"].to_numpy(dtype=float, na_value=np.nan) / 100.0
+    fracao = fracao_planejada(em_dias(df["INÍCIO CONTRATUAL"]), em_dias(df["TÉRMINO CONTRATUAL"]), hoje)
+
+    pv = bac * fracao
+    ev = bac * concluida
+    cpi = _dividir(ev, ac)
+    eac = np.where(np.nan_to_num(ac) == 0, bac, _dividir(bac, cpi))
+    return pd.DataFrame(
+        {
+            "BAC": bac,
+            "% PLANEJADO": fracao * 100.0,
+            "PV": pv,
+            "EV": ev,
+            "AC": ac,
+            "SPI": _dividir(ev, pv),
+            "CPI": cpi,
+            "EAC": eac,
+        },
+        index=df.index,
+    )
+
+
+def consolidar(evm, grupos):
+    """Soma BAC, PV, EV e AC por grupo e recalcula os índices sobre as somas.
+
+    `grupos` é a série (mesmo índice de `evm`) com o grupo de cada tarefa. Os
+    índices da carteira vêm das somas, não da média dos índices das tarefas.
+    Retorna um DataFrame por grupo, com a quantidade de tarefas, ordenado pelo grupo.
+    """
+    codigos, rotulos = pd.factorize(grupos, sort=True)
+    validos = codigos >= 0
+    codigos = codigos[validos]
+    n = len(rotulos)
+
+    def somar(col):
+        return np.bincount(codigos, weights=np.nan_to_num(evm[col].to_numpy()[validos]), minlength=n)
+
+    bac, pv, ev, ac = (somar(col) for col in ("BAC", "PV", "EV", "AC"))
+    cpi = _dividir(ev, ac)
+    return pd.DataFrame(
+        {
+            "TAREFAS": np.bincount(codigos, minlength=n),
+            "BAC": bac,
+            "% PLANEJADO": _dividir(pv, bac) * 100.0,
+            "% CONCLUÍDO": _dividir(ev, bac) * 100.0,
+            "PV": pv,
+            "EV": ev,
+            "AC": ac,
+            "SPI": _dividir(ev, pv),
+            "CPI": cpi,
+            "EAC": np.where(ac == 0, bac, _dividir(bac, cpi)),
+        },
+        index=pd.Index(np.asarray(rotulos), name=grupos.name),
+    )
+
+
+def descrever(linha):
+    """Resumo em texto do valor agregado de uma tarefa (uma linha de `calcular_evm`); "—" onde não há como calcular."""
+    def numero(valor, casas):
+        return f"{valor:.{casas}f}".replace(".", ",") if pd.notnull(valor) else "—"
+    return (
+        f"{numero(linha['% PLANEJADO'], 1)}% planejado, SPI {numero(linha['SPI'], 2)}, "
+        f"CPI {numero(linha['CPI'], 2)}, EAC {numero(linha['EAC'], 1)} HH"
+    )
@@ -1,16 +1,15 @@
 import streamlit as st
-import pandas as pd
-import gspread
-from google.oauth2.service_account import Credentials
 import json
-from datetime import datetime, date
-import pytz
-import re
+from datetime import date
 import os
-from streamlit_oauth import OAuth2Component
-from oauth2client.service_account import ServiceAccountCredentials
-import requests
-from dotenv import load_dotenv
+from perfil_inicio import fase, marco, resumo
+from metricas import API, ETAPA, Metricas, iniciar_servidor
+
+# Na tela de login só o necessário para o botão do Google é importado; o resto
+# (pandas, gspread, google-auth...) é importado depois que o usuário entra
+with fase("imports da tela de login"):
+    from streamlit_oauth import OAuth2Component
+    from dotenv import load_dotenv
 
 load_dotenv()
 
@@ -28,8 +27,60 @@ EMAILS_AUTORIZADOS = [
 st.set_page_config(page_title="Gerenciador de Tarefas", page_icon="icone-quanta.png", layout="wide")
 st.logo("logo-quanta-oficial.png", size="large")
 
+# Conexões HTTP mantidas abertas por processo e tempo limite, em segundos, de cada chamada ao Google
+TAMANHO_POOL_HTTP = int(os.getenv("TAMANHO_POOL_HTTP", "10"))
+TEMPO_LIMITE_HTTP_SEGUNDOS = float(os.getenv("TEMPO_LIMITE_HTTP_SEGUNDOS", "30"))
+
+# Chamadas ao Sheets por minuto que o processo inteiro pode fazer, de leitura e de escrita, e quantas
+# podem sair de uma vez; com as duas somadas abaixo da cota do Google (60 por minuto por usuário),
+# rajadas de várias sessões esperam a vez em vez de receberem 429. O Drive (a sonda de alteração da
+# planilha) tem uma cota à parte no Google e um balde próprio. Cota 0 desliga o limite daquele tipo
+COTA_LEITURAS_POR_MINUTO = int(os.getenv("COTA_LEITURAS_POR_MINUTO", "50"))
+COTA_ESCRITAS_POR_MINUTO = int(os.getenv("COTA_ESCRITAS_POR_MINUTO", "50"))
+COTA_DRIVE_POR_MINUTO = int(os.getenv("COTA_DRIVE_POR_MINUTO", "60"))
+RAJADA_COTA = int(os.getenv("RAJADA_COTA", "10"))
+
+# PORTA_METRICAS liga o endpoint /metrics do Prometheus; METRICAS_LOG=1 imprime no log uma linha
+# JSON de cada medida; PAINEL_DEPURACAO=1 mostra os tempos por etapa na barra lateral. O log JSON fica
+# desligado por padrão: com uma linha por chamada à API de cada sessão, ele encobriria os demais logs,
+# e as mesmas medidas já ficam acumuladas no /metrics
+PORTA_METRICAS = os.getenv("PORTA_METRICAS")
+METRICAS_LOG = os.getenv("METRICAS_LOG", "") == "1"
+PAINEL_DEPURACAO = os.getenv("PAINEL_DEPURACAO", "") == "1"
+
+@st.cache_resource # Métricas do processo inteiro e, se configurado, o servidor que as exporta
+def obter_metricas():
+    metricas = Metricas(registrar_log=METRICAS_LOG)
+    if PORTA_METRICAS:
+        iniciar_servidor(metricas, int(PORTA_METRICAS))
+    return metricas
+
+@st.cache_resource # Uma única cota do Sheets e do Drive por processo, respeitada por todas as sessões e threads
+def obter_limitador():
+    return LimitadorCota(COTA_LEITURAS_POR_MINUTO, COTA_ESCRITAS_POR_MINUTO, COTA_DRIVE_POR_MINUTO, rajada=RAJADA_COTA)
+
+@st.cache_resource # Um único pool de conexões por processo, usado pelo userinfo e pelo Sheets
+def obter_camada_http():
+    return CamadaHTTP(
+        tamanho_pool=TAMANHO_POOL_HTTP, tempo_limite=TEMPO_LIMITE_HTTP_SEGUNDOS,
+        metricas=obter_metricas(), limitador=obter_limitador(),
+    )
+
+@st.cache_resource # E-mails já identificados, por token, compartilhados entre as sessões
+def obter_cache_usuarios():
+    return CacheUsuarios(EMAILS_AUTORIZADOS)
+
 oauth2 = OAuth2Component(CLIENT_ID, CLIENT_SECRET, AUTHORIZE_ENDPOINT, TOKEN_ENDPOINT, TOKEN_ENDPOINT, REVOKE_ENDPOINT)
 
+metricas = obter_metricas()
+# Etapas medidas nesta execução do script; o painel de depuração mostra as da execução anterior
+etapas_execucao_anterior = st.session_state.get("etapas_execucao", [])
+st.session_state["etapas_execucao"] = etapas_execucao = []
+
+def medir(etapa):
+    """Mede um trecho da execução como uma etapa nas métricas do processo."""
+    return metricas.medir(etapa, etapas_execucao)
+
 if 'token' not in st.session_state:
     result = oauth2.authorize_button(
         name="Continuar com o Google",
@@ -40,26 +91,48 @@ if 'token' not in st.session_state:
         use_container_width=True,
         pkce='S256',
     )
+    marco("tela de login renderizada")
     if result:
         st.session_state['token'] = result.get('token')
         st.rerun()
 else:
-    # ===== INÍCIO DO BLOCO CORRIGIDO =====
+    with fase("imports da autenticação"):
+        import requests
+        from autenticacao import CacheUsuarios, buscar_email, token_nao_autorizado
+        from http_google import CamadaHTTP
+        from limitador import LimitadorCota
+
     token = st.session_state['token']
-    
-    # Define o endpoint de userinfo do Google
-    user_info_endpoint = "https://www.googleapis.com/oauth2/v1/userinfo"
-    
-    # Cria o cabeçalho de autorização com o token de acesso
-    headers = {'Authorization': f'Bearer {token["access_token"]}'}
-    
+    cache_usuarios = obter_cache_usuarios()
+    camada_http = obter_camada_http()
+
+    def buscar_email_compartilhado(access_token):
+        return buscar_email(access_token, sessao=camada_http.sessao)
+
+    def identificar_usuario(token):
+        """Retorna `((email, autorizado), token)`, renovando o token se o Google responder 401."""
+        try:
+            return cache_usuarios.obter(token, buscar=buscar_email_compartilhado), token
+        except requests.exceptions.HTTPError as e:
+            if not token_nao_autorizado(e):
+                raise
+        # Token expirado ou revogado: descarta o que havia em cache e renova com o refresh_token
+        cache_usuarios.descartar(token)
+        try:
+            token = oauth2.refresh_token(token, force=True)
+        except Exception as e:
+            print(f"Não foi possível renovar o token de acesso: {e}")
+            del st.session_state['token']
+            st.rerun()
+        st.session_state['token'] = token
+        return cache_usuarios.obter(token, buscar=buscar_email_compartilhado), token
+
     user_email = None # Inicializa a variável
+    usuario_autorizado = False
     try:
-        # Faz a chamada GET para a API do Google
-        user_info_response = requests.get(user_info_endpoint, headers=headers)
-        user_info_response.raise_for_status() # Lança um erro para códigos de status ruins (4xx ou 5xx)
-        user_info = user_info_response.json()
-        user_email = user_info.get('email')
+        # O e-mail fica em cache por token até ele expirar, evitando a chamada ao userinfo a cada interação
+        with medir("identificar_usuario"):
+            (user_email, usuario_autorizado), token = identificar_usuario(token)
 
     except requests.exceptions.RequestException as e:
         st.error(f"Erro ao buscar informações do usuário: {e}")
@@ -69,9 +142,26 @@ else:
             st.rerun()
         st.stop() # Para a execução se não conseguir pegar o e-mail
 
-    if user_email and user_email in EMAILS_AUTORIZADOS:
+    if user_email and usuario_autorizado:
         st.sidebar.write(f"Logado como: {user_email}")
 
+        with fase("imports da planilha e dos dados"):
+            import pandas as pd
+            import gspread
+            from google.oauth2.service_account import Credentials
+            from dados import COLUNAS_DATA, COLUNAS_ESPERADAS, como_texto, ler_planilha, processar_dados, processar_linha, validar_cabecalho
+            from cache_dados import CacheDados
+            from modelo_leitura import ModeloLeitura
+            from indices import indice_df, linha_planilha
+            from leitura_parcial import LINHA_ALTERADA, LINHA_MOVIDA, conferir_linha, ler_linha, ler_linhas, ler_listagem, tarefas_das_linhas
+            from regras import agora_brasilia, campos_calculados, formatar_data, validar_percentual
+            from consultas import STATUS, formatar_para_exibicao, paginar
+            from frescor import VerificadorFrescor, criar_sonda
+            from edt import descrever_caminho, tabela as tabela_edt
+            from evm import AGRUPAMENTOS, COLUNAS_NECESSARIAS as COLUNAS_EVM_NECESSARIAS, calcular_evm, consolidar, descrever
+            from snapshot_local import SnapshotLocal
+            from escrita import FALHOU, GRAVADA, GRAVANDO, PENDENTE, FilaEscrita, calcular_alteracoes, formatar_valor, valores_da_tarefa
+
         lista_autores = ["ALEXANDRE", "ARQ QUANTA", "BBRUNO MATHIAS", "BRUNO ALMEIDA", "BRUNO MATHIAS", "CAMILA", "CAROLINA", "GABRIEL M", "GABRIEL M. / MATHEUS F./CAROL", "GABRIEL MEURER", "IVANESSa", "KAYKE CHELI", "LEO", "MATHEUS F.", "MATHEUS FERREIRA", "TARCISIO", "TERCEIRIZADO - CAURIN", "TERCEIRIZADO - TEKRA", "THATY", "THATY E CAROL", "VANESSA", "VINICIUS COORD", "VITINHO", "WANDER"]
 
         SCOPE = ['https://spreadsheets.google.com/feeds',
@@ -93,8 +183,8 @@ else:
                 # Cria credenciais usando google.oauth2 (mais moderno)
                 creds = Credentials.from_service_account_info(credentials_info, scopes=SCOPE)
 
-                # Autoriza o cliente gspread
-                client = gspread.authorize(creds)
+                # Autoriza o cliente gspread sobre o pool de conexões compartilhado
+                client = gspread.authorize(creds, session=obter_camada_http().sessao_autorizada(creds))
 
                 # Abre a planilha pelo ID e pega a primeira aba
                 sheet = client.open_by_key('1ZzMXgfnGvplabe9eNDCUXUbjuCXLieSgbpPUqAtBYOU').sheet1  
@@ -104,114 +194,332 @@ else:
                 st.error(f"Erro ao autenticar com o Google Sheets: {e}")
                 return None
 
-        colunas_esperadas = [
-            "% CONCLUIDA", "MEMORIAL DE CÁLCULO", "MEMORIAL DE DESCRITIVO", "EDT", "OS",
-            "PRODUTO", "NOME DA OS", "TIPO DE PROJETO", "NOME DA TAREFA", "DISCIPLINA",
-            "SUBDISCIPLINA", "AUTOR", "RESPONSAVEL TÉCNICO (Lider)", "INÍCIO CONTRATUAL",
-            "TÉRMINO CONTRATUAL", "INÍCIO REAL", "TÉRMINO REAL", "DATA REVISÃO DOC",
-            "DATA REVISÃO PROJETO", "DURAÇÃO PLANEJADA (DIAS)", "DURAÇÃO REAL (DIAS)",
-            "% AVANÇO PLANEJADO", "% AVANÇO REAL", "HH Orçado", "BCWS_HH", "BCWP_HH",
-            "ACWP_HH", "SPI_HH", "CPI_HH", "EAC_HH", "OBSERVAÇÕES", "EMAIL"
-        ]
-        
-        def carregar_dados(sheet):
+        # Tempo máximo, em segundos, que os dados da planilha ficam em cache
+        CACHE_TTL_SEGUNDOS = int(os.getenv("CACHE_TTL_SEGUNDOS", "300"))
+
+        # Com SONDA_FRESCOR ("drive" ou "sentinela"), o cache expirado só é baixado de novo se a
+        # planilha mudou, então o TTL acima pode ser curto; a sonda roda no máximo uma vez por intervalo
+        SONDA_FRESCOR = os.getenv("SONDA_FRESCOR", "")
+        INTERVALO_SONDA_SEGUNDOS = int(os.getenv("INTERVALO_SONDA_SEGUNDOS", "30"))
+        # Mesmo com a marca igual, a planilha é lida de novo depois de IDADE_MAXIMA_DADOS_SEGUNDOS: a
+        # sentinela só vê o intervalo que confere, e mudanças fora dele apareceriam só ao reiniciar o processo
+        IDADE_MAXIMA_DADOS_SEGUNDOS = int(os.getenv("IDADE_MAXIMA_DADOS_SEGUNDOS", "3600"))
+
+        # Com ATUALIZACAO_EM_SEGUNDO_PLANO=1 (padrão), os dados vencidos continuam sendo exibidos
+        # enquanto uma thread confere a planilha; só a primeira carga do processo espera pela API
+        ATUALIZACAO_EM_SEGUNDO_PLANO = os.getenv("ATUALIZACAO_EM_SEGUNDO_PLANO", "1") == "1"
+
+        # "valores" lê a grade bruta coluna a coluna; "registros" usa get_all_records; "projecao" lê só as
+        # colunas de listagem (leitura_parcial.COLUNAS_LISTAGEM) e a linha completa de cada tarefa aberta
+        MODO_LEITURA_PLANILHA = os.getenv("MODO_LEITURA_PLANILHA", "valores")
+
+        # Com ARQUIVO_SNAPSHOT (caminho de um arquivo SQLite), a planilha fica copiada em disco e cada
+        # atualização busca só as linhas que mudaram; o processo que reinicia parte do arquivo
+        ARQUIVO_SNAPSHOT = os.getenv("ARQUIVO_SNAPSHOT", "")
+
+        # Com ESPELHO_SQLITE=1, as duas abas consultam uma cópia das tarefas em SQLite, atualizada a cada
+        # carga e a cada edição. Desligado por padrão: os índices em memória respondem mais rápido
+        ESPELHO_SQLITE = os.getenv("ESPELHO_SQLITE", "") == "1"
+
+        # Quantas tarefas a lista de seleção da edição mostra: sem busca, as primeiras do autor; com busca, as mais relevantes
+        LIMITE_OPCOES_TAREFA = int(os.getenv("LIMITE_OPCOES_TAREFA", "50"))
+
+        colunas_esperadas = COLUNAS_ESPERADAS
+
+        @st.cache_resource # Um único cache de dados por processo, compartilhado entre as sessões
+        def obter_cache_dados():
+            return CacheDados(
+                ttl_segundos=CACHE_TTL_SEGUNDOS, modelo=ModeloLeitura() if ESPELHO_SQLITE else None,
+                em_segundo_plano=ATUALIZACAO_EM_SEGUNDO_PLANO,
+                max_idade_segundos=IDADE_MAXIMA_DADOS_SEGUNDOS,
+            )
+
+        @st.cache_resource # Um único arquivo de snapshot por processo
+        def obter_snapshot_local():
+            return SnapshotLocal(ARQUIVO_SNAPSHOT) if ARQUIVO_SNAPSHOT else None
+
+        def carregar_dados(sheet, snapshot):
+            """Lê e processa a planilha inteira. Não usa o `st`: pode rodar na thread de atualização."""
+            with medir("leitura_planilha"):
+                if snapshot:
+                    df, cabecalho = snapshot.carregar(sheet)
+                elif MODO_LEITURA_PLANILHA == "projecao":
+                    df, cabecalho = ler_listagem(sheet)
+                else:
+                    df, cabecalho = ler_planilha(sheet, MODO_LEITURA_PLANILHA)
+            with medir("processar_dados"):
+                df = processar_dados(df)
+            print(f"Planilha carregada: {len(df)} linhas ocupando {df.memory_usage(deep=True).sum() / 1e6:.1f} MB")
+            return df, cabecalho
+
+        def sincronizar_snapshot(sheet, snapshot):
+            """Busca só as linhas alteradas desde a última sincronização (None se for preciso remontar tudo)."""
+            with medir("sincronizar_snapshot"):
+                return snapshot.atualizar(sheet)
+
+        def ler_cabecalho(sheet):
+            """Retorna a linha de cabeçalho da planilha, lida uma única vez por carga dos dados."""
+            try:
+                return obter_cache_dados().obter_cabecalho(lambda: sheet.row_values(1))
+            except gspread.exceptions.GSpreadException as e:
+                st.error(f"Erro ao ler o cabeçalho da planilha. Detalhes: {e}")
+                st.stop()
+
+        @st.cache_resource # Uma única sonda de mudanças por processo, compartilhada entre as sessões
+        def obter_verificador_frescor(_sheet):
+            if not SONDA_FRESCOR:
+                return None
+            return VerificadorFrescor(criar_sonda(SONDA_FRESCOR, _sheet), INTERVALO_SONDA_SEGUNDOS)
+
+        def obter_dados(sheet):
+            """Retorna os dados da planilha (DataFrame e índices) a partir do cache compartilhado."""
+            verificador = obter_verificador_frescor(sheet)
+            snapshot = obter_snapshot_local()
+            fila = obter_fila_escrita(sheet)
             try:
-                dados = sheet.get_all_records(expected_headers=colunas_esperadas)
+                with fase("primeira carga dos dados"):
+                    return obter_cache_dados().obter(
+                        lambda: carregar_dados(sheet, snapshot),
+                        marca=verificador.marca if verificador else None,
+                        atualizar=(lambda: sincronizar_snapshot(sheet, snapshot)) if snapshot else None,
+                        # Edições ainda não gravadas continuam aparecendo depois de uma recarga
+                        pendentes=lambda: {indice_df(linha): valores for linha, valores in fila.todas_alteracoes_pendentes().items()},
+                    )
             except gspread.exceptions.GSpreadException as e:
                 st.error(f"Erro ao carregar dados da planilha. Verifique se a lista 'colunas_esperadas' no código corresponde EXATAMENTE aos cabeçalhos e número de colunas na sua planilha. Detalhes: {e}")
                 st.stop()
-            
-            df = pd.DataFrame(dados)
-            
-            text_cols_to_force_str = [
-                "EDT", "OS", "NOME DA TAREFA", "MEMORIAL DE CÁLCULO", "MEMORIAL DE DESCRITIVO", 
-                "PRODUTO", "NOME DA OS", "TIPO DE PROJETO", "DISCIPLINA", "SUBDISCIPLINA", 
-                "AUTOR", "RESPONSAVEL TÉCNICO (Lider)", "HH Orçado", "BCWS_HH", "BCWP_HH", 
-                "ACWP_HH", "SPI_HH", "CPI_HH", "EAC_HH", "OBSERVAÇÕES", "EMAIL"
-            ]
-            for col in text_cols_to_force_str:
-                if col in df.columns:
-                    df[col] = df[col].astype(str).fillna('') 
-                    
-            numeric_cols_to_force_num = [
-                "DURAÇÃO PLANEJADA (DIAS)", "DURAÇÃO REAL (DIAS)"
-            ]
-            for col in numeric_cols_to_force_num:
-                if col in df.columns:
-                    df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-                    
-            for col in ["% CONCLUIDA", "% AVANÇO PLANEJADO", "% AVANÇO REAL"]:
-                if col in df.columns:
-                    df[col] = df[col].apply(parse_percent_string)
-
-            date_cols = ["INÍCIO CONTRATUAL", "TÉRMINO CONTRATUAL", "INÍCIO REAL", "TÉRMINO REAL", 
-                        "DATA REVISÃO DOC", "DATA REVISÃO PROJETO"]
-            for col in date_cols:
-                if col in df.columns:
-                    df[col] = df[col].apply(lambda x: None if str(x).strip() == '' else x)
-                    df[col] = pd.to_datetime(df[col], errors='coerce', dayfirst=True)
-            
-            # --- Nova parte para extrair o nome base do autor ---
-            if "AUTOR" in df.columns:
-                # Regex para encontrar o nome base antes de "(Editado em DD/MM/YYYY HH:MM)"
-                # ou o nome completo se não houver timestamp
-                df['AUTOR_BASE'] = df['AUTOR'].apply(lambda x: re.sub(r'\s*\(Editado em \d{2}/\d{2}/\d{4} \d{2}:\d{2}\)$', '', x) if isinstance(x, str) else x)
-                # Converte para maiúsculas para facilitar a comparação insensível a maiúsculas/minúsculas
-                df['AUTOR_BASE'] = df['AUTOR_BASE'].str.upper()
-            # --- Fim da nova parte ---
-
-            return df
-
-        def get_column_letter(n):
-            """Converte um número de coluna em letra do Google Sheets (A, B, ..., Z, AA, AB, etc.)"""
-            result = ""
-            while n:
-                n, remainder = divmod(n - 1, 26)
-                result = chr(65 + remainder) + result
-            return result
-
-        def atualizar_linha(sheet, idx, nova_linha_valores):
-            try:
-                coluna_final = get_column_letter(len(nova_linha_valores))
-                range_name = f"A{idx}:{coluna_final}{idx}"
-                
-                sheet.update(values=[nova_linha_valores], range_name=range_name)
-                return True
-            except Exception as e:
-                print(f"Erro ao atualizar a linha {idx}: {e}")
-                st.error(f"Erro ao atualizar a linha: {e}. Verifique o console para mais detalhes.")
-                return False
 
-        def parse_percent_string(percent_str):
+        def restaurar_linhas(sheet, linhas):
+            """Depois de uma gravação que falhou de vez, volta só essas linhas do cache ao que a planilha tem.
+
+            Roda na thread da fila de gravação, sem o `st`. Se algo der errado (a leitura, ou uma linha que
+            não está mais nos dados carregados), descarta o cache todo.
+            """
+            cache_dados = obter_cache_dados()
             try:
-                if isinstance(percent_str, (int, float)):
-                    return float(percent_str)
-                if isinstance(percent_str, str):
-                    cleaned_str = percent_str.replace('%', '').replace(',', '.').strip()
-                    if cleaned_str:
-                        return float(cleaned_str)
-                return 0.0
-            except ValueError:
-                return 0.0
+                lidas = ler_linhas(sheet, cache_dados.obter_cabecalho(lambda: sheet.row_values(1)), linhas)
+                fila = obter_fila_escrita(sheet)
+                # Edições mais novas dessas linhas, ainda na fila, continuam valendo
+                cache_dados.aplicar_linhas(
+                    {indice_df(linha): {**valores, **fila.alteracoes_pendentes(linha)} for linha, valores in lidas.items()}
+                )
+            except Exception as e:
+                print(f"Não foi possível restaurar as linhas {linhas} após a falha na gravação: {e}")
+                cache_dados.invalidar()
+
+        @st.cache_resource # Uma única fila de gravação por processo, atendida em segundo plano
+        def obter_fila_escrita(_sheet):
+            return FilaEscrita(
+                _sheet,
+                obter_cabecalho=lambda: obter_cache_dados().obter_cabecalho(lambda: _sheet.row_values(1)),
+                # Se a gravação falhar de vez, só as linhas que falharam deixam de mostrar a edição não salva
+                ao_falhar=lambda linhas: restaurar_linhas(_sheet, linhas),
+            )
+
+        def atualizar_linha(sheet, idx, alteracoes):
+            """Enfileira a gravação das células alteradas da linha `idx` e retorna o protocolo da edição.
+
+            A edição é aplicada na hora no cache e no espelho, para aparecer sem esperar a gravação.
+            """
+            with medir("atualizar_linha"):
+                protocolo = obter_fila_escrita(sheet).enviar(idx, alteracoes)
+                obter_cache_dados().aplicar_linha(indice_df(idx), alteracoes)
+            return protocolo
+
+        def ler_tarefa_aberta(sheet, linha, versao):
+            """Linha completa (`{coluna: texto}`) da tarefa aberta no formulário, lida uma vez por seleção e por versão dos dados.
+
+            Quando o cache compartilhado muda de versão (edição de outra sessão ou
+            atualização em segundo plano), a linha é lida de novo, para que a
+            leitura nunca fique mais antiga que a listagem.
+            """
+            chave = (linha, versao)
+            lida = st.session_state.get("tarefa_aberta")
+            if lida is None or lida[0] != chave:
+                try:
+                    with medir("ler_tarefa"):
+                        valores = ler_linha(sheet, ler_cabecalho(sheet), linha)
+                except gspread.exceptions.GSpreadException as e:
+                    st.error(f"Erro ao ler a tarefa na planilha. Detalhes: {e}")
+                    st.stop()
+                # Edições desta linha que ainda estão na fila valem sobre o que a planilha mostra
+                lida = (chave, {**valores, **obter_fila_escrita(sheet).alteracoes_pendentes(linha)})
+                st.session_state["tarefa_aberta"] = lida
+            return lida[1]
+
+        def tarefas_para_lote(sheet, dados, tarefas_do_autor):
+            """Linhas completas das tarefas do autor; na leitura por projeção, lidas em uma chamada por versão dos dados."""
+            if set(COLUNAS_ESPERADAS) <= set(dados.df.columns):
+                return dados.df.loc[list(tarefas_do_autor)]
+            chave = (dados.versao, tuple(tarefas_do_autor))
+            lidas = st.session_state.get("lote_lido")
+            if lidas is None or lidas[0] != chave:
+                try:
+                    with medir("ler_tarefa"):
+                        linhas = ler_linhas(sheet, ler_cabecalho(sheet), [linha_planilha(i) for i in tarefas_do_autor])
+                except gspread.exceptions.GSpreadException as e:
+                    st.error(f"Erro ao ler as tarefas na planilha. Detalhes: {e}")
+                    st.stop()
+                fila = obter_fila_escrita(sheet)
+                # Linhas que agora têm outra tarefa ficam de fora, para não gravar na tarefa errada;
+                # edições ainda na fila valem sobre o que a planilha mostra
+                linhas = {
+                    linha: {**valores, **fila.alteracoes_pendentes(linha)} for linha, valores in linhas.items()
+                    if conferir_linha(dados.df.loc[indice_df(linha)], valores) != LINHA_MOVIDA
+                }
+                lidas = st.session_state["lote_lido"] = (chave, tarefas_das_linhas(linhas))
+            return lidas[1]
+
+        def registrar_edicao(protocolo, descricao):
+            """Guarda o protocolo da edição na sessão para acompanhar a gravação na barra lateral."""
+            st.session_state.setdefault("edicoes_enviadas", []).append((protocolo, descricao))
+
+        def editar_em_lote(sheet, dados, tarefas_do_autor):
+            """Grade com as tarefas em aberto do autor; todas as linhas alteradas são gravadas juntas."""
+            colunas_grade = ["OS", "EDT", "NOME DA TAREFA", "% CONCLUIDA", "OBSERVAÇÕES"]
+            tarefas_df = tarefas_para_lote(sheet, dados, tarefas_do_autor)
+            # Colunas categóricas viram texto, senão o data_editor as mostra como lista de opções
+            originais = como_texto(tarefas_df[colunas_grade])
+
+            with st.form(key="editar_lote_form"):
+                editadas = st.data_editor(
+                    originais,
+                    hide_index=True,
+                    use_container_width=True,
+                    disabled=["OS", "EDT", "NOME DA TAREFA"],
+                    column_config={
+                        "% CONCLUIDA": st.column_config.NumberColumn(min_value=0.0, max_value=100.0, step=0.1, format="%.1f"),
+                    },
+                )
+                salvar = st.form_submit_button("Salvar alterações")
+
+            if not salvar:
+                return
+
+            agora = agora_brasilia()
+            alteracoes_por_linha = {}
+            erros = []
+            for df_index in originais.index:
+                tarefa = tarefas_df.loc[df_index]
+                perc_antiga = float(tarefa["% CONCLUIDA"])
+                perc_nova = editadas.at[df_index, "% CONCLUIDA"]
+                perc_nova = perc_antiga if pd.isnull(perc_nova) else float(perc_nova)
+                observacoes = editadas.at[df_index, "OBSERVAÇÕES"]
+                observacoes = str(tarefa["OBSERVAÇÕES"]) if pd.isnull(observacoes) else str(observacoes)
+
+                # Aplica as mesmas regras do formulário de uma tarefa a cada linha alterada
+                novos = {"% CONCLUIDA": f"{perc_nova:.1f}", "OBSERVAÇÕES": observacoes}
+                novos.update(campos_calculados(tarefa, perc_nova, user_email, agora))
+                alteracoes = calcular_alteracoes(valores_da_tarefa(tarefa), novos)
+                if not alteracoes:
+                    continue
+
+                rotulo = tarefas_do_autor[df_index]
+                erro_percentual = validar_percentual(perc_antiga, perc_nova, pd.notnull(tarefa["INÍCIO REAL"]))
+                if erro_percentual:
+                    erros.append(f"{rotulo}: {erro_percentual}")
+                    continue
+                linhas_da_tarefa = dados.localizar(tarefa["OS"], tarefa["EDT"], tarefa["NOME DA TAREFA"])
+                if len(linhas_da_tarefa) != 1:
+                    erros.append(f"{rotulo}: a tarefa aparece {len(linhas_da_tarefa)} vezes na planilha com a mesma OS, EDT e NOME DA TAREFA.")
+                    continue
+                alteracoes_por_linha[linhas_da_tarefa[0]] = (df_index, alteracoes)
+
+            if erros:
+                st.error("❌ Nenhuma alteração foi salva. Corrija as tarefas abaixo e tente novamente:\n\n" + "\n".join(f"- {erro}" for erro in erros))
+                return
+            if not alteracoes_por_linha:
+                st.info("Nenhuma alteração para salvar.")
+                return
+
+            # Todas as linhas seguem juntas para a fila e são gravadas no mesmo batch_update
+            with medir("atualizar_linha"):
+                protocolo = obter_fila_escrita(sheet).enviar_lote(
+                    {linha: alteracoes for linha, (_, alteracoes) in alteracoes_por_linha.items()}
+                )
+                obter_cache_dados().aplicar_linhas(dict(alteracoes_por_linha.values()))
+            registrar_edicao(protocolo, f"Lote com {len(alteracoes_por_linha)} tarefa(s)")
+            st.rerun()
 
+        @st.fragment(run_every=2)
+        def painel_edicoes(sheet):
+            """Mostra na barra lateral o andamento das últimas edições enviadas nesta sessão."""
+            edicoes = st.session_state.get("edicoes_enviadas", [])
+            if not edicoes:
+                return
+            fila = obter_fila_escrita(sheet)
+            icones = {PENDENTE: "⏳", GRAVANDO: "⏳", GRAVADA: "✅", FALHOU: "❌"}
+            st.caption("Últimas edições")
+            for protocolo, descricao in reversed(edicoes[-5:]):
+                estado = fila.estado(protocolo)
+                if estado is None:
+                    continue
+                st.caption(f"{icones[estado['estado']]} {descricao} — {estado['estado']}")
+                if estado["estado"] == FALHOU:
+                    st.error(f"Não foi possível gravar: {estado['erro']}")
 
         st.title("Gerenciador de Planilha")
 
-        sheet = autenticar_google_sheets()
+        with fase("autenticação no Google Sheets"), medir("autenticar_google_sheets"):
+            sheet = autenticar_google_sheets()
         if not sheet:
             st.stop()
 
-        temp_df_check = carregar_dados(sheet)
+        cache_dados = obter_cache_dados()
+        if st.sidebar.button("🔄 Recarregar dados da planilha"):
+            cache_dados.invalidar()
 
-        for col_check in ["EDT", "OS", "NOME DA TAREFA"]:
-            if col_check not in temp_df_check.columns:
-                st.error(f"A coluna '{col_check}' é essencial e não foi encontrada. Verifique a lista 'colunas_esperadas' ou sua planilha.")
-                st.stop()
+        # Valida só a linha de cabeçalho; o resultado fica memorizado até o cabeçalho mudar
+        essenciais_faltando, colunas_faltando = validar_cabecalho(ler_cabecalho(sheet))
+
+        for col_check in essenciais_faltando:
+            st.error(f"A coluna '{col_check}' é essencial e não foi encontrada. Verifique a lista 'colunas_esperadas' ou sua planilha.")
+            st.stop()
 
-        colunas_faltando = [col for col in colunas_esperadas if col not in temp_df_check.columns]
         if colunas_faltando:
             st.warning(f"⚠️ As seguintes colunas estão faltando na sua lista de 'colunas_esperadas' ou na planilha: {', '.join(colunas_faltando)}. Por favor, adicione-as.")
-        del temp_df_check
+
+        idade_cache = cache_dados.idade_segundos()
+        if idade_cache is not None:
+            if SONDA_FRESCOR:
+                st.sidebar.caption(f"Dados verificados há {int(idade_cache)} s (mudanças conferidas a cada {CACHE_TTL_SEGUNDOS} s; {cache_dados.recargas_evitadas} recarga(s) evitada(s))")
+            else:
+                st.sidebar.caption(f"Dados carregados há {int(idade_cache)} s (recarga automática a cada {CACHE_TTL_SEGUNDOS} s)")
+
+        with st.sidebar:
+            painel_edicoes(sheet)
+            with st.expander("Conexões HTTP"):
+                estatisticas_http = obter_camada_http().estatisticas()
+                st.caption(
+                    f"{estatisticas_http['requisicoes']} requisições em {estatisticas_http['conexoes_abertas']} conexões "
+                    f"({estatisticas_http['reaproveitamento']:.0%} reaproveitadas)"
+                )
+            with st.expander("Cota do Google"):
+                for tipo_cota, uso_cota in obter_limitador().uso().items():
+                    esperando = sum(uso_cota["esperando"].values())
+                    st.caption(
+                        f"{tipo_cota.capitalize()}: {uso_cota['ultimo_minuto']} de {uso_cota['por_minuto']} no último minuto, "
+                        f"{esperando} na fila, {uso_cota['esperas']} de {uso_cota['chamadas']} chamada(s) esperaram "
+                        f"({uso_cota['segundos_esperando']:.1f} s no total), {uso_cota['recusas']} recusa(s) do Google"
+                    )
+            medidas_inicio = resumo()
+            if medidas_inicio:
+                with st.expander("Perfil de inicialização"):
+                    for nome_fase, duracao, desde_inicio in medidas_inicio:
+                        st.caption(f"{nome_fase}: {duracao:.2f} s (em {desde_inicio:.2f} s)")
+            if PAINEL_DEPURACAO:
+                with st.expander("Tempos por etapa"):
+                    st.caption("Execução anterior")
+                    for etapa, segundos in etapas_execucao_anterior:
+                        st.caption(f"{etapa}: {segundos * 1000:.0f} ms")
+                    memoria = obter_dados(sheet).memoria()
+                    st.caption(f"Memória dos dados: {memoria['bytes'].sum() / 1e6:.1f} MB")
+                    for col, linha in memoria.head(5).iterrows():
+                        st.caption(f"{col} ({linha['tipo']}, {linha['distintos']} distintos): {linha['bytes'] / 1e6:.1f} MB")
+                    st.caption("Média no processo")
+                    for tipo in (ETAPA, API):
+                        for nome, (chamadas, erros, media) in metricas.resumo(tipo).items():
+                            st.caption(f"{nome}: {media * 1000:.0f} ms em {chamadas} chamada(s), {erros} erro(s)")
 
         aba = st.sidebar.radio("Escolha uma opção:", ["Editar Tarefa", "Visualizar Tarefas"])
 
@@ -220,54 +528,67 @@ else:
             st.header("✏️ Editar Tarefa")
 
             autor_filtro = st.selectbox("Selecione o autor para filtrar suas tarefas:", [""] + sorted(lista_autores))
+            marco("edição de tarefa renderizada")
 
             if autor_filtro:
-                dados_df = carregar_dados(sheet)
+                dados = obter_dados(sheet)
+                dados_df = dados.df
 
-                autor_filtro_upper = autor_filtro.upper()
-                
-                df_usuario = dados_df[
-                    (dados_df["AUTOR_BASE"] == autor_filtro_upper) & 
-                    (dados_df["% CONCLUIDA"] < 100.0)
-                ]
+                # Tarefas em aberto do autor, já agrupadas e rotuladas na carga dos dados
+                with medir("filtro_tarefas"):
+                    tarefas_do_autor = dados.tarefas_do_autor(autor_filtro.upper())
 
-                if df_usuario.empty:
+                if not tarefas_do_autor:
                     st.warning("Nenhuma tarefa encontrada para este usuário ou todas as tarefas estão 100% concluídas.")
                 else:
-                    opcoes_exibidas = [
-                        f"OS: {os_val} / EDT: {num} / Tarefa: {nome}"
-                        for os_val, num, nome in zip(df_usuario["OS"], df_usuario["EDT"], df_usuario["NOME DA TAREFA"])
-                    ]
-                    
-                    mapa_string_para_indice_df = {
-                        f"OS: {os_val} / EDT: {num} / Tarefa: {nome}": idx
-                        for idx, (os_val, num, nome) in enumerate(zip(df_usuario["OS"], df_usuario["EDT"], df_usuario["NOME DA TAREFA"]))
-                    }
-
-                    default_index = 0
-                    # Garante que o índice padrão seja válido para evitar erro se houver apenas uma opção
-                    if not opcoes_exibidas: 
-                        selecionado_exibido = None
+                    modo_edicao = st.radio("Modo de edição:", ["Uma tarefa", "Várias tarefas"], horizontal=True)
+                    if modo_edicao == "Várias tarefas":
+                        editar_em_lote(sheet, dados, tarefas_do_autor)
+                        st.stop()
+
+                    # A lista de seleção mostra só as primeiras tarefas; as demais são encontradas pela busca
+                    busca = st.text_input("Buscar tarefa:", placeholder="OS, EDT, nome da tarefa, nome da OS ou disciplina")
+                    if busca.strip():
+                        with medir("busca_tarefas"):
+                            opcoes = dados.buscar(busca, entre=tarefas_do_autor, limite=LIMITE_OPCOES_TAREFA)
+                        if not opcoes:
+                            st.warning("Nenhuma tarefa deste autor corresponde à busca.")
+                            st.stop()
                     else:
-                        selecionado_exibido = st.selectbox("Selecione a Tarefa:", options=opcoes_exibidas, index=default_index)
+                        opcoes = list(tarefas_do_autor)[:LIMITE_OPCOES_TAREFA]
+                        if len(tarefas_do_autor) > LIMITE_OPCOES_TAREFA:
+                            st.caption(f"Mostrando as primeiras {LIMITE_OPCOES_TAREFA} de {len(tarefas_do_autor)} tarefas; use a busca para encontrar as demais.")
 
-                    if selecionado_exibido:
-                        indice_no_df_usuario = mapa_string_para_indice_df[selecionado_exibido]
-                        tarefa = df_usuario.iloc[indice_no_df_usuario].copy()
-                            
-                        matched_rows_mask = (
-                                (dados_df["OS"].astype(str) == str(tarefa["OS"])) &
-                                (dados_df["EDT"].astype(str) == str(tarefa["EDT"])) &
-                                (dados_df["NOME DA TAREFA"].astype(str) == str(tarefa["NOME DA TAREFA"]))
-                        )                   
-
-                        if not dados_df[matched_rows_mask].empty:
-                                # Pega o primeiro índice (0-based) do DataFrame correspondente à tarefa
-                            df_index = dados_df[matched_rows_mask].index[0]
-                            linha_idx_para_atualizar = df_index + 2
-                        else:
+                    selecionado_df_index = st.selectbox("Selecione a Tarefa:", options=opcoes, format_func=tarefas_do_autor.get, index=0)
+
+                    if selecionado_df_index is not None:
+                        tarefa_listada = dados_df.loc[selecionado_df_index]
+
+                        linhas_da_tarefa = dados.localizar(tarefa_listada["OS"], tarefa_listada["EDT"], tarefa_listada["NOME DA TAREFA"])
+
+                        if not linhas_da_tarefa:
                             st.error("Erro: A tarefa selecionada não pôde ser encontrada na planilha principal com base em OS, EDT e NOME DA TAREFA. Isso pode indicar um problema de dados ou um cache desatualizado. Por favor, recarregue a página.")
                             st.stop()
+                        if len(linhas_da_tarefa) > 1:
+                            st.error(f"Erro: As linhas {', '.join(str(linha) for linha in linhas_da_tarefa)} da planilha têm a mesma OS, EDT e NOME DA TAREFA. Corrija a duplicidade na planilha antes de editar esta tarefa.")
+                            st.stop()
+
+                        linha_idx_para_atualizar = linhas_da_tarefa[0]
+
+                        # A linha completa é lida agora, com uma única leitura de intervalo, e conferida
+                        # com a listagem antes de qualquer gravação em linha_idx_para_atualizar
+                        valores_lidos = ler_tarefa_aberta(sheet, linha_idx_para_atualizar, dados.versao)
+                        situacao = conferir_linha(tarefa_listada, valores_lidos)
+                        if situacao == LINHA_MOVIDA:
+                            del st.session_state["tarefa_aberta"]
+                            cache_dados.invalidar()
+                            st.error(f"Erro: A linha {linha_idx_para_atualizar} da planilha não contém mais esta tarefa (linhas foram inseridas ou removidas). Os dados serão recarregados; selecione a tarefa novamente.")
+                            st.stop()
+                        if situacao == LINHA_ALTERADA:
+                            # A leitura é só desta sessão: o cache compartilhado se corrige na próxima atualização
+                            st.warning("Esta tarefa foi alterada na planilha depois que a lista foi carregada. O formulário mostra os valores lidos agora da planilha.")
+                        linha_lida = processar_linha(valores_lidos)
+                        tarefa = linha_lida.iloc[0]
 
                         st.info(f"Atualização na linha **{linha_idx_para_atualizar}** da planilha")
 
@@ -283,11 +604,14 @@ else:
                         termino_contratual_valor = pd.to_datetime(tarefa["TÉRMINO CONTRATUAL"], errors='coerce')
                         termino_contratual_data = termino_contratual_valor.date() if pd.notnull(termino_contratual_valor) else None
                         
-                        inicio_real_antigo = inicio_real_antigo_value.date() if inicio_real_antigo_preenchido else None
-                        termino_real_antigo = pd.to_datetime(tarefa["TÉRMINO REAL"], errors='coerce').date() if pd.notnull(pd.to_datetime(tarefa["TÉRMINO REAL"], errors='coerce')) else None
                         data_revisao_doc_antiga = pd.to_datetime(tarefa["DATA REVISÃO DOC"], errors='coerce').date() if pd.notnull(pd.to_datetime(tarefa["DATA REVISÃO DOC"], errors='coerce')) else None
                         data_revisao_projeto_antiga = pd.to_datetime(tarefa["DATA REVISÃO PROJETO"], errors='coerce').date() if pd.notnull(pd.to_datetime(tarefa["DATA REVISÃO PROJETO"], errors='coerce')) else None
 
+                        # Valores como o formulário os exibe, para gravar só o que o usuário mudar.
+                        # As datas contratuais vazias aparecem preenchidas com a data de hoje.
+                        valores_iniciais = valores_da_tarefa(tarefa)
+                        valores_iniciais["INÍCIO CONTRATUAL"] = (inicio_contratual_data or date.today()).strftime("%d/%m/%Y")
+                        valores_iniciais["TÉRMINO CONTRATUAL"] = (termino_contratual_data or date.today()).strftime("%d/%m/%Y")
 
                         with st.form(key="editar_form"):
                             perc_concluida = st.number_input("% CONCLUIDA", min_value=0.0, max_value=100.0, step=0.1, value=perc_concluida_antiga, format="%.1f")
@@ -316,54 +640,28 @@ else:
                             avanco_planejado = st.number_input("% AVANÇO PLANEJADO", min_value=0.0, max_value=100.0, step=0.1, value=float(tarefa["% AVANÇO PLANEJADO"]))
                             avanco_real = st.number_input("% AVANÇO REAL", min_value=0.0, max_value=100.0, step=0.1, value=float(tarefa["% AVANÇO REAL"]))
                             
-                            hh_orcado = st.text_input("HH Orçado", str(tarefa["HH Orçado"]))
-                            bcws_hh = st.text_input("BCWS_HH", str(tarefa["BCWS_HH"]))
-                            bcwp_hh = st.text_input("BCWP_HH", str(tarefa["BCWP_HH"]))
-                            acwp_hh = st.text_input("ACWP_HH", str(tarefa["ACWP_HH"]))
-                            spi_hh = st.text_input("SPI_HH", str(tarefa["SPI_HH"]))
-                            cpi_hh = st.text_input("CPI_HH", str(tarefa["CPI_HH"]))
-                            eac_hh = st.text_input("EAC_HH", str(tarefa["EAC_HH"]))
+                            st.caption(f"Calculado para hoje: {descrever(calcular_evm(linha_lida, agora_brasilia().date()).iloc[0])}")
+                            st.caption(f"Consolidado na EDT: {descrever_caminho(dados.arvore().caminho(tarefa['OS'], tarefa['EDT']))}")
+                            hh_orcado = st.text_input("HH Orçado", formatar_valor("HH Orçado", tarefa["HH Orçado"]))
+                            bcws_hh = st.text_input("BCWS_HH", formatar_valor("BCWS_HH", tarefa["BCWS_HH"]))
+                            bcwp_hh = st.text_input("BCWP_HH", formatar_valor("BCWP_HH", tarefa["BCWP_HH"]))
+                            acwp_hh = st.text_input("ACWP_HH", formatar_valor("ACWP_HH", tarefa["ACWP_HH"]))
+                            spi_hh = st.text_input("SPI_HH", formatar_valor("SPI_HH", tarefa["SPI_HH"]))
+                            cpi_hh = st.text_input("CPI_HH", formatar_valor("CPI_HH", tarefa["CPI_HH"]))
+                            eac_hh = st.text_input("EAC_HH", formatar_valor("EAC_HH", tarefa["EAC_HH"]))
                             observacoes = st.text_input("OBSERVAÇÕES", str(tarefa["OBSERVAÇÕES"]))
                             
 
                             atualizar = st.form_submit_button("Atualizar")
 
                             if atualizar:
-                                # --- Lógica de Validação para % CONCLUIDA e INÍCIO REAL ---
-                                if perc_concluida_antiga > 0 and perc_concluida == 0 and inicio_real_antigo_preenchido:
-                                    st.error("❌ Não é possível voltar o '% CONCLUIDA' para 0% se a tarefa já teve avanço e o 'INÍCIO REAL' foi preenchido.")
+                                erro_percentual = validar_percentual(perc_concluida_antiga, perc_concluida, inicio_real_antigo_preenchido)
+                                if erro_percentual:
+                                    st.error(f"❌ {erro_percentual}")
                                     st.stop()
-                                # --- Fim da Lógica de Validação ---
-
-                                fuso_brasilia = pytz.timezone("America/Sao_Paulo")
-                                agora_completa = datetime.now(fuso_brasilia) 
-                                agora_data = agora_completa.date() 
-
-                                if perc_concluida_antiga == 0.0 and perc_concluida > 0.0:
-                                    inicio_real_para_salvar = agora_data
-                                else:
-                                    inicio_real_para_salvar = inicio_real_antigo
 
-                                if perc_concluida_antiga < 100.0 and perc_concluida == 100.0:
-                                    termino_real_para_salvar = agora_data
-                                else:
-                                    termino_real_para_salvar = termino_real_antigo
-                                
-                                data_revisao_doc_para_salvar = data_revisao_doc_antiga
-                                data_revisao_projeto_para_salvar = data_revisao_projeto_antiga
-
-                                autor_original_da_tarefa = str(tarefa["AUTOR"])
-                                data_hora_edicao = agora_completa.strftime("%d/%m/%Y %H:%M")
-                                
-                                regex_timestamp = r'\s*\(Editado em \d{2}/\d{2}/\d{4} \d{2}:\d{2}\)$'
-                                
-                                if re.search(regex_timestamp, autor_original_da_tarefa):
-                                    autor_com_data_hora = re.sub(regex_timestamp, f' (Editado em {data_hora_edicao})', autor_original_da_tarefa)
-                                else:
-                                    autor_com_data_hora = f"{autor_original_da_tarefa} (Editado em {data_hora_edicao})"
-
-                                # Junta o e-mail do usuário com a data e hora da atualização
-                                email_com_timestamp = f"{user_email} (Atualizado em {data_hora_edicao})"
+                                # INÍCIO REAL, TÉRMINO REAL e os carimbos de AUTOR e EMAIL seguem as regras de edição
+                                calculados = campos_calculados(tarefa, perc_concluida, user_email, agora_brasilia())
 
                                 valores_para_salvar_dict = {
                                     "% CONCLUIDA": f"{perc_concluida:.1f}",
@@ -377,14 +675,14 @@ else:
                                     "NOME DA TAREFA": nome_tarefa,
                                     "DISCIPLINA": disciplina,
                                     "SUBDISCIPLINA": subdisciplina,
-                                    "AUTOR": autor_com_data_hora, 
+                                    "AUTOR": calculados["AUTOR"],
                                     "RESPONSAVEL TÉCNICO (Lider)": responsavel_tecnico,
                                     "INÍCIO CONTRATUAL": inicio_contratual.strftime("%d/%m/%Y") if inicio_contratual else "",
                                     "TÉRMINO CONTRATUAL": termino_contratual.strftime("%d/%m/%Y") if termino_contratual else "",
-                                    "INÍCIO REAL": inicio_real_para_salvar.strftime("%d/%m/%Y") if inicio_real_para_salvar else "",
-                                    "TÉRMINO REAL": termino_real_para_salvar.strftime("%d/%m/%Y") if termino_real_para_salvar else "",
-                                    "DATA REVISÃO DOC": data_revisao_doc_para_salvar.strftime("%d/%m/%Y") if data_revisao_doc_para_salvar else "",
-                                    "DATA REVISÃO PROJETO": data_revisao_projeto_para_salvar.strftime("%d/%m/%Y") if data_revisao_projeto_para_salvar else "",
+                                    "INÍCIO REAL": calculados["INÍCIO REAL"],
+                                    "TÉRMINO REAL": calculados["TÉRMINO REAL"],
+                                    "DATA REVISÃO DOC": formatar_data(data_revisao_doc_antiga),
+                                    "DATA REVISÃO PROJETO": formatar_data(data_revisao_projeto_antiga),
                                     "DURAÇÃO PLANEJADA (DIAS)": duracao_planejada,
                                     "DURAÇÃO REAL (DIAS)": duracao_real,
                                     "% AVANÇO PLANEJADO": f"{avanco_planejado:.1f}",
@@ -397,52 +695,88 @@ else:
                                     "CPI_HH": cpi_hh,
                                     "EAC_HH": eac_hh,
                                     "OBSERVAÇÕES": observacoes,
-                                    "EMAIL": email_com_timestamp
+                                    "EMAIL": calculados["EMAIL"]
                                 }
                                 
-                                nova_linha_valores = [str(valores_para_salvar_dict.get(col, "")) for col in colunas_esperadas]
-
-                                sucesso = atualizar_linha(sheet, linha_idx_para_atualizar, nova_linha_valores)
-                                if sucesso:
-                                    st.success("✅ Tarefa atualizada com sucesso!")
-                                    st.rerun()
-                                else:
-                                    st.error("❌ Erro ao atualizar. Verifique o console para mais detalhes.")
+                                alteracoes = calcular_alteracoes(valores_iniciais, valores_para_salvar_dict)
+                                if not alteracoes:
+                                    st.info("Nenhuma alteração para salvar.")
+                                    st.stop()
+
+                                protocolo = atualizar_linha(sheet, linha_idx_para_atualizar, alteracoes)
+                                registrar_edicao(protocolo, f"Linha {linha_idx_para_atualizar}: {tarefa['NOME DA TAREFA']}")
+                                st.success("✅ Edição recebida! Ela será gravada na planilha em instantes.")
+                                st.rerun()
         # --- Seção Visualizar Tarefas ---
         elif aba == "Visualizar Tarefas":
             st.header("📋 Visualização de Tarefas")
-            dados_df = carregar_dados(sheet)
-            
+            dados = obter_dados(sheet)
+            dados_df = dados.df
+
             if not dados_df.empty:
-                dados_formatados = dados_df.copy()
-
-                colunas_data = [
-                    "INÍCIO CONTRATUAL", "TÉRMINO CONTRATUAL", "INÍCIO REAL", "TÉRMINO REAL",
-                    "DATA REVISÃO DOC", "DATA REVISÃO PROJETO"
-                ]
-                for col in colunas_data:
-                    if col in dados_formatados.columns:
-                        dados_formatados[col] = dados_formatados[col].dt.strftime('%d/%m/%Y').fillna('')
-
-                colunas_percentuais = [
-                    "% CONCLUIDA", "% AVANÇO PLANEJADO", "% AVANÇO REAL"
-                ]
-                for col in colunas_percentuais:
-                    if col in dados_formatados.columns:
-                        dados_formatados[col] = (
-                            dados_formatados[col].round(1).astype(str) + "%"
-                        )
-                
-                for col in ["DURAÇÃO PLANEJADA (DIAS)", "DURAÇÃO REAL (DIAS)"]:
-                    if col in dados_formatados.columns:
-                        dados_formatados[col] = dados_formatados[col].astype(str)
-
-                colunas_ordenadas = [col for col in colunas_esperadas if col in dados_formatados.columns]
-                dados_formatados = dados_formatados[colunas_ordenadas]
-
-                st.dataframe(dados_formatados, use_container_width=True)
+                # Filtros, ordenação e paginação rodam no servidor; só a página visível é formatada e enviada
+                with st.expander("🔎 Filtros e ordenação", expanded=False):
+                    col_filtro_1, col_filtro_2 = st.columns(2)
+                    with col_filtro_1:
+                        filtro_os = st.multiselect("OS", dados.valores_distintos("OS"))
+                        filtro_disciplina = st.multiselect("DISCIPLINA", dados.valores_distintos("DISCIPLINA"))
+                        filtro_autor = st.multiselect("AUTOR", dados.valores_distintos("AUTOR_BASE"))
+                        filtro_status = st.multiselect("Status", STATUS)
+                    with col_filtro_2:
+                        # Na leitura por projeção, só as datas carregadas na listagem podem ser filtradas
+                        coluna_data = st.selectbox("Filtrar pela data", [""] + [col for col in COLUNAS_DATA if col in dados_df.columns])
+                        periodo = st.date_input("Período", value=(), format="DD/MM/YYYY", disabled=not coluna_data)
+                        ordenar_por = st.selectbox("Ordenar por", [""] + [col for col in colunas_esperadas if col in dados_df.columns])
+                        crescente = st.radio("Ordem", ["Crescente", "Decrescente"], horizontal=True) == "Crescente"
+
+                filtros = {
+                    "os_vals": filtro_os,
+                    "disciplinas": filtro_disciplina,
+                    "autores": filtro_autor,
+                    "status": filtro_status,
+                    "coluna_data": coluna_data or None,
+                    # O seletor de período só vale depois que as duas datas foram escolhidas
+                    "periodo": tuple(periodo) if len(periodo) == 2 else None,
+                }
+
+                with medir("filtro_tarefas"):
+                    selecionadas = dados.selecionar(filtros, ordenar_por=ordenar_por or None, crescente=crescente)
+                total = len(selecionadas)
+
+                col_pagina_1, col_pagina_2 = st.columns(2)
+                tamanho_pagina = col_pagina_2.selectbox("Tarefas por página", [25, 50, 100, 200], index=1)
+                total_paginas = max(1, -(-total // tamanho_pagina))
+                pagina = col_pagina_1.number_input(f"Página (de {total_paginas})", min_value=1, max_value=total_paginas, value=1, step=1)
+
+                pagina_df = paginar(dados_df, selecionadas, pagina, tamanho_pagina)
+                st.caption(f"{total} tarefa(s) encontrada(s)")
+                with medir("formatar_tabela"):
+                    tabela = formatar_para_exibicao(pagina_df)
+                st.dataframe(tabela, use_container_width=True)
+
+                if all(col in dados_df.columns for col in COLUNAS_EVM_NECESSARIAS):
+                    with st.expander("📈 Valor agregado (HH) das tarefas filtradas", expanded=False):
+                        agrupar_por = st.radio("Consolidar por", list(AGRUPAMENTOS), horizontal=True)
+                        with medir("valor_agregado"):
+                            evm_tarefas = dados.evm(agora_brasilia().date())
+                            coluna_grupo = AGRUPAMENTOS[agrupar_por]
+                            consolidado = consolidar(evm_tarefas.loc[selecionadas], dados_df.loc[selecionadas, coluna_grupo])
+                        st.caption("PV pelo prazo contratual decorrido até hoje, EV pelo % CONCLUIDA e AC pelo ACWP_HH; SPI = EV/PV, CPI = EV/AC, EAC = BAC/CPI.")
+                        st.dataframe(consolidado.round(2), use_container_width=True)
+
+                with st.expander("🌳 Estrutura (EDT)", expanded=False):
+                    with medir("arvore_edt"):
+                        arvore = dados.arvore()
+                    oss_arvore = arvore.oss()
+                    if oss_arvore:
+                        col_os, col_niveis = st.columns(2)
+                        os_arvore = col_os.selectbox("OS", oss_arvore, index=oss_arvore.index(str(filtro_os[0])) if filtro_os and str(filtro_os[0]) in oss_arvore else 0)
+                        niveis = col_niveis.number_input("Níveis exibidos", min_value=1, max_value=10, value=3, step=1)
+                        st.caption("% CONCLUIDA ponderado pelo HH Orçado das tarefas abaixo de cada nó; datas são o menor início e o maior término contratual.")
+                        st.dataframe(tabela_edt(arvore.linhas(os_arvore, profundidade=niveis)).round(2), use_container_width=True, hide_index=True)
             else:
                 st.info("Nenhuma tarefa cadastrada ainda.")
+            marco("visualização de tarefas renderizada")
     else:
         # Se o e-mail não estiver na lista, mostre uma mensagem de acesso negado
         st.error("❌ Acesso Negado!")
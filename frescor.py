@@ -0,0 +1,68 @@
+"""Verificação barata de mudanças na planilha, para só baixá-la de novo quando ela mudou."""
+import hashlib
+import json
+import threading
+import time
+
+# Sondas disponíveis: "drive" consulta o modifiedTime do arquivo; "sentinela" lê um
+# pequeno intervalo da aba e calcula o hash
+SONDAS = ("drive", "sentinela")
+
+
+def sonda_drive(sheet):
+    """Sonda que retorna o `modifiedTime` do arquivo no Drive (uma chamada de metadados, sem dados)."""
+    return lambda: sheet.spreadsheet.get_lastUpdateTime()
+
+
+def sonda_sentinela(sheet, intervalo):
+    """Sonda que retorna o hash dos valores de um intervalo pequeno da aba (ex.: "A1:AF20").
+
+    Só percebe mudanças dentro do intervalo; serve para quando a API do Drive
+    não está disponível para a conta de serviço.
+    """
+    def sondar():
+        valores = sheet.get_values(intervalo)
+        return hashlib.sha256(json.dumps(valores, ensure_ascii=False).encode()).hexdigest()
+    return sondar
+
+
+def criar_sonda(tipo, sheet, intervalo_sentinela="A1:AF20"):
+    """Monta a sonda configurada (veja `SONDAS`)."""
+    if tipo == "drive":
+        return sonda_drive(sheet)
+    if tipo == "sentinela":
+        return sonda_sentinela(sheet, intervalo_sentinela)
+    raise ValueError(f"Sonda de frescor desconhecida: {tipo!r}. Use uma de {SONDAS}.")
+
+
+class VerificadorFrescor:
+    """Consulta a sonda no máximo uma vez a cada `intervalo_minimo_segundos`.
+
+    A instância é única por processo, então todas as sessões compartilham a
+    mesma consulta: dentro do intervalo, `marca()` devolve a última marca lida.
+    A sonda é qualquer função sem argumentos que retorne um valor que muda
+    quando a planilha muda, e pode ser trocada por uma falsa nos testes.
+    """
+
+    def __init__(self, sonda, intervalo_minimo_segundos=30):
+        self.sonda = sonda
+        self.intervalo_minimo_segundos = intervalo_minimo_segundos
+        self.consultas = 0
+        self._trava = threading.Lock()
+        self._marca = None
+        self._consultado_em = None
+
+    def marca(self):
+        """Marca atual da planilha, ou None se a sonda falhar (e aí a planilha é tratada como alterada)."""
+        with self._trava:
+            agora = time.monotonic()
+            if self._consultado_em is not None and agora - self._consultado_em < self.intervalo_minimo_segundos:
+                return self._marca
+            try:
+                self._marca = self.sonda()
+            except Exception as e:
+                print(f"Não foi possível verificar se a planilha mudou: {e}")
+                self._marca = None
+            self._consultado_em = agora
+            self.consultas += 1
+            return self._marca
@@ -0,0 +1,117 @@
+"""Camada HTTP compartilhada pelas chamadas às APIs do Google (userinfo, Sheets e Drive)."""
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from google.auth.transport.requests import AuthorizedSession
+from requests.adapters import HTTPAdapter
+
+from limitador import DRIVE, ESCRITA, LEITURA
+from metricas import API
+
+# Ações do Sheets feitas com POST que só leem dados e contam na cota de leitura
+_ACOES_LEITURA = {"batchGet", "batchGetByDataFilter", "getByDataFilter"}
+
+
+def nome_da_chamada(request):
+    """Nome curto da chamada à API, usado nas métricas (ex.: "sheets values batchUpdate")."""
+    url = urlsplit(request.url)
+    if url.path.endswith("/userinfo"):
+        return "userinfo"
+    if url.hostname == "sheets.googleapis.com":
+        # Os intervalos A1 vão codificados na URL, então um ":" literal só aparece antes da ação
+        acao = re.search(r":(\w+)$", url.path)
+        recurso = "values" if "/values" in url.path else "spreadsheets"
+        return f"sheets {recurso} {acao.group(1) if acao else request.method}"
+    if url.path.startswith("/drive/"):
+        return f"drive {request.method}"
+    return f"{url.hostname} {request.method}"
+
+
+def tipo_da_chamada(request):
+    """Cota em que a chamada conta (`limitador.LEITURA`, `ESCRITA` ou `DRIVE`); None para as demais (userinfo)."""
+    url = urlsplit(request.url)
+    if url.hostname == "www.googleapis.com" and url.path.startswith("/drive/"):
+        return DRIVE
+    if url.hostname != "sheets.googleapis.com":
+        return None
+    acao = re.search(r":(\w+)$", url.path)
+    if request.method == "GET" or (acao and acao.group(1) in _ACOES_LEITURA):
+        return LEITURA
+    return ESCRITA
+
+
+class AdaptadorPool(HTTPAdapter):
+    """HTTPAdapter com pool de conexões keep-alive, tempo limite padrão e contagem de uso.
+
+    O pool do urllib3 é thread-safe, então uma única instância pode ser
+    montada em várias sessões e usada por todas as threads do processo. Com
+    `metricas`, a duração de cada chamada é registrada por `nome_da_chamada`;
+    com `limitador` (`limitador.LimitadorCota`), cada chamada ao Sheets ou ao
+    Drive espera a sua vez na cota antes de sair.
+    """
+
+    def __init__(self, tamanho_pool, tempo_limite, metricas=None, limitador=None, **kwargs):
+        self.tempo_limite = tempo_limite
+        self.metricas = metricas
+        self.limitador = limitador
+        self._trava = threading.Lock()
+        self._requisicoes = 0
+        super().__init__(pool_connections=tamanho_pool, pool_maxsize=tamanho_pool, **kwargs)
+
+    def send(self, request, timeout=None, **kwargs):
+        # requests e gspread não definem tempo limite por padrão; sem ele uma chamada pode travar a sessão
+        if timeout is None:
+            timeout = self.tempo_limite
+        tipo = tipo_da_chamada(request) if self.limitador is not None else None
+        if tipo is not None:
+            self.limitador.aguardar(tipo)
+        with self._trava:
+            self._requisicoes += 1
+
+        inicio = time.perf_counter()
+        resposta = None
+        try:
+            resposta = super().send(request, timeout=timeout, **kwargs)
+            return resposta
+        finally:
+            if tipo is not None and resposta is not None and resposta.status_code == 429:
+                self.limitador.recusada(tipo)
+            if self.metricas is not None:
+                erro = resposta is None or resposta.status_code >= 400
+                self.metricas.observar(API, nome_da_chamada(request), time.perf_counter() - inicio, erro)
+
+    def estatisticas(self):
+        """Requisições enviadas, conexões abertas e a fração de requisições que reaproveitou conexão."""
+        pools = self.poolmanager.pools
+        conexoes = sum(pools[chave].num_connections for chave in pools.keys())
+        with self._trava:
+            requisicoes = self._requisicoes
+        return {
+            "requisicoes": requisicoes,
+            "conexoes_abertas": conexoes,
+            "reaproveitamento": 1 - conexoes / requisicoes if requisicoes else 0.0,
+        }
+
+
+class CamadaHTTP:
+    """Sessões HTTP que compartilham o mesmo pool de conexões com os servidores do Google."""
+
+    def __init__(self, tamanho_pool=10, tempo_limite=30.0, tentativas_conexao=2, metricas=None, limitador=None):
+        self.adaptador = AdaptadorPool(
+            tamanho_pool, tempo_limite, metricas=metricas, limitador=limitador, max_retries=tentativas_conexao
+        )
+        self.sessao = self._montar(requests.Session())
+
+    def _montar(self, sessao):
+        sessao.mount("https://", self.adaptador)
+        return sessao
+
+    def sessao_autorizada(self, credenciais):
+        """Sessão autenticada com as credenciais da conta de serviço, usando o pool compartilhado."""
+        return self._montar(AuthorizedSession(credenciais))
+
+    def estatisticas(self):
+        return self.adaptador.estatisticas()
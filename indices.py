@@ -0,0 +1,110 @@
+"""Índices em memória construídos sobre o DataFrame de tarefas."""
+import copy
+
+# A planilha é 1-based e tem uma linha de cabeçalho antes dos dados
+PRIMEIRA_LINHA_DADOS = 2
+
+
+def linha_planilha(df_index):
+    """Converte o índice (0-based) do DataFrame no número da linha na planilha."""
+    return df_index + PRIMEIRA_LINHA_DADOS
+
+
+def indice_df(linha):
+    """Converte o número da linha na planilha no índice (0-based) do DataFrame."""
+    return linha - PRIMEIRA_LINHA_DADOS
+
+
+def chave_tarefa(os_val, edt, nome_tarefa):
+    """Monta a chave que identifica uma tarefa na planilha: (OS, EDT, NOME DA TAREFA)."""
+    return (str(os_val), str(edt), str(nome_tarefa))
+
+
+def rotulo_tarefa(os_val, edt, nome_tarefa):
+    """Texto exibido para uma tarefa na lista de seleção."""
+    return f"OS: {os_val} / EDT: {edt} / Tarefa: {nome_tarefa}"
+
+
+class IndiceTarefas:
+    """Mapeia a chave (OS, EDT, NOME DA TAREFA) para as linhas da planilha que a contêm."""
+
+    def __init__(self, df):
+        self._linhas = {}
+        chaves = zip(df["OS"].astype(str), df["EDT"].astype(str), df["NOME DA TAREFA"].astype(str))
+        for df_index, chave in zip(df.index, chaves):
+            self._linhas.setdefault(chave, []).append(linha_planilha(df_index))
+
+    def __len__(self):
+        return len(self._linhas)
+
+    def localizar(self, os_val, edt, nome_tarefa):
+        """Retorna a lista de linhas da planilha com essa chave (mais de uma indica duplicidade)."""
+        return list(self._linhas.get(chave_tarefa(os_val, edt, nome_tarefa), []))
+
+    def duplicadas(self):
+        """Retorna as chaves que aparecem em mais de uma linha, com as respectivas linhas."""
+        return {chave: list(linhas) for chave, linhas in self._linhas.items() if len(linhas) > 1}
+
+    def copiar(self):
+        """Cópia rasa: as listas de linhas são compartilhadas, pois `mover` nunca as altera no lugar."""
+        copia = copy.copy(self)
+        copia._linhas = dict(self._linhas)
+        return copia
+
+    def mover(self, linha, chave_antiga, chave_nova):
+        """Atualiza o índice quando a chave de uma linha é alterada por uma edição."""
+        if chave_antiga == chave_nova:
+            return
+        linhas = self._linhas.get(chave_antiga)
+        if linhas and linha in linhas:
+            restantes = [outra for outra in linhas if outra != linha]
+            if restantes:
+                self._linhas[chave_antiga] = restantes
+            else:
+                del self._linhas[chave_antiga]
+        self._linhas[chave_nova] = sorted([*self._linhas.get(chave_nova, []), linha])
+
+
+class ParticaoAutores:
+    """Tarefas em aberto (% CONCLUIDA < 100) agrupadas por AUTOR_BASE, com os rótulos já montados.
+
+    Cada grupo é um dicionário `{df_index: rótulo}` na ordem da planilha.
+    """
+
+    def __init__(self, df):
+        self._grupos = {}
+        abertas = df[df["% CONCLUIDA"] < 100.0]
+        # Mesmo texto de rotulo_tarefa, montado de uma vez para a coluna inteira
+        rotulos = (
+            "OS: " + abertas["OS"].astype(str)
+            + " / EDT: " + abertas["EDT"].astype(str)
+            + " / Tarefa: " + abertas["NOME DA TAREFA"].astype(str)
+        )
+        for df_index, autor, rotulo in zip(abertas.index, abertas["AUTOR_BASE"], rotulos):
+            self._grupos.setdefault(autor, {})[df_index] = rotulo
+
+    def tarefas(self, autor_base):
+        """Retorna `{df_index: rótulo}` das tarefas em aberto do autor (vazio se não houver)."""
+        return self._grupos.get(autor_base, {})
+
+    def copiar(self):
+        """Cópia rasa: os grupos são compartilhados, pois `atualizar` sempre os substitui em vez de alterá-los."""
+        copia = copy.copy(self)
+        copia._grupos = dict(self._grupos)
+        return copia
+
+    def atualizar(self, df_index, autor_antigo, tarefa):
+        """Reposiciona uma única tarefa após uma edição, mexendo só nos grupos afetados."""
+        grupo_antigo = self._grupos.get(autor_antigo)
+        if grupo_antigo is not None and df_index in grupo_antigo:
+            restantes = {indice: rotulo for indice, rotulo in grupo_antigo.items() if indice != df_index}
+            if restantes:
+                self._grupos[autor_antigo] = restantes
+            else:
+                del self._grupos[autor_antigo]
+
+        if tarefa["% CONCLUIDA"] < 100.0:
+            grupo = dict(self._grupos.get(tarefa["AUTOR_BASE"], {}))
+            grupo[df_index] = rotulo_tarefa(tarefa["OS"], tarefa["EDT"], tarefa["NOME DA TAREFA"])
+            # Mantém a ordem da planilha apenas dentro do grupo alterado
+            self._grupos[tarefa["AUTOR_BASE"]] = dict(sorted(grupo.items()))
@@ -0,0 +1,97 @@
+"""Leitura em duas etapas: poucas colunas de todas as tarefas e a linha completa só das tarefas abertas."""
+import gspread
+import pandas as pd
+from gspread.utils import numericise_all
+
+from dados import COLUNAS_ESSENCIAIS, posicoes_das_colunas, processar_dados, processar_linha
+from escrita import letras_das_colunas
+from indices import PRIMEIRA_LINHA_DADOS, indice_df
+from snapshot_local import agrupar_intervalos, completar
+
+# Colunas usadas para listar e filtrar as tarefas; as demais só são lidas para a tarefa aberta
+# no formulário. DISCIPLINA entra pelo filtro da visualização e NOME DA OS pela busca de tarefas
+COLUNAS_LISTAGEM = ["OS", "EDT", "NOME DA TAREFA", "AUTOR", "% CONCLUIDA", "DISCIPLINA", "NOME DA OS"]
+
+# Resultado de `conferir_linha`
+LINHA_CONFERE = "confere"
+LINHA_MOVIDA = "movida"
+LINHA_ALTERADA = "alterada"
+
+
+def ler_listagem(sheet, colunas=COLUNAS_LISTAGEM):
+    """Lê só as `colunas` de todas as linhas: uma chamada para o cabeçalho e outra para as colunas.
+
+    Retorna `(df, cabecalho)` como `dados.ler_planilha`, com o DataFrame
+    contendo apenas as colunas pedidas.
+    """
+    cabecalho = tuple(sheet.row_values(1))
+    faltando = [col for col in colunas if col not in cabecalho]
+    if faltando:
+        raise gspread.exceptions.GSpreadException(f"Colunas de listagem não encontradas no cabeçalho: {faltando}")
+    letras = letras_das_colunas(cabecalho)
+    lidas = sheet.batch_get([f"{letras[col]}{PRIMEIRA_LINHA_DADOS}:{letras[col]}" for col in colunas], major_dimension="COLUMNS")
+    valores = [intervalo[0] if intervalo else [] for intervalo in lidas]
+    # A API corta as células vazias do fim de cada coluna
+    total = max((len(coluna) for coluna in valores), default=0)
+    return pd.DataFrame({col: completar(coluna, total) for col, coluna in zip(colunas, valores)}), cabecalho
+
+
+def _valores_da_linha(cabecalho, linha):
+    linha = completar(linha, len(cabecalho))
+    return {nome: linha[i] for nome, i in posicoes_das_colunas(cabecalho).items()}
+
+
+def ler_linha(sheet, cabecalho, linha):
+    """Lê a linha inteira da planilha com uma única leitura de intervalo e retorna `{coluna: texto}`."""
+    ultima = letras_das_colunas(tuple(cabecalho))[cabecalho[-1]]
+    grade = sheet.get_values(f"A{linha}:{ultima}{linha}")
+    return _valores_da_linha(cabecalho, grade[0] if grade else [])
+
+
+def ler_linhas(sheet, cabecalho, linhas):
+    """Lê várias linhas inteiras em uma chamada (linhas próximas viram um só intervalo); retorna `{linha: {coluna: texto}}`."""
+    if not linhas:
+        return {}
+    ultima = letras_das_colunas(tuple(cabecalho))[cabecalho[-1]]
+    intervalos = agrupar_intervalos(linhas)
+    lidos = sheet.batch_get([f"A{inicio}:{ultima}{fim}" for inicio, fim in intervalos])
+    pedidas = set(linhas)
+    resultado = {}
+    for (inicio, fim), grade in zip(intervalos, lidos):
+        for n in range(inicio, fim + 1):
+            if n in pedidas:
+                resultado[n] = _valores_da_linha(cabecalho, grade[n - inicio] if n - inicio < len(grade) else [])
+    return resultado
+
+
+def tarefas_das_linhas(valores_por_linha):
+    """Monta o DataFrame processado das linhas lidas, indexado como o DataFrame principal (`df_index`)."""
+    df = pd.DataFrame.from_dict(valores_por_linha, orient="index")
+    df.index = [indice_df(linha) for linha in df.index]
+    return processar_dados(df)
+
+
+def conferir_linha(tarefa, valores, colunas=COLUNAS_LISTAGEM):
+    """Compara a tarefa listada com a linha acabada de ler da planilha.
+
+    Retorna `LINHA_MOVIDA` se a linha agora tem outra tarefa (OS, EDT ou NOME
+    DA TAREFA diferentes), `LINHA_ALTERADA` se alguma outra coluna da listagem
+    mudou e `LINHA_CONFERE` se nada mudou. A listagem pode ter vindo de
+    `get_all_records` (MODO_LEITURA_PLANILHA=registros), que converte textos
+    numéricos ("1.10" vira 1.1, "007" vira 7); por isso cada coluna confere se
+    for igual à linha lida como texto ou convertida da mesma forma.
+    """
+    como_registro = dict(zip(valores, numericise_all(list(valores.values()))))
+    lidas = [processar_linha(valores).iloc[0], processar_linha(como_registro).iloc[0]]
+
+    def iguais(col):
+        return any(lida[col] == tarefa[col] or (pd.isna(lida[col]) and pd.isna(tarefa[col])) for lida in lidas)
+
+    if not all(iguais(col) for col in COLUNAS_ESSENCIAIS):
+        return LINHA_MOVIDA
+    for col in colunas:
+        if col in COLUNAS_ESSENCIAIS or col not in tarefa.index:
+            continue
+        if not iguais(col):
+            return LINHA_ALTERADA
+    return LINHA_CONFERE
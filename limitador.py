@@ -0,0 +1,152 @@
+"""Cota de chamadas às APIs do Sheets e do Drive compartilhada por todas as sessões e threads do processo."""
+import collections
+import contextlib
+import heapq
+import itertools
+import threading
+import time
+
+# Tipos de chamada, cada um com a sua cota no Google
+LEITURA = "leitura"
+ESCRITA = "escrita"
+DRIVE = "drive"
+
+# Prioridades na fila de espera (menor passa antes): a fila de gravação, as sessões e as
+# atualizações em segundo plano, que já têm dados para exibir enquanto esperam
+PRIORIDADE_ESCRITA = 0
+PRIORIDADE_SESSAO = 1
+PRIORIDADE_SEGUNDO_PLANO = 2
+
+_contexto = threading.local()
+
+
+@contextlib.contextmanager
+def em_prioridade(prioridade):
+    """Faz as chamadas desta thread, dentro do bloco, esperarem a cota com a prioridade dada."""
+    anterior = getattr(_contexto, "prioridade", None)
+    _contexto.prioridade = prioridade
+    try:
+        yield
+    finally:
+        _contexto.prioridade = anterior
+
+
+def prioridade_atual():
+    """Prioridade das chamadas da thread atual (`PRIORIDADE_SESSAO` se nenhuma foi definida)."""
+    prioridade = getattr(_contexto, "prioridade", None)
+    return PRIORIDADE_SESSAO if prioridade is None else prioridade
+
+
+class BaldeFichas:
+    """Fichas de um tipo de chamada: repõe `por_minuto` por minuto, acumulando até `rajada`."""
+
+    def __init__(self, por_minuto, rajada):
+        self.por_minuto = por_minuto
+        self.rajada = rajada
+        self.fichas = float(rajada)
+        self._reposto_em = time.monotonic()
+        self.fila = []  # heap de (prioridade, ordem de chegada)
+        self.liberadas = collections.deque()  # instantes das chamadas liberadas no último minuto
+        self.total = 0
+        self.esperas = 0
+        self.segundos_esperando = 0.0
+        self.recusas = 0
+
+    def repor(self, agora):
+        self.fichas = min(float(self.rajada), self.fichas + (agora - self._reposto_em) * self.por_minuto / 60.0)
+        self._reposto_em = agora
+        while self.liberadas and agora - self.liberadas[0] > 60.0:
+            self.liberadas.popleft()
+
+    def segundos_ate_ficha(self):
+        return max(0.0, (1.0 - self.fichas) * 60.0 / self.por_minuto)
+
+
+class LimitadorCota:
+    """Baldes de fichas por onde passam todas as chamadas ao Sheets e ao Drive.
+
+    A instância é única por processo (criada com `st.cache_resource`) e usada
+    pela camada HTTP, então as rajadas de várias sessões somadas ficam dentro
+    da cota por minuto do projeto. Em qualquer janela de um minuto passam no
+    máximo `rajada + por_minuto` chamadas de cada tipo. Leituras e escritas
+    do Sheets e as chamadas ao Drive (a sonda de `frescor`) têm baldes
+    separados, como as cotas do Google, e quem espera passa por
+    ordem de prioridade (veja `em_prioridade`) e, na mesma prioridade, de
+    chegada. Uma cota zerada ou None deixa aquele tipo sem limite.
+    """
+
+    def __init__(self, leituras_por_minuto=50, escritas_por_minuto=50, drive_por_minuto=60, rajada=10):
+        self._condicao = threading.Condition()
+        self._ordem = itertools.count()
+        self._baldes = {
+            tipo: BaldeFichas(por_minuto, rajada)
+            for tipo, por_minuto in (
+                (LEITURA, leituras_por_minuto), (ESCRITA, escritas_por_minuto), (DRIVE, drive_por_minuto),
+            )
+            if por_minuto
+        }
+
+    def aguardar(self, tipo, prioridade=None):
+        """Bloqueia até haver uma ficha de `tipo` para esta chamada e retorna os segundos esperados."""
+        balde = self._baldes.get(tipo)
+        if balde is None:
+            return 0.0
+        vez = (prioridade_atual() if prioridade is None else prioridade, next(self._ordem))
+        inicio = time.monotonic()
+        with self._condicao:
+            heapq.heappush(balde.fila, vez)
+            try:
+                while True:
+                    agora = time.monotonic()
+                    balde.repor(agora)
+                    if balde.fila[0] != vez:
+                        # Quem está à frente avisa ao passar
+                        self._condicao.wait()
+                    elif balde.fichas < 1.0:
+                        self._condicao.wait(balde.segundos_ate_ficha())
+                    else:
+                        break
+            except BaseException:
+                balde.fila.remove(vez)
+                heapq.heapify(balde.fila)
+                self._condicao.notify_all()
+                raise
+            heapq.heappop(balde.fila)
+            balde.fichas -= 1.0
+            balde.liberadas.append(agora)
+            balde.total += 1
+            esperado = agora - inicio
+            if esperado > 0.001:
+                balde.esperas += 1
+                balde.segundos_esperando += esperado
+            self._condicao.notify_all()
+        return esperado
+
+    def recusada(self, tipo):
+        """Registra um 429 do Google: o balde é esvaziado para que todas as sessões esperem a reposição."""
+        balde = self._baldes.get(tipo)
+        if balde is None:
+            return
+        with self._condicao:
+            balde.repor(time.monotonic())
+            balde.fichas = min(balde.fichas, 0.0)
+            balde.recusas += 1
+
+    def uso(self):
+        """`{tipo: {...}}` com a cota, o uso no último minuto, as fichas disponíveis e quem está esperando."""
+        with self._condicao:
+            agora = time.monotonic()
+            resultado = {}
+            for tipo, balde in self._baldes.items():
+                balde.repor(agora)
+                resultado[tipo] = {
+                    "por_minuto": balde.por_minuto,
+                    "ultimo_minuto": len(balde.liberadas),
+                    "fichas": balde.fichas,
+                    "esperando": dict(collections.Counter(prioridade for prioridade, _ in balde.fila)),
+                    "chamadas": balde.total,
+                    "esperas": balde.esperas,
+                    "segundos_esperando": balde.segundos_esperando,
+                    "recusas": balde.recusas,
+                }
+            return resultado
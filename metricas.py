@@ -0,0 +1,138 @@
+"""Tempos por etapa da aplicação e por chamada às APIs do Google, no formato de texto do Prometheus."""
+import bisect
+import contextlib
+import http.server
+import json
+import threading
+import time
+
+# Limites (em segundos) dos baldes dos histogramas de latência
+BALDES_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Tipos de medida: etapas da execução do script e chamadas HTTP às APIs
+ETAPA = "etapa"
+API = "api"
+_ROTULOS = {ETAPA: "etapa", API: "chamada"}
+
+
+class Histograma:
+    """Contagem acumulada por balde, soma e total de observações de uma série."""
+
+    def __init__(self):
+        self.baldes = [0] * (len(BALDES_SEGUNDOS) + 1)  # o último é o +Inf
+        self.soma = 0.0
+        self.total = 0
+        self.erros = 0
+
+    def observar(self, segundos, erro=False):
+        self.baldes[bisect.bisect_left(BALDES_SEGUNDOS, segundos)] += 1
+        self.soma += segundos
+        self.total += 1
+        self.erros += bool(erro)
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metricas:
+    """Acumula as medidas do processo inteiro; é compartilhada por todas as sessões e threads.
+
+    Cada medida também pode ser impressa no log como uma linha JSON
+    (`registrar_log`, desligado por padrão) e anexada a uma lista da
+    execução atual, usada pelo painel de depuração.
+    """
+
+    def __init__(self, registrar_log=False):
+        self.registrar_log = registrar_log
+        self._trava = threading.Lock()
+        self._series = {ETAPA: {}, API: {}}
+
+    def observar(self, tipo, nome, segundos, erro=False):
+        """Registra uma medida já feita (usado pela camada HTTP para cada chamada)."""
+        with self._trava:
+            serie = self._series[tipo].get(nome)
+            if serie is None:
+                serie = self._series[tipo][nome] = Histograma()
+            serie.observar(segundos, erro)
+        if self.registrar_log:
+            print(json.dumps(
+                {"metrica": tipo, _ROTULOS[tipo]: nome, "segundos": round(segundos, 6), "erro": bool(erro)},
+                ensure_ascii=False,
+            ))
+
+    @contextlib.contextmanager
+    def medir(self, etapa, execucao=None):
+        """Mede o bloco como uma etapa; `execucao`, se dada, recebe `(etapa, segundos)`.
+
+        Exceções contam como erro da etapa. `st.stop` e `st.rerun` não contam:
+        o Streamlit os implementa com exceções que não herdam de `Exception`.
+        """
+        inicio = time.perf_counter()
+        erro = False
+        try:
+            yield
+        except Exception:
+            erro = True
+            raise
+        finally:
+            segundos = time.perf_counter() - inicio
+            self.observar(ETAPA, etapa, segundos, erro)
+            if execucao is not None:
+                execucao.append((etapa, segundos))
+
+    def resumo(self, tipo=ETAPA):
+        """Retorna `{nome: (chamadas, erros, média em segundos)}` de um tipo de medida."""
+        with self._trava:
+            return {
+                nome: (serie.total, serie.erros, serie.soma / serie.total if serie.total else 0.0)
+                for nome, serie in sorted(self._series[tipo].items())
+            }
+
+    def texto_prometheus(self):
+        """Exporta todas as séries no formato de texto de exposição do Prometheus."""
+        linhas = []
+        with self._trava:
+            for tipo, series in self._series.items():
+                rotulo = _ROTULOS[tipo]
+                base = f"automacao_{tipo}_segundos"
+                linhas.append(f"# HELP {base} Duração de cada {rotulo}, em segundos.")
+                linhas.append(f"# TYPE {base} histogram")
+                for nome, serie in sorted(series.items()):
+                    nome = _escapar(nome)
+                    acumulado = 0
+                    for limite, quantidade in zip(BALDES_SEGUNDOS + ("+Inf",), serie.baldes):
+                        acumulado += quantidade
+                        linhas.append(f'{base}_bucket{{{rotulo}="{nome}",le="{limite}"}} {acumulado}')
+                    linhas.append(f'{base}_sum{{{rotulo}="{nome}"}} {serie.soma:.6f}')
+                    linhas.append(f'{base}_count{{{rotulo}="{nome}"}} {serie.total}')
+
+                erros = f"automacao_{tipo}_erros_total"
+                linhas.append(f"# HELP {erros} Quantidade de {rotulo}s que terminaram em erro.")
+                linhas.append(f"# TYPE {erros} counter")
+                for nome, serie in sorted(series.items()):
+                    linhas.append(f'{erros}{{{rotulo}="{_escapar(nome)}"}} {serie.erros}')
+        return "\n".join(linhas) + "\n"
+
+
+def iniciar_servidor(metricas, porta, endereco="0.0.0.0"):
+    """Serve `/metrics` em uma thread em segundo plano e retorna o servidor."""
+
+    class Manipulador(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            corpo = metricas.texto_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def log_message(self, formato, *args):
+            pass  # As raspagens periódicas não precisam aparecer no log
+
+    servidor = http.server.ThreadingHTTPServer((endereco, porta), Manipulador)
+    threading.Thread(target=servidor.serve_forever, name="metricas-http", daemon=True).start()
+    return servidor
@@ -0,0 +1,177 @@
+"""Espelho das tarefas em SQLite, consultado pelas duas abas em vez dos filtros do pandas."""
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+from consultas import CONCLUIDA, status_tarefas
+from dados import COLUNAS_DATA, COLUNAS_ESPERADAS
+from indices import linha_planilha, rotulo_tarefa
+
+# Colunas do espelho, além do índice do DataFrame e do status calculado
+COLUNAS_ESPELHO = COLUNAS_ESPERADAS + ["AUTOR_BASE"]
+
+# Índices das consultas das abas: tarefas em aberto do autor, chave da tarefa e filtros
+INDICES = {
+    "tarefas_autor_status": ("AUTOR_BASE", "status"),
+    "tarefas_chave": ("OS", "EDT", "NOME DA TAREFA"),
+    "tarefas_edt": ("EDT",),
+    "tarefas_status": ("status",),
+}
+
+
+def _nome(coluna):
+    """Identificador SQL entre aspas (os nomes da planilha têm espaços, acentos e %)."""
+    return '"' + coluna.replace('"', '""') + '"'
+
+
+def valores_sql(df, colunas):
+    """Converte as colunas do DataFrame em listas de valores aceitos pelo SQLite (NaN/NaT viram NULL).
+
+    Datas viram texto ISO, que ordena e compara como as datas; floats e inteiros
+    viram números; o resto, texto.
+    """
+    convertidas = []
+    for col in colunas:
+        serie = df[col]
+        if col in COLUNAS_DATA:
+            valores = serie.dt.strftime("%Y-%m-%d %H:%M:%S")
+        elif pd.api.types.is_numeric_dtype(serie.dtype):
+            valores = serie.astype(float)
+        else:
+            valores = serie.astype(object)
+        convertidas.append(valores.astype(object).where(serie.notna(), None).tolist())
+    return convertidas
+
+
+class ModeloLeitura:
+    """Cópia das tarefas processadas em uma tabela SQLite indexada, só para leitura.
+
+    É preenchida a cada carga da planilha e corrigida linha a linha a cada
+    edição, sempre por `CacheDados`, junto com a publicação do retrato
+    correspondente. `versao` é a do retrato refletido: as consultas recebem a
+    versão de quem pergunta e devolvem None se o espelho já estiver em outra
+    (o retrato antigo então responde pelos índices em memória).
+
+    Uma carga completa monta um banco novo em memória com `preparar`, sem
+    bloquear as consultas, e só a troca da conexão acontece sob a trava.
+    """
+
+    def __init__(self):
+        self.versao = None
+        self._trava = threading.Lock()
+        self._conexao = None
+        self._colunas = []
+
+    @staticmethod
+    def _inserir(conexao, colunas, df):
+        status = status_tarefas(df["% CONCLUIDA"].to_numpy()).tolist()
+        marcadores = ", ".join("?" * (len(colunas) + 2))
+        conexao.executemany(
+            f"INSERT OR REPLACE INTO tarefas VALUES ({marcadores})",
+            zip(df.index.tolist(), status, *valores_sql(df, colunas)),
+        )
+
+    def preparar(self, df):
+        """Monta um banco novo com todas as linhas do DataFrame processado, para passar a `carregar`."""
+        colunas = [col for col in COLUNAS_ESPELHO if col in df.columns]
+        conexao = sqlite3.connect(":memory:", check_same_thread=False)
+        with conexao:
+            definicoes = ", ".join(_nome(col) for col in colunas)
+            conexao.execute(f"CREATE TABLE tarefas (df_index INTEGER PRIMARY KEY, status TEXT NOT NULL, {definicoes})")
+            self._inserir(conexao, colunas, df)
+            # Os índices são montados depois da carga, de uma vez, em vez de linha a linha
+            for nome, colunas_indice in INDICES.items():
+                if all(col in colunas or col == "status" for col in colunas_indice):
+                    conexao.execute(f"CREATE INDEX {nome} ON tarefas ({', '.join(map(_nome, colunas_indice))})")
+        return conexao, colunas
+
+    def carregar(self, df, versao, preparado=None):
+        """Substitui todo o conteúdo pelas linhas do DataFrame (ou pelo banco já `preparado` a partir dele)."""
+        conexao, colunas = preparado or self.preparar(df)
+        with self._trava:
+            antiga = self._conexao
+            self._conexao, self._colunas, self.versao = conexao, colunas, versao
+        if antiga is not None:
+            antiga.close()
+
+    def aplicar_linhas(self, df, indices, versao):
+        """Regrava só as linhas `indices`, lidas do DataFrame já atualizado."""
+        with self._trava:
+            if self._conexao is None:
+                return
+            with self._conexao:
+                self._inserir(self._conexao, self._colunas, df.loc[sorted(indices)])
+            self.versao = versao
+
+    def invalidar(self):
+        """Marca o espelho como desatualizado até a próxima carga."""
+        with self._trava:
+            self.versao = None
+
+    def _consultar(self, versao, sql, parametros=()):
+        with self._trava:
+            if versao is None or versao != self.versao:
+                return None
+            return self._conexao.execute(sql, parametros).fetchall()
+
+    def tarefas_do_autor(self, versao, autor_base):
+        """`{df_index: rótulo}` das tarefas em aberto do autor, na ordem da planilha (como `ParticaoAutores`)."""
+        registros = self._consultar(
+            versao,
+            'SELECT df_index, "OS", "EDT", "NOME DA TAREFA" FROM tarefas '
+            'WHERE "AUTOR_BASE" = ? AND status != ? AND "% CONCLUIDA" < 100 ORDER BY df_index',
+            (autor_base, CONCLUIDA),
+        )
+        if registros is None:
+            return None
+        return {df_index: rotulo_tarefa(os_val, edt, nome) for df_index, os_val, edt, nome in registros}
+
+    def localizar(self, versao, os_val, edt, nome_tarefa):
+        """Linhas da planilha com a chave (OS, EDT, NOME DA TAREFA), como `IndiceTarefas.localizar`."""
+        registros = self._consultar(
+            versao,
+            'SELECT df_index FROM tarefas WHERE "OS" = ? AND "EDT" = ? AND "NOME DA TAREFA" = ? ORDER BY df_index',
+            (str(os_val), str(edt), str(nome_tarefa)),
+        )
+        if registros is None:
+            return None
+        return [linha_planilha(df_index) for (df_index,) in registros]
+
+    def valores_distintos(self, versao, col):
+        """Valores distintos e não vazios de uma coluna, ordenados."""
+        registros = self._consultar(
+            versao, f"SELECT DISTINCT {_nome(col)} FROM tarefas WHERE {_nome(col)} IS NOT NULL AND {_nome(col)} != '' ORDER BY 1"
+        )
+        if registros is None:
+            return None
+        return [valor for (valor,) in registros]
+
+    def selecionar(self, versao, filtros=None, ordenar_por=None, crescente=True):
+        """Mesmo resultado de `consultas.selecionar_tarefas`: os `df_index` filtrados e ordenados."""
+        filtros = filtros or {}
+        condicoes, parametros = [], []
+        for chave, col in (("os_vals", "OS"), ("disciplinas", "DISCIPLINA"), ("autores", "AUTOR_BASE"), ("status", "status")):
+            valores = filtros.get(chave)
+            if valores:
+                condicoes.append(f"{_nome(col)} IN ({', '.join('?' * len(valores))})")
+                parametros.extend(str(valor) for valor in valores)
+        coluna_data, periodo = filtros.get("coluna_data"), filtros.get("periodo")
+        if coluna_data and periodo:
+            inicio, fim = periodo
+            condicoes.append(f"date({_nome(coluna_data)}) BETWEEN ? AND ?")
+            parametros.extend([str(np.datetime64(inicio, "D")), str(np.datetime64(fim, "D"))])
+
+        sql = "SELECT df_index FROM tarefas"
+        if condicoes:
+            sql += " WHERE " + " AND ".join(condicoes)
+        if ordenar_por:
+            # Vazios no fim e empates na ordem da planilha, como o sort estável do pandas
+            sql += f" ORDER BY {_nome(ordenar_por)} IS NULL, {_nome(ordenar_por)} {'ASC' if crescente else 'DESC'}, df_index"
+        else:
+            sql += " ORDER BY df_index"
+        registros = self._consultar(versao, sql, parametros)
+        if registros is None:
+            return None
+        return pd.Index([df_index for (df_index,) in registros])
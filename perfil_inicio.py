@@ -0,0 +1,51 @@
+"""Medição do tempo de inicialização do formulário: imports e primeira renderização de cada fase.
+
+Ativada com PERFIL_INICIALIZACAO=1. Cada fase é medida só na primeira vez em
+que roda no processo (as execuções seguintes do script já encontram os módulos
+importados e os caches prontos) e o tempo é impresso no log. Para ver o custo
+de cada módulo importado, rode o Streamlit com `python -X importtime`.
+"""
+import contextlib
+import os
+import threading
+import time
+
+ATIVO = os.getenv("PERFIL_INICIALIZACAO", "") == "1"
+
+_inicio = time.perf_counter()
+_trava = threading.Lock()
+_medidas = {}  # fase -> (duração, segundos desde o início do processo)
+
+
+def _registrar(nome, duracao):
+    desde_inicio = time.perf_counter() - _inicio
+    with _trava:
+        if nome in _medidas:
+            return
+        _medidas[nome] = (duracao, desde_inicio)
+    print(f"[inicialização] {nome}: {duracao:.3f} s (em {desde_inicio:.3f} s desde o início)")
+
+
+@contextlib.contextmanager
+def fase(nome):
+    """Mede o bloco na primeira vez em que ele roda no processo."""
+    if not ATIVO or nome in _medidas:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        _registrar(nome, time.perf_counter() - inicio)
+
+
+def marco(nome):
+    """Registra o instante em que o script chegou a um ponto pela primeira vez."""
+    if ATIVO and nome not in _medidas:
+        _registrar(nome, 0.0)
+
+
+def resumo():
+    """Lista `(fase, duração, segundos desde o início)` na ordem em que as fases terminaram."""
+    with _trava:
+        return [(nome, duracao, desde_inicio) for nome, (duracao, desde_inicio) in _medidas.items()]
@@ -0,0 +1,69 @@
+"""Regras aplicadas a toda edição de tarefa, seja pelo formulário ou pela edição em lote."""
+from datetime import datetime
+
+import pandas as pd
+import pytz
+
+from dados import FORMATO_DATA, REGEX_TIMESTAMP_AUTOR
+
+FUSO_BRASILIA = pytz.timezone("America/Sao_Paulo")
+
+
+def agora_brasilia():
+    """Data e hora atuais no fuso de Brasília."""
+    return datetime.now(FUSO_BRASILIA)
+
+
+def para_data(valor):
+    """Converte um valor do DataFrame em `date`, ou None se estiver vazio."""
+    valor = pd.to_datetime(valor, errors='coerce')
+    return valor.date() if pd.notnull(valor) else None
+
+
+def formatar_data(valor):
+    """Formata uma `date` como é gravada na planilha (vazio se None)."""
+    return valor.strftime(FORMATO_DATA) if valor else ""
+
+
+def validar_percentual(perc_antiga, perc_nova, inicio_real_preenchido):
+    """Retorna a mensagem de erro se a mudança de % CONCLUIDA não for permitida, ou None."""
+    if perc_antiga > 0 and perc_nova == 0 and inicio_real_preenchido:
+        return "Não é possível voltar o '% CONCLUIDA' para 0% se a tarefa já teve avanço e o 'INÍCIO REAL' foi preenchido."
+    return None
+
+
+def datas_reais(perc_antiga, perc_nova, inicio_real_antigo, termino_real_antigo, hoje):
+    """Calcula INÍCIO REAL e TÉRMINO REAL: a tarefa começa ao sair de 0% e termina ao chegar a 100%."""
+    inicio_real = hoje if perc_antiga == 0.0 and perc_nova > 0.0 else inicio_real_antigo
+    termino_real = hoje if perc_antiga < 100.0 and perc_nova == 100.0 else termino_real_antigo
+    return inicio_real, termino_real
+
+
+def carimbar_autor(autor, data_hora_edicao):
+    """Acrescenta (ou substitui) o "(Editado em ...)" no nome do autor."""
+    if REGEX_TIMESTAMP_AUTOR.search(autor):
+        return REGEX_TIMESTAMP_AUTOR.sub(f' (Editado em {data_hora_edicao})', autor)
+    return f"{autor} (Editado em {data_hora_edicao})"
+
+
+def carimbar_email(email, data_hora_edicao):
+    """Junta o e-mail do usuário com a data e hora da atualização."""
+    return f"{email} (Atualizado em {data_hora_edicao})"
+
+
+def campos_calculados(tarefa, perc_nova, user_email, agora):
+    """Valores que a aplicação preenche sozinha ao salvar uma tarefa.
+
+    Retorna `{coluna: texto}` com INÍCIO REAL, TÉRMINO REAL, AUTOR e EMAIL.
+    """
+    inicio_real, termino_real = datas_reais(
+        float(tarefa["% CONCLUIDA"]), perc_nova,
+        para_data(tarefa["INÍCIO REAL"]), para_data(tarefa["TÉRMINO REAL"]), agora.date(),
+    )
+    data_hora_edicao = agora.strftime("%d/%m/%Y %H:%M")
+    return {
+        "INÍCIO REAL": formatar_data(inicio_real),
+        "TÉRMINO REAL": formatar_data(termino_real),
+        "AUTOR": carimbar_autor(str(tarefa["AUTOR"]), data_hora_edicao),
+        "EMAIL": carimbar_email(user_email, data_hora_edicao),
+    }
@@ -0,0 +1,214 @@
+"""Cópia local da planilha em SQLite, sincronizada buscando só as linhas que mudaram."""
+import collections
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from dados import COLUNAS_ESSENCIAIS, montar_dataframe, posicoes_das_colunas, verificar_colunas_esperadas
+from escrita import letras_das_colunas
+from indices import PRIMEIRA_LINHA_DADOS, indice_df
+
+# Colunas lidas a cada sincronização para descobrir quais linhas mudaram. Toda edição
+# feita pela aplicação carimba AUTOR e EMAIL, então ela sempre aparece aqui
+COLUNAS_IMPRESSAO = COLUNAS_ESSENCIAIS + ["% CONCLUIDA", "AUTOR", "EMAIL"]
+
+Sincronizacao = collections.namedtuple("Sincronizacao", "completa estrutura_mudou linhas_alteradas")
+Sincronizacao.__doc__ = """Resultado de `SnapshotLocal.sincronizar`.
+
+`linhas_alteradas` é `{linha da planilha: {coluna: valor}}` com as linhas
+buscadas de novo; `estrutura_mudou` indica linhas inseridas ou removidas
+(aí o DataFrame precisa ser remontado, não só corrigido).
+"""
+
+
+def impressao(valores):
+    """Hash das colunas de impressão de uma linha."""
+    return hashlib.blake2b("\x1f".join(valores).encode(), digest_size=16).hexdigest()
+
+
+def completar(linha, largura):
+    """Completa com "" uma linha que veio da API com as células vazias do fim cortadas."""
+    return list(linha) + [""] * (largura - len(linha))
+
+
+def sem_vazios_no_fim(valores):
+    """Tupla dos valores sem as células vazias do fim, para comparar cabeçalhos lidos de formas diferentes."""
+    valores = list(valores)
+    while valores and valores[-1] == "":
+        valores.pop()
+    return tuple(valores)
+
+
+def agrupar_intervalos(linhas, folga=3):
+    """Agrupa números de linha em intervalos contíguos `(inicio, fim)`; buracos de até `folga` linhas são lidos junto."""
+    intervalos = []
+    for linha in sorted(linhas):
+        if intervalos and linha - intervalos[-1][1] <= folga + 1:
+            intervalos[-1][1] = linha
+        else:
+            intervalos.append([linha, linha])
+    return [tuple(intervalo) for intervalo in intervalos]
+
+
+class SnapshotLocal:
+    """Guarda o texto de cada linha da planilha, com o hash das colunas de impressão, em um arquivo SQLite.
+
+    `sincronizar` lê só as colunas de impressão (uma chamada), compara os hashes
+    com os guardados e busca por inteiro apenas as linhas que mudaram (outra
+    chamada, com os intervalos agrupados). Assim o custo de cada atualização
+    acompanha o número de edições, não o tamanho da planilha, e um processo que
+    reinicia parte do arquivo em vez de baixar tudo.
+
+    Edições feitas direto na planilha fora das colunas de impressão só são vistas
+    na próxima sincronização completa, feita a cada `max_idade_completa_segundos`
+    ou quando mais de `fracao_maxima_delta` das linhas mudou.
+    """
+
+    def __init__(self, caminho, fracao_maxima_delta=0.3, max_idade_completa_segundos=3600):
+        self.caminho = caminho
+        self.fracao_maxima_delta = fracao_maxima_delta
+        self.max_idade_completa_segundos = max_idade_completa_segundos
+        self._trava = threading.Lock()
+        self._conexao = sqlite3.connect(caminho, check_same_thread=False)
+        with self._conexao:
+            self._conexao.execute(
+                "CREATE TABLE IF NOT EXISTS linhas (linha INTEGER PRIMARY KEY, impressao TEXT NOT NULL, valores TEXT NOT NULL)"
+            )
+            self._conexao.execute("CREATE TABLE IF NOT EXISTS meta (chave TEXT PRIMARY KEY, valor TEXT NOT NULL)")
+        self._reconstrucao = None
+
+    def _meta(self, chave, padrao=None):
+        registro = self._conexao.execute("SELECT valor FROM meta WHERE chave = ?", (chave,)).fetchone()
+        return json.loads(registro[0]) if registro else padrao
+
+    def _gravar_meta(self, **valores):
+        self._conexao.executemany(
+            "INSERT OR REPLACE INTO meta (chave, valor) VALUES (?, ?)",
+            [(chave, json.dumps(valor, ensure_ascii=False)) for chave, valor in valores.items()],
+        )
+
+    def cabecalho(self):
+        """Cabeçalho da última sincronização, ou None se o arquivo ainda está vazio."""
+        with self._trava:
+            cabecalho = self._meta("cabecalho")
+            return tuple(cabecalho) if cabecalho else None
+
+    def _posicoes_impressao(self, cabecalho):
+        posicoes = posicoes_das_colunas(cabecalho)
+        return [posicoes[col] for col in COLUNAS_IMPRESSAO]
+
+    def _impressoes_por_linha(self, cabecalho, linhas):
+        posicoes = self._posicoes_impressao(cabecalho)
+        return [impressao([linha[i] for i in posicoes]) for linha in linhas]
+
+    def _sincronizar_completa(self, sheet):
+        grade = sheet.get_values()
+        cabecalho = tuple(grade[0]) if grade else ()
+        linhas = [completar(linha, len(cabecalho)) for linha in grade[1:]]
+        verificar_colunas_esperadas(cabecalho)  # Antes de apagar o que está guardado
+        impressoes = self._impressoes_por_linha(cabecalho, linhas)
+        # Quantas linhas a leitura das colunas de impressão enxerga (a API corta as vazias do fim)
+        posicoes = self._posicoes_impressao(cabecalho)
+        linhas_impressao = max(
+            (n for n, linha in enumerate(linhas, start=1) if any(linha[i] for i in posicoes)), default=0
+        )
+        with self._conexao:
+            self._conexao.execute("DELETE FROM linhas")
+            self._conexao.executemany(
+                "INSERT INTO linhas (linha, impressao, valores) VALUES (?, ?, ?)",
+                [
+                    (n, impressao_linha, json.dumps(linha, ensure_ascii=False))
+                    for n, (impressao_linha, linha) in enumerate(zip(impressoes, linhas), start=PRIMEIRA_LINHA_DADOS)
+                ],
+            )
+            self._gravar_meta(
+                cabecalho=list(cabecalho), total_linhas=len(linhas), linhas_impressao=linhas_impressao,
+                completa_em=time.time(),
+            )
+        return Sincronizacao(completa=True, estrutura_mudou=True, linhas_alteradas={})
+
+    def _sincronizar_delta(self, sheet, cabecalho):
+        letras = letras_das_colunas(cabecalho)
+        # Uma única chamada traz a linha de cabeçalho e as colunas de impressão inteiras
+        intervalos_impressao = [f"{letras[col]}:{letras[col]}" for col in COLUNAS_IMPRESSAO]
+        cabecalho_atual, *colunas = sheet.batch_get(["1:1"] + intervalos_impressao, major_dimension="COLUMNS")
+        colunas = [intervalo[0] if intervalo else [] for intervalo in colunas]
+
+        # Colunas mudaram de lugar ou número de linhas mudou: só uma leitura completa resolve
+        if sem_vazios_no_fim(coluna[0] if coluna else "" for coluna in cabecalho_atual) != sem_vazios_no_fim(cabecalho):
+            return None
+        total = max(len(coluna) for coluna in colunas) - 1
+        if total != self._meta("linhas_impressao"):
+            return None
+
+        impressoes_novas = [
+            impressao([coluna[n] if n < len(coluna) else "" for coluna in colunas]) for n in range(1, total + 1)
+        ]
+        guardadas = dict(self._conexao.execute("SELECT linha, impressao FROM linhas WHERE linha < ?", (total + PRIMEIRA_LINHA_DADOS,)))
+        alteradas = [
+            n for n, impressao_nova in enumerate(impressoes_novas, start=PRIMEIRA_LINHA_DADOS)
+            if guardadas.get(n) != impressao_nova
+        ]
+        if len(alteradas) > self.fracao_maxima_delta * max(total, 1):
+            return None
+        if not alteradas:
+            return Sincronizacao(completa=False, estrutura_mudou=False, linhas_alteradas={})
+        alteradas = set(alteradas)
+
+        ultima_letra = letras[cabecalho[-1]]
+        intervalos = agrupar_intervalos(alteradas)
+        lidos = sheet.batch_get([f"A{inicio}:{ultima_letra}{fim}" for inicio, fim in intervalos])
+        posicoes = posicoes_das_colunas(cabecalho)
+        linhas_alteradas = {}
+        registros = []
+        for (inicio, fim), intervalo in zip(intervalos, lidos):
+            for n in range(inicio, fim + 1):
+                deslocamento = n - inicio
+                linha = completar(intervalo[deslocamento] if deslocamento < len(intervalo) else [], len(cabecalho))
+                registros.append((n, impressoes_novas[n - PRIMEIRA_LINHA_DADOS], json.dumps(linha, ensure_ascii=False)))
+                if n in alteradas:
+                    linhas_alteradas[n] = {nome: linha[i] for nome, i in posicoes.items()}
+        with self._conexao:
+            self._conexao.executemany("INSERT OR REPLACE INTO linhas (linha, impressao, valores) VALUES (?, ?, ?)", registros)
+        return Sincronizacao(completa=False, estrutura_mudou=False, linhas_alteradas=linhas_alteradas)
+
+    def sincronizar(self, sheet):
+        """Atualiza o arquivo com a planilha, lendo só as linhas alteradas sempre que possível."""
+        with self._trava:
+            cabecalho = self._meta("cabecalho")
+            completa_em = self._meta("completa_em", 0)
+            if cabecalho and time.time() - completa_em < self.max_idade_completa_segundos:
+                resultado = self._sincronizar_delta(sheet, tuple(cabecalho))
+                if resultado is not None:
+                    return resultado
+            return self._sincronizar_completa(sheet)
+
+    def dataframe(self):
+        """Monta o DataFrame bruto (texto) e o cabeçalho a partir das linhas guardadas."""
+        with self._trava:
+            cabecalho = tuple(self._meta("cabecalho") or ())
+            linhas = [json.loads(valores) for (valores,) in self._conexao.execute("SELECT valores FROM linhas ORDER BY linha")]
+        return montar_dataframe(cabecalho, linhas), cabecalho
+
+    def carregar(self, sheet):
+        """Sincroniza e devolve `(df, cabecalho)` com todas as linhas, para montar o cache do zero."""
+        if self._reconstrucao is not None:
+            # Já sincronizado por `atualizar`, que encontrou linhas inseridas ou removidas
+            resultado, self._reconstrucao = self._reconstrucao, None
+            return resultado
+        self.sincronizar(sheet)
+        return self.dataframe()
+
+    def atualizar(self, sheet):
+        """Sincroniza e devolve `{df_index: valores}` das linhas alteradas, para corrigir o cache no lugar.
+
+        Devolve None quando a estrutura mudou; aí o próximo `carregar` remonta
+        o DataFrame a partir do arquivo, sem sincronizar de novo.
+        """
+        resultado = self.sincronizar(sheet)
+        if resultado.estrutura_mudou:
+            self._reconstrucao = self.dataframe()
+            return None
+        return {indice_df(linha): valores for linha, valores in resultado.linhas_alteradas.items()}